@@ -0,0 +1 @@
+# Бенчмарки системы печати
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Общие инструменты бенчмарков
+- Локальный Redis: запуск redis-server на свободном порту или fakeredis в процессе
+- Подсчет команд Redis на стороне клиента
+- Перцентили, пиковая память и запись результатов в JSON
+"""
+
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import redis.asyncio as redis
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent.parent))
+
+try:
+    import fakeredis
+    FAKEREDIS_AVAILABLE = True
+except ImportError:
+    FAKEREDIS_AVAILABLE = False
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalRedis:
+    """
+    Redis только для бенчмарка
+
+    mode="spawn" - отдельный redis-server без сохранения на диск,
+    mode="fake" - fakeredis в том же процессе,
+    mode="auto" - redis-server, если он установлен, иначе fakeredis
+    """
+
+    def __init__(self, mode: str = "auto"):
+        if mode == "auto":
+            mode = "spawn" if shutil.which("redis-server") else "fake"
+        if mode == "spawn" and not shutil.which("redis-server"):
+            raise RuntimeError("redis-server не найден")
+        if mode == "fake" and not FAKEREDIS_AVAILABLE:
+            raise RuntimeError("fakeredis не установлен. Установите: pip install fakeredis")
+        if mode not in ("spawn", "fake"):
+            raise ValueError(f"Неизвестный режим Redis: {mode}")
+
+        self.mode = mode
+        self.url: Optional[str] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._server = None
+        self._clients: List[Any] = []
+
+    async def start(self):
+        if self.mode == "fake":
+            self._server = fakeredis.FakeServer()
+            self.url = "redis://fakeredis"
+            return
+
+        port = _free_port()
+        self.url = f"redis://127.0.0.1:{port}"
+        self._process = subprocess.Popen(
+            ["redis-server", "--port", str(port), "--bind", "127.0.0.1",
+             "--save", "", "--appendonly", "no"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        client = self.client()
+        for _ in range(100):
+            try:
+                await client.ping()
+                return
+            except (redis.ConnectionError, OSError):
+                await asyncio.sleep(0.05)
+        raise RuntimeError("redis-server не запустился")
+
+    def client(self, decode_responses: bool = False):
+        """Новый асинхронный клиент (как у PrintQueueManager.connect)"""
+        if self.mode == "fake":
+            client = fakeredis.FakeAsyncRedis(server=self._server, decode_responses=decode_responses)
+        else:
+            client = redis.from_url(self.url, decode_responses=decode_responses)
+        self._clients.append(client)
+        return client
+
+    async def stop(self):
+        for client in self._clients:
+            await client.aclose()
+        self._clients.clear()
+        if self._process is not None:
+            self._process.terminate()
+            self._process.wait(timeout=5)
+            self._process = None
+
+    async def __aenter__(self) -> "LocalRedis":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+
+class CommandCounter:
+    """Считает команды, отправленные клиентами Redis (команды pipeline - по одной)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def attach(self, client):
+        """Подключает счетчик к клиенту"""
+        execute_command = client.execute_command
+        create_pipeline = client.pipeline
+
+        async def counted_execute_command(*args, **kwargs):
+            self.count += 1
+            return await execute_command(*args, **kwargs)
+
+        def counted_pipeline(*args, **kwargs):
+            pipe = create_pipeline(*args, **kwargs)
+            execute = pipe.execute
+
+            async def counted_execute(*exec_args, **exec_kwargs):
+                self.count += len(pipe.command_stack)
+                return await execute(*exec_args, **exec_kwargs)
+
+            pipe.execute = counted_execute
+            return pipe
+
+        client.execute_command = counted_execute_command
+        client.pipeline = counted_pipeline
+        return client
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99/max"""
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    if len(values) == 1:
+        return {"p50": values[0], "p95": values[0], "p99": values[0], "max": values[0]}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98], "max": max(values)}
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Пиковая память процесса в МБ (None, если недоступно)"""
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux - КБ, macOS - байты
+    divisor = 1024 * 1024 if platform.system() == "Darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5, cwd=Path(__file__).parent
+        )
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def write_results(name: str, params: Dict[str, Any], results: Any, output: Optional[str] = None) -> Path:
+    """
+    Записывает результаты в JSON для сравнения между коммитами
+
+    Returns:
+        Path: Путь к файлу результатов
+    """
+    report = {
+        "benchmark": name,
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "results": results
+    }
+    if output:
+        path = Path(output)
+    else:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        path = RESULTS_DIR / f"{name}_{report['commit'] or 'nocommit'}_{int(time.time())}.json"
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+
+@contextmanager
+def quiet(enabled: bool = True):
+    """Подавляет вывод print на время измерений"""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+        yield
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Сквозной бенчмарк системы печати
+Синтетические заказы -> add_orders_to_print_queue -> PrintProcessor
+с эмуляторами принтеров -> завершение всех задач.
+Измеряются заказы в секунду, задержка от постановки в очередь до
+завершения (p50/p95/p99), команды Redis на задачу и пиковая память
+
+Пример:
+    python benchmarks/e2e.py --orders 2000 --printers 8 --ppm 600 --time-scale 0.01
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import LocalRedis, CommandCounter, percentiles, peak_rss_mb, write_results, quiet
+from printer.add_to_print import PrintQueueManager, add_orders_to_print_queue
+from printer.print_processor import PrintProcessor
+from printer.simulated_printer import create_simulated_printers
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+
+def make_orders(count: int, articles: int, base_path: Path) -> List[Dict[str, Any]]:
+    """Синтетические заказы и файлы ПЕЧАТЬ.png для их артикулов"""
+    for index in range(articles):
+        folder = base_path / f"BENCH-{index}"
+        folder.mkdir(parents=True, exist_ok=True)
+        label = folder / "ПЕЧАТЬ.png"
+        if PIL_AVAILABLE:
+            Image.new("L", (400, 300), 255).save(label)
+        else:
+            label.write_bytes(b"\x89PNG\r\n\x1a\n")
+
+    now = datetime.now().isoformat()
+    return [
+        {"id": index, "article": f"BENCH-{index % articles}", "createdAt": now}
+        for index in range(count)
+    ]
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    work_dir = Path(tempfile.mkdtemp(prefix="wb_bench_"))
+    orders = make_orders(args.orders, args.articles, work_dir / "for_print")
+
+    async with LocalRedis(args.redis) as local_redis:
+        counter = CommandCounter()
+
+        # Отдельные клиенты для постановки в очередь, процессора и наблюдения (не учитывается)
+        enqueue_manager = PrintQueueManager(local_redis.url, excel_filename=str(work_dir / "enqueue.xlsx"))
+        enqueue_manager.redis = counter.attach(local_redis.client())
+
+        processor = PrintProcessor(local_redis.url, render=args.render,
+                                   max_jobs_per_printer=args.jobs_per_printer,
+                                   load_aware=not args.no_load_aware)
+        processor.queue_manager.redis = counter.attach(local_redis.client())
+        processor.queue_manager.excel_manager.filename = str(work_dir / "processor.xlsx")
+        processor.queue_manager.retry_base_delay = args.retry_delay
+        if processor.render_stage:
+            processor.render_stage.output_dir = str(work_dir / "rendered")
+
+        # Рабочая группа в базе замера пуста - печатаем только на эмуляторы
+        processor.printer_manager.redis = counter.attach(local_redis.client(decode_responses=True))
+
+        printers = create_simulated_printers(
+            args.printers, seed=args.seed, warmup_time=args.warmup,
+            jam_rate=args.jam_rate, failure_rate=args.failure_rate, jam_clear_time=args.jam_clear_time,
+            queue_depth=args.queue_depth, time_scale=args.time_scale
+        )
+        for index, (name, printer) in enumerate(printers.items()):
+            # Скорости задаются по кругу: "600,150" - каждый второй принтер медленный
+            printer.pages_per_minute = args.ppm[index % len(args.ppm)]
+            processor.register_backend(name, printer)
+
+        monitor = local_redis.client()
+        queue_manager = processor.queue_manager
+
+        with quiet(not args.verbose):
+            started = time.perf_counter()
+            if not args.prefill:
+                run = asyncio.create_task(processor.start_processing(check_interval=args.check_interval, idle_timeout=1))
+
+            await add_orders_to_print_queue(
+                local_redis.url, orders=orders, queue_manager=enqueue_manager,
+                base_print_path=str(work_dir / "for_print")
+            )
+            enqueued = time.perf_counter()
+            if args.prefill:
+                # Вся партия уже в очереди - замеряется только ее печать
+                started = enqueued
+                run = asyncio.create_task(processor.start_processing(check_interval=args.check_interval, idle_timeout=1))
+
+            deadline = started + args.timeout
+            while time.perf_counter() < deadline:
+                finished = await monitor.zcard(queue_manager.dead_letter_name) + await monitor.zcard("completed_tasks")
+                if finished >= args.orders:
+                    break
+                await asyncio.sleep(0.01)
+            finished_at = time.perf_counter()
+
+            processor.stop()
+            await run
+            await enqueue_manager.excel_manager.close()
+
+        completed = [json.loads(task) for task in await monitor.zrange("completed_tasks", 0, -1)]
+        dead = await monitor.zcard(queue_manager.dead_letter_name)
+
+    latencies = [
+        (datetime.fromisoformat(task["completed_at"]) - datetime.fromisoformat(task["created_at"])).total_seconds() * 1000
+        for task in completed
+    ]
+    duration = finished_at - started
+    return {
+        "redis_mode": local_redis.mode,
+        "orders": args.orders,
+        "completed": len(completed),
+        "dead_letter": dead,
+        "timed_out": len(completed) + dead < args.orders,
+        "duration_s": round(duration, 3),
+        "enqueue_s": None if args.prefill else round(enqueued - started, 3),
+        "orders_per_sec": round(len(completed) / duration, 2) if duration else None,
+        "latency_ms": {key: round(value, 2) if value is not None else None
+                       for key, value in percentiles(latencies).items()},
+        "redis_ops_total": counter.count,
+        "redis_ops_per_task": round(counter.count / args.orders, 2) if args.orders else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "printers": [printer.get_stats() for printer in printers.values()],
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Сквозной бенчмарк системы печати")
+    parser.add_argument("--orders", type=int, default=1000, help="Число заказов")
+    parser.add_argument("--articles", type=int, default=50, help="Число разных артикулов (файлов печати)")
+    parser.add_argument("--printers", type=int, default=4, help="Число эмуляторов принтеров")
+    parser.add_argument("--ppm", default="600",
+                        help="Скорость эмуляторов, страниц в минуту (через запятую - по кругу)")
+    parser.add_argument("--warmup", type=float, default=0, help="Прогрев эмулятора, сек")
+    parser.add_argument("--jam-rate", type=float, default=0, help="Вероятность замятия")
+    parser.add_argument("--failure-rate", type=float, default=0, help="Вероятность сбоя задания")
+    parser.add_argument("--jam-clear-time", type=float, default=10, help="Устранение замятия, сек")
+    parser.add_argument("--queue-depth", type=int, default=10, help="Глубина очереди спулера эмулятора")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="Множитель времени эмуляторов")
+    parser.add_argument("--jobs-per-printer", type=int, default=3, help="Заданий в спулере на принтер")
+    parser.add_argument("--retry-delay", type=float, default=0.1, help="Базовая задержка повтора, сек")
+    parser.add_argument("--check-interval", type=float, default=1, help="Интервал проверки принтеров, сек")
+    parser.add_argument("--render", action="store_true", help="Включить предварительную подготовку файлов")
+    parser.add_argument("--prefill", action="store_true",
+                        help="Поставить все заказы в очередь до запуска процессора (печать партии)")
+    parser.add_argument("--no-load-aware", action="store_true",
+                        help="Задачу берет первый свободный принтер, без учета скорости")
+    parser.add_argument("--seed", type=int, default=0, help="Seed эмуляторов")
+    parser.add_argument("--redis", choices=["auto", "spawn", "fake"], default="auto",
+                        help="Локальный redis-server или fakeredis в процессе")
+    parser.add_argument("--timeout", type=float, default=300, help="Максимальная длительность прогона, сек")
+    parser.add_argument("--output", help="Файл результатов JSON (по умолчанию benchmarks/results/)")
+    parser.add_argument("--verbose", action="store_true", help="Не подавлять вывод процессора")
+    args = parser.parse_args(argv)
+    args.ppm = [float(speed) for speed in args.ppm.split(",")]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"🚀 Бенчмарк: {args.orders} заказов, {args.printers} принтеров ({args.redis})")
+    results = asyncio.run(run_benchmark(args))
+    path = write_results("e2e", vars(args), results, args.output)
+
+    latency = results["latency_ms"]
+    print(f"✅ Завершено {results['completed']}/{args.orders} за {results['duration_s']} с "
+          f"({results['orders_per_sec']} заказов/с)")
+    print(f"⏱️ Задержка p50/p95/p99: {latency['p50']} / {latency['p95']} / {latency['p99']} мс")
+    print(f"🔁 Команд Redis на задачу: {results['redis_ops_per_task']}, пиковая память: {results['peak_rss_mb']} МБ")
+    print(f"💾 Результаты: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарки операций очереди печати
+Очередь заполняется N синтетическими задачами (по умолчанию 1k/10k/100k),
+после чего замеряется каждая операция PrintQueueManager и запрос /api/queue.
+Для каждой операции - время вызова (p50/p95/max) и число команд Redis,
+так что рост сложности с размером очереди виден в цифрах
+
+Пример:
+    python benchmarks/queue_ops.py --sizes 1000,10000 --repeat 20
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Callable, Awaitable
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import LocalRedis, CommandCounter, percentiles, peak_rss_mb, write_results, quiet
+from printer.add_to_print import PrintQueueManager
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+
+SEED_CHUNK = 5000
+PRINTER_ID = "bench-printer"
+
+
+def make_task(index: int, status: str = "pending", priority: int = 1) -> Dict[str, Any]:
+    """Задача в том же виде, что создает add_to_queue"""
+    task = {
+        "id": str(uuid.uuid4()),
+        "file_path": f"for_print/BENCH-{index % 50}/ПЕЧАТЬ.png",
+        "order_id": index,
+        "article": f"BENCH-{index % 50}",
+        "priority": priority,
+        "status": status,
+        "created_at": datetime.now().isoformat(),
+        "assigned_printer": None,
+        "attempts": 0
+    }
+    if status == "printing":
+        task["assigned_printer"] = PRINTER_ID
+        task["assigned_at"] = datetime.now().isoformat()
+    return task
+
+
+async def seed_queue(client, manager: PrintQueueManager, size: int, printing_ratio: float,
+                     delayed_ratio: float, dead_ratio: float, rng: random.Random):
+    """
+    Заполняет очередь, отложенные повторы и dead_letter (без замеров)
+
+    Задачи "Печатается" перемешаны с ожидающими, как в рабочей очереди
+    """
+    await client.flushall()
+    far_future = datetime.now().timestamp() + 86400
+
+    queues = [
+        (manager.queue_name, size, lambda task: task["priority"]),
+        (manager.delayed_queue_name, int(size * delayed_ratio), lambda task: far_future),
+        (manager.dead_letter_name, int(size * dead_ratio), lambda task: datetime.now().timestamp()),
+    ]
+    for queue_name, count, score in queues:
+        for start in range(0, count, SEED_CHUNK):
+            mapping = {}
+            for index in range(start, min(start + SEED_CHUNK, count)):
+                status = "pending"
+                if queue_name == manager.queue_name and rng.random() < printing_ratio:
+                    status = "printing"
+                elif queue_name == manager.dead_letter_name:
+                    status = "dead"
+                task = make_task(index, status, priority=rng.randint(1, 3))
+                mapping[json.dumps(task)] = score(task)
+            await client.zadd(queue_name, mapping)
+
+
+async def random_entry(client, queue_name: str, rng: random.Random):
+    """Случайная запись очереди: (task_json, score)"""
+    size = await client.zcard(queue_name)
+    index = rng.randrange(size)
+    return (await client.zrange(queue_name, index, index, withscores=True))[0]
+
+
+async def measure(counter: CommandCounter, repeat: int, prepare: Callable[[], Awaitable[Any]],
+                  operation: Callable[[Any], Awaitable[Any]],
+                  cleanup: Callable[[Any, Any], Awaitable[Any]] = None) -> Dict[str, Any]:
+    """
+    Замеряет operation repeat раз
+
+    prepare и cleanup не замеряются: они выбирают аргументы и возвращают
+    очередь к исходному размеру, чтобы все вызовы шли на одном N
+    """
+    timings = []
+    ops = 0
+    for _ in range(repeat):
+        argument = await prepare()
+        before = counter.count
+        started = time.perf_counter()
+        result = await operation(argument)
+        timings.append((time.perf_counter() - started) * 1000)
+        ops += counter.count - before
+        if cleanup:
+            await cleanup(argument, result)
+
+    stats = {key: round(value, 3) if value is not None else None for key, value in percentiles(timings).items()}
+    stats["mean"] = round(sum(timings) / len(timings), 3)
+    stats["redis_ops"] = round(ops / repeat, 1)
+    return stats
+
+
+async def run_size(local_redis: LocalRedis, size: int, args, work_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """Все замеры для очереди из size задач"""
+    rng = random.Random(args.seed)
+    counter = CommandCounter()
+    # Наблюдение и восстановление очереди - отдельным клиентом, без подсчета
+    client = local_redis.client()
+
+    manager = PrintQueueManager(local_redis.url, excel_filename=str(work_dir / f"queue_{size}.xlsx"),
+                                retry_base_delay=86400)
+    manager.redis = counter.attach(local_redis.client())
+
+    await seed_queue(client, manager, size, args.printing_ratio, args.delayed_ratio, args.dead_ratio, rng)
+    repeat = args.repeat
+    results = {}
+
+    async def nothing():
+        return None
+
+    async def random_pending():
+        while True:
+            task_json, score = await random_entry(client, manager.queue_name, rng)
+            if json.loads(task_json)["status"] == "pending":
+                return task_json, score
+
+    async def random_queued():
+        return await random_entry(client, manager.queue_name, rng)
+
+    async def restore(entry, result):
+        # Возвращает исходную запись и убирает то, что операция оставила вместо нее
+        # (номера заказов при заполнении уникальны, а id меняет restart_task)
+        task_json, score = entry
+        order_id = json.loads(task_json)["order_id"]
+        for other_json in await client.zrangebyscore(manager.queue_name, score, score):
+            if other_json != task_json and json.loads(other_json)["order_id"] == order_id:
+                await client.zrem(manager.queue_name, other_json)
+        await client.zadd(manager.queue_name, {task_json: score})
+
+    async def claim():
+        return await manager._claim_pending_task(PRINTER_ID)
+
+    async def drop_added(argument, task_id):
+        for task_json in await client.zrangebyscore(manager.queue_name, 3, 3):
+            if json.loads(task_json)["id"] == task_id:
+                await client.zrem(manager.queue_name, task_json)
+                return
+
+    async def unclaim(argument, task):
+        # Возвращает захваченную задачу в pending
+        printing_json = json.dumps(task)
+        score = await client.zscore(manager.queue_name, printing_json)
+        await client.zrem(manager.queue_name, printing_json)
+        pending = dict(task, status="pending", assigned_printer=None)
+        pending.pop("assigned_at", None)
+        await client.zadd(manager.queue_name, {json.dumps(pending): score})
+
+    async def return_completed(task, result):
+        # Переносит выполненную задачу обратно в очередь
+        await client.delete("completed_tasks")
+        await client.zadd(manager.queue_name, {json.dumps(dict(task, status="pending", assigned_printer=None)): task["priority"]})
+
+    async def return_delayed(task, result):
+        for task_json in await client.zrange(manager.delayed_queue_name, 0, -1):
+            if json.loads(task_json)["id"] == task["id"]:
+                await client.zrem(manager.delayed_queue_name, task_json)
+        await client.zadd(manager.queue_name, {json.dumps(dict(task, status="pending", assigned_printer=None)): task["priority"]})
+
+    async def random_dead():
+        return await random_entry(client, manager.dead_letter_name, rng)
+
+    async def return_dead(entry, result):
+        task_json, score = entry
+        task_id = json.loads(task_json)["id"]
+        for queue_json in await client.zrangebyscore(manager.queue_name, 1, 3):
+            if json.loads(queue_json)["id"] == task_id:
+                await client.zrem(manager.queue_name, queue_json)
+                break
+        await client.zadd(manager.dead_letter_name, {task_json: score})
+
+    benchmarks = [
+        ("add_printer", nothing, lambda _: manager.add_printer(PRINTER_ID, {"name": PRINTER_ID}), None),
+        ("add_to_queue", nothing,
+         lambda _: manager.add_to_queue("for_print/BENCH-0/ПЕЧАТЬ.png", {"id": -1, "article": "BENCH-0"}, 3),
+         drop_added),
+        ("get_next_task", nothing, lambda _: manager.get_next_task(PRINTER_ID), unclaim),
+        ("update_task_fields", random_pending, lambda entry: manager.update_task_fields(entry[0], {"rendered_path": "x"}),
+         restore),
+        ("mark_task_completed", claim, lambda task: manager.mark_task_completed(task["id"], PRINTER_ID), return_completed),
+        ("retry_task", claim, lambda task: manager.retry_task(task, "bench"), return_delayed),
+        ("remove_task", random_queued, lambda entry: manager.remove_task(json.loads(entry[0])["id"]), restore),
+        ("restart_task", random_queued, lambda entry: manager.restart_task(json.loads(entry[0])["id"]), restore),
+        ("promote_delayed_tasks", nothing, lambda _: manager._promote_delayed_tasks(), None),
+        ("get_dead_letter_tasks", nothing, lambda _: manager.get_dead_letter_tasks(), None),
+        ("requeue_dead_tasks", random_dead,
+         lambda entry: manager.requeue_dead_tasks([json.loads(entry[0])["id"]]), return_dead),
+        ("get_version", nothing, lambda _: manager.get_version(), None),
+    ]
+
+    for name, prepare, operation, cleanup in benchmarks:
+        if args.only and name not in args.only:
+            continue
+        with quiet(not args.verbose):
+            results[name] = await measure(counter, repeat, prepare, operation, cleanup)
+        print(f"   {name:<24} p50 {results[name]['p50']:>10.3f} мс  команд Redis {results[name]['redis_ops']:>8}")
+
+    if not args.only or "api_queue" in args.only:
+        if HTTPX_AVAILABLE:
+            results["api_queue"] = await measure_api_queue(local_redis, counter, repeat, args)
+            print(f"   {'GET /api/queue':<24} p50 {results['api_queue']['p50']:>10.3f} мс  "
+                  f"команд Redis {results['api_queue']['redis_ops']:>8}")
+        else:
+            print("⚠️ httpx не установлен, /api/queue не замеряется. Установите: pip install httpx")
+
+    await manager.excel_manager.close()
+    return results
+
+
+async def measure_api_queue(local_redis: LocalRedis, counter: CommandCounter, repeat: int, args) -> Dict[str, Any]:
+    """GET /api/queue через ASGI, включая сериализацию ответа"""
+    from web_interface import WebInterface
+
+    web = WebInterface(local_redis.url)
+    web.queue_manager.redis = counter.attach(local_redis.client())
+    if local_redis.mode == "fake":
+        # fakeredis не подключается по URL - эндпоинт использует уже созданный клиент
+        async def keep_client():
+            return None
+        web.queue_manager.connect = keep_client
+
+    transport = httpx.ASGITransport(app=web.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        async def nothing():
+            return None
+
+        async def get_queue(_):
+            response = await http.get("/api/queue")
+            response.raise_for_status()
+            return response
+
+        with quiet(not args.verbose):
+            return await measure(counter, repeat, nothing, get_queue)
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    work_dir = Path(tempfile.mkdtemp(prefix="wb_bench_"))
+    results = {}
+    async with LocalRedis(args.redis) as local_redis:
+        for size in args.sizes:
+            print(f"📊 Очередь из {size} задач")
+            started = time.perf_counter()
+            results[str(size)] = await run_size(local_redis, size, args, work_dir)
+            print(f"   ({time.perf_counter() - started:.1f} с)")
+        mode = local_redis.mode
+    return {"redis_mode": mode, "sizes": results, "peak_rss_mb": peak_rss_mb()}
+
+
+def print_scaling(results: Dict[str, Any], sizes: List[int]):
+    """Сводка: p50 каждой операции по размерам очереди"""
+    header = "".join(f"{size:>12}" for size in sizes)
+    print(f"\n{'p50, мс':<24}{header}")
+    operations = results["sizes"][str(sizes[0])].keys()
+    for name in operations:
+        row = "".join(f"{results['sizes'][str(size)][name]['p50']:>12.3f}" for size in sizes)
+        print(f"{name:<24}{row}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Микробенчмарки операций очереди печати")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="Размеры очереди через запятую")
+    parser.add_argument("--repeat", type=int, default=10, help="Вызовов каждой операции на размер")
+    parser.add_argument("--printing-ratio", type=float, default=0.1, help="Доля задач в статусе printing")
+    parser.add_argument("--delayed-ratio", type=float, default=0.01, help="Размер отложенных повторов от N")
+    parser.add_argument("--dead-ratio", type=float, default=0.01, help="Размер dead_letter от N")
+    parser.add_argument("--only", help="Только эти операции через запятую (api_queue - эндпоинт)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed выбора задач")
+    parser.add_argument("--redis", choices=["auto", "spawn", "fake"], default="auto",
+                        help="Локальный redis-server или fakeredis в процессе")
+    parser.add_argument("--output", help="Файл результатов JSON (по умолчанию benchmarks/results/)")
+    parser.add_argument("--verbose", action="store_true", help="Не подавлять вывод менеджера очереди")
+    args = parser.parse_args(argv)
+    args.sizes = [int(size) for size in args.sizes.split(",")]
+    args.only = set(args.only.split(",")) if args.only else None
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"🚀 Бенчмарк очереди: размеры {args.sizes}, {args.repeat} вызовов ({args.redis})")
+    results = asyncio.run(run_benchmark(args))
+    params = dict(vars(args), only=sorted(args.only) if args.only else None)
+    path = write_results("queue_ops", params, results, args.output)
+    print_scaling(results, args.sizes)
+    print(f"\n💾 Результаты: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Redis для тестов: fakeredis за TCP-сервером на свободном порту
+Проверяемый код подключается по URL, как к настоящему Redis, поэтому
+тестам не нужен запущенный redis-server. Lua-скрипты выполняются через lupa
+(pip install "fakeredis[lua]")
+"""
+
+import asyncio
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+from printer.add_to_print import PrintQueueManager
+
+try:
+    from fakeredis import TcpFakeServer
+    FAKEREDIS_AVAILABLE = True
+except ImportError:
+    FAKEREDIS_AVAILABLE = False
+
+
+@contextmanager
+def fake_redis_url() -> Iterator[str]:
+    """
+    Запускает отдельный fakeredis-сервер на время блока with
+
+    Yields:
+        str: URL подключения к серверу
+    """
+    if not FAKEREDIS_AVAILABLE:
+        raise ImportError('fakeredis не установлен. Установите: pip install "fakeredis[lua]"')
+
+    server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    # Незакрытые клиенты не должны задерживать остановку сервера
+    server.daemon_threads = True
+    server.block_on_close = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address
+        yield f"redis://{host}:{port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def run_with_redis(test):
+    """
+    Запускает тест с отдельным fakeredis
+
+    Args:
+        test: Корутина test(queue_manager) с подключенным PrintQueueManager
+    """
+    async def run(redis_url):
+        queue_manager = PrintQueueManager(redis_url)
+        await queue_manager.connect()
+        try:
+            await test(queue_manager)
+        finally:
+            await queue_manager.redis.aclose()
+
+    with fake_redis_url() as redis_url:
+        asyncio.run(run(redis_url))
@@ -4,7 +4,7 @@ import json
 import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable
 import sys
 from pathlib import Path
 
@@ -23,15 +23,72 @@ except ImportError:
 # Импортируем Excel менеджер
 from .excel import ExcelReportManager
 
+# Атомарная замена записи задачи с сохранением score: если задачу уже
+# забрал обработчик (запись изменилась), ничего не делаем
+REPLACE_TASK_SCRIPT = """
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not score then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZADD', KEYS[1], score, ARGV[2])
+return 1
+"""
+
+# Атомарный перенос задачи: исходная запись удаляется из KEYS[1], новая
+# добавляется в KEYS[2] со score ARGV[3]. Если исходной записи уже нет
+# (задачу перезапустили или изменил другой процессор), ничего не делаем
+MOVE_TASK_SCRIPT = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[2])
+return 1
+"""
+
+# Сверка списка-сигнала с очередью: лишние сигналы удаляются, остается по одному
+# на каждую ожидающую задачу (не больше ARGV[1]). KEYS[1] - очередь, KEYS[2] - список
+SYNC_NOTIFY_SCRIPT = """
+redis.call('DEL', KEYS[2])
+local limit = tonumber(ARGV[1])
+local pending = 0
+for _, task_json in ipairs(redis.call('ZRANGE', KEYS[1], 0, -1)) do
+    local status = cjson.decode(task_json)['status']
+    if status == nil or status == 'pending' then
+        pending = pending + 1
+        if pending >= limit then
+            break
+        end
+    end
+end
+for _ = 1, pending do
+    redis.call('LPUSH', KEYS[2], '1')
+end
+return pending
+"""
+
 
 class PrintQueueManager:
     """Менеджер очереди печати с поддержкой нескольких принтеров"""
     
-    def __init__(self, redis_url: str = "redis://localhost:6379", excel_filename: str = "print_status_report.xlsx"):
+    def __init__(self, redis_url: str = "redis://localhost:6379", excel_filename: str = "print_status_report.xlsx",
+                 max_attempts: int = 5, retry_base_delay: float = 5, retry_max_delay: float = 300):
         self.redis_url = redis_url
         self.redis = None
         self.queue_name = "print_queue"
+        # Задачи, ожидающие повторной попытки (score = время готовности)
+        self.delayed_queue_name = "print_queue:delayed"
+        # Задачи, исчерпавшие лимит попыток
+        self.dead_letter_name = "dead_letter"
+        # Монотонно растущая версия состояния очереди (меняется при каждом изменении задач)
+        self.version_key = "print_queue:version"
+        # Список-сигнал для обработчиков: один элемент на каждую новую задачу
+        self.notify_key = "print_queue:notify"
+        self.notify_max_length = 1000
         self.printers_key = "available_printers"
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
         self.excel_manager = ExcelReportManager(excel_filename)
         
     async def connect(self):
@@ -70,11 +127,14 @@ class PrintQueueManager:
             "priority": priority,
             "status": "pending",
             "created_at": datetime.now().isoformat(),
-            "assigned_printer": None
+            "assigned_printer": None,
+            "attempts": 0
         }
         
         # Добавляем в очередь с приоритетом (меньше число = выше приоритет)
         await self.redis.zadd(self.queue_name, {json.dumps(task_data): priority})
+        await self._bump_version()
+        await self._notify()
         
         # Обновляем Excel отчет
         self.excel_manager.update_status(
@@ -89,23 +149,12 @@ class PrintQueueManager:
         if not self.redis:
             await self.connect()
             
-        # Получаем задачу с наивысшим приоритетом
-        tasks = await self.redis.zrange(self.queue_name, 0, 0, withscores=True)
-        
-        if not tasks:
-            return None
+        # Возвращаем в очередь задачи, у которых истекла задержка повтора
+        await self._promote_delayed_tasks()
             
-        task_json, score = tasks[0]
-        task_data = json.loads(task_json)
-        
-        # Помечаем задачу как назначенную
-        task_data["assigned_printer"] = printer_id
-        task_data["status"] = "printing"
-        task_data["assigned_at"] = datetime.now().isoformat()
-        
-        # Удаляем старую запись и добавляем обновленную
-        await self.redis.zrem(self.queue_name, task_json)
-        await self.redis.zadd(self.queue_name, {json.dumps(task_data): score})
+        task_data = await self._claim_pending_task(printer_id)
+        if not task_data:
+            return None
         
         # Обновляем Excel отчет
         self.excel_manager.update_status(
@@ -116,8 +165,69 @@ class PrintQueueManager:
         
         return task_data
         
-    async def mark_task_completed(self, task_id: str, printer_id: str):
-        """Пометить задачу как выполненную"""
+    async def _claim_pending_task(self, printer_id: str, batch_size: int = 20) -> Optional[Dict[str, Any]]:
+        """
+        Забирает ожидающую задачу с наивысшим приоритетом
+        
+        Задачи "Печатается" тоже лежат в очереди, поэтому она просматривается
+        порциями. Захват безопасен при нескольких обработчиках: задачу получает
+        только тот, чей zrem удалил исходную запись.
+        """
+        offset = 0
+        while True:
+            tasks = await self.redis.zrange(self.queue_name, offset, offset + batch_size - 1, withscores=True)
+            if not tasks:
+                return None
+                
+            for task_json, score in tasks:
+                task_data = json.loads(task_json)
+                if task_data.get("status", "pending") != "pending":
+                    continue
+                    
+                # zrem возвращает 0, если задачу уже забрал другой обработчик
+                if not await self.redis.zrem(self.queue_name, task_json):
+                    continue
+                    
+                # Помечаем задачу как назначенную
+                task_data["assigned_printer"] = printer_id
+                task_data["status"] = "printing"
+                task_data["assigned_at"] = datetime.now().isoformat()
+                
+                await self.redis.zadd(self.queue_name, {json.dumps(task_data): score})
+                await self._bump_version()
+                return task_data
+                
+            offset += batch_size
+        
+    async def update_task_fields(self, task_json: str, fields: Dict[str, Any]) -> bool:
+        """
+        Дополняет поля задачи, пока она лежит в очереди
+        
+        Args:
+            task_json: Текущая запись задачи в очереди
+            fields: Поля для обновления
+            
+        Returns:
+            bool: False, если запись уже изменилась (например, задачу забрал принтер)
+        """
+        if not self.redis:
+            await self.connect()
+            
+        task_data = json.loads(task_json)
+        task_data.update(fields)
+        replaced = await self.redis.eval(
+            REPLACE_TASK_SCRIPT, 1, self.queue_name, task_json, json.dumps(task_data)
+        )
+        return bool(replaced)
+        
+    async def mark_task_completed(self, task_id: str, printer_id: str, job_id: Optional[str] = None,
+                                  confirmed: bool = True):
+        """
+        Пометить задачу как выполненную (job_id - ID задания в спулере, если известен)
+        
+        confirmed=False - задание отправлено в спулер, но завершения не дождались
+        (процессор остановлен); повторная отправка напечатала бы этикетку дважды.
+        """
         if not self.redis:
             await self.connect()
             
@@ -131,12 +241,17 @@ class PrintQueueManager:
                 task_data["status"] = "completed"
                 task_data["completed_at"] = datetime.now().isoformat()
                 task_data["completed_by"] = printer_id
+                if job_id is not None:
+                    task_data["job_id"] = job_id
+                if not confirmed:
+                    task_data["unconfirmed"] = True
                 
                 # Сохраняем в выполненные задачи
                 await self.redis.zadd("completed_tasks", {json.dumps(task_data): score})
                 
                 # Удаляем из очереди
                 await self.redis.zrem(self.queue_name, task_json)
+                await self._bump_version()
                 
                 # Обновляем Excel отчет
                 self.excel_manager.update_status(
@@ -150,51 +265,358 @@ class PrintQueueManager:
         """Удалить задачу из очереди по task_id"""
         if not self.redis:
             await self.connect()
-        tasks = await self.redis.zrange(self.queue_name, 0, -1)
-        for task_json in tasks:
-            task = json.loads(task_json)
-            if task.get("id") == task_id:
-                await self.redis.zrem(self.queue_name, task_json)
-                return True
+        for queue_name in (self.queue_name, self.delayed_queue_name):
+            tasks = await self.redis.zrange(queue_name, 0, -1)
+            for task_json in tasks:
+                task = json.loads(task_json)
+                if task.get("id") == task_id:
+                    await self.redis.zrem(queue_name, task_json)
+                    await self._bump_version()
+                    return True
         return False
 
     async def restart_task(self, task_id: str) -> bool:
-        """Перезапустить задачу: удалить и добавить обратно со статусом pending и новым id"""
+        """
+        Перезапустить задачу: удалить и добавить обратно со статусом pending и новым id
+        
+        Задача, ожидающая повтора в print_queue:delayed, возвращается в очередь
+        печати сразу, не дожидаясь своего срока.
+        """
         if not self.redis:
             await self.connect()
-        tasks = await self.redis.zrange(self.queue_name, 0, -1, withscores=True)
-        for task_json, score in tasks:
-            task = json.loads(task_json)
-            if task.get("id") == task_id:
-                await self.redis.zrem(self.queue_name, task_json)
-                import uuid
+        for queue_name in (self.queue_name, self.delayed_queue_name):
+            tasks = await self.redis.zrange(queue_name, 0, -1, withscores=True)
+            for task_json, score in tasks:
+                task = json.loads(task_json)
+                if task.get("id") != task_id:
+                    continue
+                    
                 task["status"] = "pending"
                 task["assigned_printer"] = None
                 task["id"] = str(uuid.uuid4())
-                await self.redis.zadd(self.queue_name, {json.dumps(task): score})
+                task.pop("assigned_at", None)
+                if queue_name == self.delayed_queue_name:
+                    # Score отложенной задачи - время повтора, в очереди - приоритет
+                    task.pop("retry_at", None)
+                    score = task.get("priority", 1)
+                    
+                moved = await self.redis.eval(
+                    MOVE_TASK_SCRIPT, 2, queue_name, self.queue_name, task_json, json.dumps(task), score
+                )
+                if not moved:
+                    # Задачу успели изменить - ее уже нет в прежнем виде
+                    return False
+                await self._bump_version()
+                await self._notify()
                 return True
         return False
 
+    async def retry_task(self, task: Dict[str, Any], error: str = "", permanent: bool = False) -> str:
+        """
+        Обработать неудачную попытку печати задачи
+        
+        Задача удаляется из очереди и либо откладывается на повтор
+        с экспоненциальной задержкой, либо, после max_attempts неудач
+        (или при permanent=True), переносится в dead_letter.
+        
+        Args:
+            task: Данные задачи в том виде, в котором она была получена из get_next_task
+            error: Описание ошибки
+            permanent: Ошибка неустранима, повтор не имеет смысла
+            
+        Returns:
+            str: "retry" если задача отложена на повтор, "dead" если перенесена в dead_letter,
+                "stale" если записи "Печатается" уже нет (задачу перезапустили или вернули
+                в очередь) - тогда ничего не меняется
+        """
+        if not self.redis:
+            await self.connect()
+            
+        # Запись "Печатается", оставленная get_next_task, заменяется атомарно
+        task_json = json.dumps(task)
+        task = dict(task)
+        attempts = task.get("attempts", 0) + 1
+        task["attempts"] = attempts
+        task["last_error"] = error
+        task["assigned_printer"] = None
+        task.pop("assigned_at", None)
+        task.pop("retry_at", None)
+        
+        if permanent or attempts >= self.max_attempts:
+            task["status"] = "dead"
+            task["failed_at"] = datetime.now().isoformat()
+            if not await self._move_task(task_json, self.dead_letter_name, task, datetime.now().timestamp()):
+                return "stale"
+            
+            self.excel_manager.update_status(
+                str(task.get("order_id")), 
+                "Ошибка печати"
+            )
+            return "dead"
+            
+        # Экспоненциальная задержка: base, 2*base, 4*base ... но не больше retry_max_delay
+        delay = min(self.retry_base_delay * (2 ** (attempts - 1)), self.retry_max_delay)
+        retry_at = datetime.now().timestamp() + delay
+        task["status"] = "pending"
+        task["retry_at"] = datetime.fromtimestamp(retry_at).isoformat()
+        if not await self._move_task(task_json, self.delayed_queue_name, task, retry_at):
+            return "stale"
+        
+        self.excel_manager.update_status(
+            str(task.get("order_id")), 
+            "В очереди"
+        )
+        return "retry"
+
+    async def _move_task(self, task_json: str, target: str, task: Dict[str, Any], score: float) -> bool:
+        """Переносит запись задачи из очереди печати в target; False - записи уже нет"""
+        moved = await self.redis.eval(
+            MOVE_TASK_SCRIPT, 2, self.queue_name, target, task_json, json.dumps(task), score
+        )
+        if moved:
+            await self._bump_version()
+        return bool(moved)
+
+    async def _promote_delayed_tasks(self) -> int:
+        """Переносит задачи с истекшей задержкой повтора обратно в очередь печати"""
+        due_tasks = await self.redis.zrangebyscore(
+            self.delayed_queue_name, "-inf", datetime.now().timestamp()
+        )
+        
+        promoted = 0
+        for task_json in due_tasks:
+            task = json.loads(task_json)
+            # Перенос атомарный; 0 - задачу уже перенес другой процессор
+            if await self.redis.eval(
+                MOVE_TASK_SCRIPT, 2, self.delayed_queue_name, self.queue_name,
+                task_json, task_json, task.get("priority", 1)
+            ):
+                promoted += 1
+                
+        if promoted:
+            await self._bump_version()
+            await self._notify(promoted)
+        return promoted
+
+    async def get_dead_letter_tasks(self) -> List[Dict[str, Any]]:
+        """Получить задачи из dead_letter"""
+        if not self.redis:
+            await self.connect()
+        tasks = await self.redis.zrange(self.dead_letter_name, 0, -1)
+        return [json.loads(task_json) for task_json in tasks]
+
+    async def requeue_dead_tasks(self, task_ids: Optional[List[str]] = None) -> int:
+        """
+        Вернуть задачи из dead_letter в очередь печати со сброшенным счетчиком попыток
+        
+        Args:
+            task_ids: ID задач для возврата (если None, возвращаются все задачи)
+            
+        Returns:
+            int: Количество возвращенных задач
+        """
+        if not self.redis:
+            await self.connect()
+            
+        wanted = set(task_ids) if task_ids is not None else None
+        tasks = await self.redis.zrange(self.dead_letter_name, 0, -1)
+        
+        requeued = 0
+        pipe = self.redis.pipeline()
+        for task_json in tasks:
+            task = json.loads(task_json)
+            if wanted is not None and task.get("id") not in wanted:
+                continue
+                
+            pipe.zrem(self.dead_letter_name, task_json)
+            task["status"] = "pending"
+            task["attempts"] = 0
+            task["assigned_printer"] = None
+            for key in ("failed_at", "retry_at"):
+                task.pop(key, None)
+            pipe.zadd(self.queue_name, {json.dumps(task): task.get("priority", 1)})
+            requeued += 1
+            
+            self.excel_manager.update_status(
+                str(task.get("order_id")), 
+                "В очереди"
+            )
+            
+        if requeued:
+            pipe.incr(self.version_key)
+            await pipe.execute()
+            await self._notify(requeued)
+        return requeued
+
+    async def requeue_printing_tasks(self, printer_ids: Iterable[str]) -> int:
+        """
+        Вернуть в ожидание задачи "Печатается", назначенные принтерам
+        
+        Нужно, когда процессор, забравший задачи, завершился аварийно: его
+        задачи остались бы в статусе printing навсегда.
+        
+        Args:
+            printer_ids: Принтеры, задачи которых возвращаются
+            
+        Returns:
+            int: Количество возвращенных задач
+        """
+        if not self.redis:
+            await self.connect()
+            
+        printer_ids = set(printer_ids)
+        tasks = await self.redis.zrange(self.queue_name, 0, -1)
+        
+        printing = []
+        for task_json in tasks:
+            task = json.loads(task_json)
+            if task.get("status") == "printing" and task.get("assigned_printer") in printer_ids:
+                printing.append(task_json)
+        return await self._reset_to_pending(printing)
+
+    async def release_claimed_tasks(self, tasks: List[Dict[str, Any]]) -> int:
+        """
+        Вернуть в ожидание задачи, полученные из get_next_task, но не отправленные на печать
+        
+        Все задачи возвращаются одним запросом в Redis.
+        
+        Args:
+            tasks: Данные задач в том виде, в котором они были получены из get_next_task
+            
+        Returns:
+            int: Количество возвращенных задач
+        """
+        if not self.redis:
+            await self.connect()
+        return await self._reset_to_pending([json.dumps(task) for task in tasks])
+
+    async def _reset_to_pending(self, task_jsons: List[Any]) -> int:
+        """Заменяет записи задач "Печатается" на ожидающие (пропуская уже измененные записи)"""
+        if not task_jsons:
+            return 0
+            
+        orders = []
+        pipe = self.redis.pipeline()
+        for task_json in task_jsons:
+            task = json.loads(task_json)
+            task["status"] = "pending"
+            task["assigned_printer"] = None
+            task.pop("assigned_at", None)
+            # Замена только если запись не изменилась (задачу могли успеть завершить)
+            pipe.eval(REPLACE_TASK_SCRIPT, 1, self.queue_name, task_json, json.dumps(task))
+            orders.append(task.get("order_id"))
+            
+        replaced = await pipe.execute()
+        requeued = 0
+        for order_id, result in zip(orders, replaced):
+            if result:
+                requeued += 1
+                self.excel_manager.update_status(str(order_id), "В очереди")
+                
+        if requeued:
+            await self._bump_version()
+            await self._notify(requeued)
+        return requeued
+
+    async def _notify(self, count: int = 1):
+        """Будит до count обработчиков, ожидающих в wait_for_task"""
+        pipe = self.redis.pipeline()
+        pipe.lpush(self.notify_key, *(["1"] * min(count, self.notify_max_length)))
+        pipe.ltrim(self.notify_key, 0, self.notify_max_length - 1)
+        await pipe.execute()
+
+    async def sync_notifications(self) -> int:
+        """
+        Удаляет устаревшие сигналы о новых задачах
+        
+        Сигналы добавляются на каждую задачу, и если задачу забрал обработчик,
+        который не спал, сигнал остается в списке. Обработчик, разбуженный
+        впустую, вызывает этот метод: в списке остается по сигналу на каждую
+        ожидающую задачу, поэтому после всплеска задач остальные обработчики
+        не просыпаются по одному разу на каждый лишний сигнал. Удаление
+        и подсчет выполняются одним Lua-скриптом, так что сигнал задачи,
+        добавленной в это время, не теряется.
+        
+        Returns:
+            int: Число оставленных сигналов
+        """
+        if not self.redis:
+            await self.connect()
+            
+        return await self.redis.eval(
+            SYNC_NOTIFY_SCRIPT, 2, self.queue_name, self.notify_key, self.notify_max_length
+        )
+
+    async def wait_for_task(self, timeout: float = 30) -> bool:
+        """
+        Ожидает появления новой задачи (блокирующий BLPOP вместо опроса)
+        
+        Ожидание прерывается раньше timeout, если в отложенных повторах
+        есть задача, срок которой наступит раньше.
+        
+        Args:
+            timeout: Максимальное время ожидания в секундах
+            
+        Returns:
+            bool: True, если пришел сигнал о новой задаче
+        """
+        if not self.redis:
+            await self.connect()
+            
+        next_retry = await self.redis.zrange(self.delayed_queue_name, 0, 0, withscores=True)
+        if next_retry:
+            until_retry = next_retry[0][1] - datetime.now().timestamp()
+            timeout = max(0.01, min(timeout, until_retry))
+            
+        return await self.redis.blpop([self.notify_key], timeout=timeout) is not None
+
+    async def get_queue_length(self) -> int:
+        """Число задач в очереди печати (включая задачи "Печатается")"""
+        if not self.redis:
+            await self.connect()
+        return await self.redis.zcard(self.queue_name)
+
+    async def _bump_version(self) -> int:
+        """Увеличивает версию состояния очереди"""
+        return await self.redis.incr(self.version_key)
+
+    async def get_version(self) -> int:
+        """Текущая версия состояния очереди"""
+        if not self.redis:
+            await self.connect()
+        version = await self.redis.get(self.version_key)
+        return int(version) if version else 0
+
 
-async def add_orders_to_print_queue(redis_url: str = "redis://localhost:6379") -> List[str]:
+async def add_orders_to_print_queue(
+    redis_url: str = "redis://localhost:6379",
+    orders: Optional[List[Dict[str, Any]]] = None,
+    queue_manager: Optional[PrintQueueManager] = None,
+    base_print_path: str = "for_print"
+) -> List[str]:
     """
     Получает новые заказы, находит файлы печати и добавляет их в очередь на печать.
     
     Args:
         redis_url: URL подключения к Redis
+        orders: Заказы (по умолчанию запрашиваются новые заказы)
+        queue_manager: Менеджер очереди (по умолчанию создается для redis_url)
+        base_print_path: Папка с файлами печати по артикулам
         
     Returns:
         List[str]: Список ID задач, добавленных в очередь на печать
     """
     # Получаем новые заказы
-    orders_data = await mock_get_new_orders()
-    orders = orders_data.get("orders", [])
+    if orders is None:
+        orders_data = await mock_get_new_orders()
+        orders = orders_data.get("orders", [])
     
     added_tasks = []
-    base_print_path = Path("for_print")
+    base_print_path = Path(base_print_path)
     
     # Инициализируем менеджер очереди
-    queue_manager = PrintQueueManager(redis_url)
+    if queue_manager is None:
+        queue_manager = PrintQueueManager(redis_url)
     
     for order in orders:
         article = order.get("article")
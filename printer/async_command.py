@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Асинхронный запуск внешних команд (PowerShell, lp, lpstat)
+Не блокирует event loop, поддерживает таймауты, отмену
+и ограничение числа одновременно запущенных процессов
+"""
+
+import asyncio
+import locale
+import subprocess
+from typing import List, Optional
+
+
+# Максимальное число одновременно выполняемых команд
+MAX_CONCURRENT_COMMANDS = 4
+
+_semaphore: Optional[asyncio.Semaphore] = None
+_semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def set_max_concurrent_commands(limit: int):
+    """Изменяет ограничение числа одновременно выполняемых команд"""
+    global MAX_CONCURRENT_COMMANDS, _semaphore
+    MAX_CONCURRENT_COMMANDS = limit
+    _semaphore = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """Семафор текущего event loop (пересоздается при смене loop)"""
+    global _semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENT_COMMANDS)
+        _semaphore_loop = loop
+    return _semaphore
+
+
+def _decode(data: Optional[bytes]) -> str:
+    """Декодирует вывод так же, как subprocess.run(text=True)"""
+    if not data:
+        return ""
+    return data.decode(locale.getpreferredencoding(False), errors="replace")
+
+
+def _kill(process: asyncio.subprocess.Process):
+    """Завершает процесс, если он еще работает"""
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+
+async def run_command(cmd: List[str], timeout: float = 30, input: Optional[str] = None) -> subprocess.CompletedProcess:
+    """
+    Выполняет команду без блокировки event loop
+
+    Интерфейс повторяет subprocess.run(cmd, capture_output=True, text=True, timeout=...):
+    возвращается CompletedProcess, по таймауту выбрасывается subprocess.TimeoutExpired,
+    при отсутствии программы - FileNotFoundError. При таймауте или отмене
+    корутины процесс принудительно завершается.
+
+    Args:
+        cmd: Команда и аргументы
+        timeout: Таймаут выполнения в секундах
+        input: Данные для stdin
+
+    Returns:
+        subprocess.CompletedProcess: Результат выполнения
+    """
+    async with _get_semaphore():
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except NotImplementedError:
+            # Event loop без поддержки подпроцессов (SelectorEventLoop в Windows) -
+            # выполняем блокирующий вызов в отдельном потоке
+            return await asyncio.to_thread(
+                subprocess.run, cmd, capture_output=True, text=True, timeout=timeout, input=input
+            )
+
+        input_data = input.encode(locale.getpreferredencoding(False)) if input is not None else None
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(input_data), timeout)
+        except asyncio.TimeoutError:
+            _kill(process)
+            await process.wait()
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        except asyncio.CancelledError:
+            _kill(process)
+            raise
+
+    return subprocess.CompletedProcess(cmd, process.returncode, _decode(stdout), _decode(stderr))
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Интерфейс принтера с собственным способом печати
+Процессор работает с такими принтерами одинаково: отправляет файл,
+получает ID задания, ждет его завершения и спрашивает статус.
+Реализации: ZplPrinter (RAW 9100), IppPrinter (IPP), SimulatedPrinter (эмулятор)
+"""
+
+from typing import Optional
+
+
+class PrintJobError(RuntimeError):
+    """Задание не напечатано (отменено, прервано или замялась бумага)"""
+
+
+class PrintBackend:
+    """Базовый класс принтера для PrintProcessor.register_backend"""
+
+    async def print_file(self, file_path: str) -> Optional[str]:
+        """
+        Отправляет файл на печать
+
+        Returns:
+            Optional[str]: ID задания (None - завершение отследить нельзя)
+        """
+        raise NotImplementedError
+
+    async def wait_for_job(self, job_id: str, timeout: float = 60) -> bool:
+        """
+        Ожидает завершения задания
+
+        Returns:
+            bool: True - задание напечатано, False - нет подтверждения (таймаут)
+
+        Raises:
+            PrintJobError: Задание не напечатано
+        """
+        raise NotImplementedError
+
+    async def get_status(self) -> int:
+        """
+        Статус принтера в виде кода PrinterStatus
+
+        Returns:
+            int: 0 - готов, иначе код ошибки
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        """Освобождает соединения и фоновые задачи"""
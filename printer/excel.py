@@ -1,10 +1,12 @@
 import os
 import asyncio
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from openpyxl import Workbook
-from openpyxl.styles import PatternFill, Font, Alignment
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Iterable, AsyncIterator, Set
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill, Font, Alignment, NamedStyle
 from openpyxl.utils import get_column_letter
 
 import sys
@@ -13,14 +15,58 @@ from pathlib import Path
 # Добавляем корневую папку в путь для импортов
 sys.path.append(str(Path(__file__).parent.parent))
 
-from fetch_orders.mocks import mock_get_new_orders
+from printer.export import scan_tasks
+
+
+class _ReportFile:
+    """Блокировка файла отчета, общая для всех менеджеров процесса, и счетчик записей в него"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = 0
+
+
+# Путь к отчету -> общее состояние файла. В процессе работают несколько менеджеров
+# одного отчета (очередь веб-интерфейса, процессора, add_orders_to_print_queue):
+# чтение, изменение и сохранение файла выполняются под одной блокировкой
+_report_files: Dict[str, _ReportFile] = {}
+_report_files_lock = threading.Lock()
+
+
+def _report_file(filename: str) -> _ReportFile:
+    """Общее состояние файла отчета по его полному пути"""
+    path = os.path.realpath(filename)
+    with _report_files_lock:
+        report_file = _report_files.get(path)
+        if report_file is None:
+            report_file = _report_files[path] = _ReportFile()
+        return report_file
+
+
+def _save_workbook(workbook: Workbook, filename: str):
+    """Сохраняет книгу через временный файл: читатели не видят недописанный файл"""
+    tmp_filename = f"{filename}.saving.xlsx"
+    workbook.save(tmp_filename)
+    os.replace(tmp_filename, filename)
 
 
 class ExcelReportManager:
     """Менеджер для создания Excel отчетов по артикулам"""
     
-    def __init__(self, filename: str = "print_status_report.xlsx"):
+    def __init__(self, filename: str = "print_status_report.xlsx", flush_interval: float = 1.0):
         self.filename = filename
+        self.flush_interval = flush_interval
+        
+        # Индекс "ID заказа -> номер строки" вместо перебора всех строк
+        self._row_index: Dict[str, int] = {}
+        # Номер записи и время изменения файла, из которого построен индекс
+        # (None - индекс не строился)
+        self._indexed_state: Optional[Tuple[int, int]] = None
+        # Накопленные обновления статуса: ID заказа -> (статус, принтер)
+        self._pending_updates: Dict[str, Tuple[str, str]] = {}
+        self._writer_task: Optional[asyncio.Task] = None
+        # Сохранение, выполняющееся в отдельном потоке
+        self._save_future: Optional[asyncio.Future] = None
         self.workbook = Workbook()
         self.sheet = self.workbook.active
         if self.sheet:
@@ -34,17 +80,19 @@ class ExcelReportManager:
         # Настройка заголовков
         self._setup_headers()
         
+    HEADERS = [
+        "Артикул",
+        "ID заказа", 
+        "Статус печати",
+        "Дата создания",
+        "Приоритет",
+        "Принтер",
+        "Путь к файлу"
+    ]
+        
     def _setup_headers(self):
         """Настройка заголовков таблицы"""
-        headers = [
-            "Артикул",
-            "ID заказа", 
-            "Статус печати",
-            "Дата создания",
-            "Приоритет",
-            "Принтер",
-            "Путь к файлу"
-        ]
+        headers = self.HEADERS
         
         if self.sheet:
             for col, header in enumerate(headers, 1):
@@ -67,33 +115,13 @@ class ExcelReportManager:
         Returns:
             str: Путь к созданному файлу
         """
-        # Получаем заказы
-        orders_data = await mock_get_new_orders()
-        orders = orders_data.get("orders", [])
-        
-        # Получаем статус из Redis (если доступен)
-        print_status = await self._get_print_status_from_redis(redis_url)
+        # Получаем заказы и их статус из Redis (если доступен)
+        orders, print_status = await self._load_report_data(redis_url)
         
         row = 2  # Начинаем с 2-й строки (после заголовков)
         
-        for order in orders:
-            article = order.get("article", "")
-            order_id = order.get("id", "")
-            
-            # Проверяем статус печати
-            status = print_status.get(str(order_id), "Не распечатан")
-            is_printed = status == "Распечатан"
-            
-            # Данные для строки
-            row_data = [
-                article,
-                order_id,
-                status,
-                order.get("createdAt", ""),
-                order.get("priority", 1),
-                print_status.get(f"{order_id}_printer", ""),
-                f"for_print/{article}/ПЕЧАТЬ.png"
-            ]
+        for row_data in self._iter_report_rows(orders, print_status):
+            is_printed = row_data[2] == "Распечатан"
             
             # Заполняем строку
             if self.sheet:
@@ -108,46 +136,242 @@ class ExcelReportManager:
                             cell.fill = self.yellow_fill
                             
                     cell.alignment = Alignment(horizontal="left", vertical="center")
+                    
+                self._row_index[str(row_data[1])] = row
             
             row += 1
             
         # Сохраняем файл
-        self.workbook.save(self.filename)
+        with _report_file(self.filename).lock:
+            self._save()
+        return self.filename
+        
+    async def generate_streaming_report(self, redis_url: str = "redis://localhost:6379", chunk_size: int = 1000) -> str:
+        """
+        Генерирует Excel отчет в режиме write-only
+        
+        Строки формируются прямо из порций ZSCAN и сразу пишутся на диск,
+        стили задаются общими именованными стилями. В памяти, кроме текущей
+        порции, остаются только ID уже записанных заказов, поэтому строки
+        идут в порядке чтения из Redis, а не по дате создания. Запись
+        выполняется в отдельном потоке.
+        
+        Args:
+            redis_url: URL подключения к Redis
+            chunk_size: Размер порции ZSCAN
+            
+        Returns:
+            str: Путь к созданному файлу
+        """
+        loop = asyncio.get_running_loop()
+        chunks = self._scan_report_rows(redis_url, chunk_size)
+        try:
+            rows = self._iter_rows_from_loop(chunks, loop)
+            await asyncio.to_thread(self._write_streaming_report, rows, self.filename)
+        finally:
+            await chunks.aclose()
         return self.filename
         
-    async def _get_print_status_from_redis(self, redis_url: str) -> Dict[str, str]:
+    # Порядок чтения для потокового отчета: от самого "продвинутого" статуса,
+    # чтобы для заказа с несколькими задачами первой записывалась главная
+    STREAMING_KEYS = ["completed_tasks", "print_queue", "print_queue:delayed", "dead_letter"]
+        
+    async def _scan_report_rows(self, redis_url: str, chunk_size: int) -> AsyncIterator[List[List[Any]]]:
+        """Порции строк отчета, сформированные прямо из ZSCAN"""
+        try:
+            import redis.asyncio as redis
+            r = redis.from_url(redis_url)
+            await r.ping()
+        except Exception as e:
+            print(f"Ошибка при получении статуса из Redis: {e}")
+            return
+            
+        seen: Set[str] = set()
+        rows: List[List[Any]] = []
+        try:
+            for key in self.STREAMING_KEYS:
+                async for task_data, _ in scan_tasks(r, key, chunk_size):
+                    order_id = str(task_data.get("order_id", ""))
+                    if order_id in seen:
+                        continue
+                    seen.add(order_id)
+                    
+                    label, _ = self.TASK_STATUS_LABELS.get(
+                        task_data.get("status", "pending"), self.TASK_STATUS_LABELS["pending"]
+                    )
+                    article = task_data.get("article", "")
+                    rows.append([
+                        article,
+                        task_data.get("order_id", ""),
+                        label,
+                        task_data.get("created_at", ""),
+                        task_data.get("priority", 1),
+                        task_data.get("completed_by") or task_data.get("assigned_printer") or "",
+                        task_data.get("file_path") or f"for_print/{article}/ПЕЧАТЬ.png"
+                    ])
+                    if len(rows) >= chunk_size:
+                        yield rows
+                        rows = []
+            if rows:
+                yield rows
+        except Exception as e:
+            print(f"Ошибка при получении статуса из Redis: {e}")
+        finally:
+            await r.aclose()
+            
+    @staticmethod
+    def _iter_rows_from_loop(chunks: AsyncIterator[List[List[Any]]], loop: asyncio.AbstractEventLoop) -> Iterator[List[Any]]:
+        """Строки для потока записи: следующая порция читается в event loop по мере записи"""
+        while True:
+            try:
+                rows = asyncio.run_coroutine_threadsafe(chunks.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+            yield from rows
+            
+    def _iter_report_rows(self, orders: Iterable[Dict[str, Any]], print_status: Dict[str, str]) -> Iterator[List[Any]]:
+        """Генератор строк отчета"""
+        for order in orders:
+            article = order.get("article", "")
+            order_id = order.get("id", "")
+            
+            yield [
+                article,
+                order_id,
+                print_status.get(str(order_id), "Не распечатан"),
+                order.get("createdAt", ""),
+                order.get("priority", 1),
+                print_status.get(f"{order_id}_printer", ""),
+                order.get("file_path") or f"for_print/{article}/ПЕЧАТЬ.png"
+            ]
+            
+    def _write_streaming_report(self, rows: Iterable[List[Any]], filename: str):
+        """Пишет строки в write-only книгу (выполняется в отдельном потоке)"""
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Статус печати")
+        
+        # Именованные стили регистрируются один раз и разделяются всеми ячейками
+        header_style = NamedStyle(name="report_header")
+        header_style.fill = self.header_fill
+        header_style.font = Font(bold=True)
+        header_style.alignment = Alignment(horizontal="center")
+        
+        cell_style = NamedStyle(name="report_cell")
+        cell_style.alignment = Alignment(horizontal="left", vertical="center")
+        
+        printed_style = NamedStyle(name="report_printed")
+        printed_style.fill = self.green_fill
+        printed_style.alignment = cell_style.alignment
+        
+        pending_style = NamedStyle(name="report_pending")
+        pending_style.fill = self.yellow_fill
+        pending_style.alignment = cell_style.alignment
+        
+        for style in (header_style, cell_style, printed_style, pending_style):
+            workbook.add_named_style(style)
+            
+        for col in range(1, len(self.HEADERS) + 1):
+            sheet.column_dimensions[get_column_letter(col)].width = 15
+            
+        def styled(value: Any, style: str) -> WriteOnlyCell:
+            cell = WriteOnlyCell(sheet, value=value)
+            cell.style = style
+            return cell
+            
+        sheet.append([styled(header, "report_header") for header in self.HEADERS])
+        
+        # Строка сериализуется сразу при append, поэтому ячейки со стилем
+        # создаются один раз на колонку и переиспользуются для всех строк
+        row_cells = [styled(None, "report_cell") for _ in self.HEADERS]
+        printed_cell = styled(None, "report_printed")
+        pending_cell = styled(None, "report_pending")
+        
+        for row_data in rows:
+            row_cells[2] = printed_cell if row_data[2] == "Распечатан" else pending_cell
+            for cell, value in zip(row_cells, row_data):
+                cell.value = value
+            sheet.append(row_cells)
+            
+        report_file = _report_file(filename)
+        with report_file.lock:
+            _save_workbook(workbook, filename)
+            report_file.generation += 1
+        
+    # Статус задачи -> (статус в отчете, приоритет при нескольких задачах одного заказа)
+    TASK_STATUS_LABELS = {
+        "completed": ("Распечатан", 3),
+        "printing": ("Печатается", 2),
+        "pending": ("В очереди", 1),
+        "dead": ("Ошибка печати", 0)
+    }
+        
+    async def _get_print_status_from_redis(self, redis_url: str, chunk_size: int = 1000) -> Dict[str, str]:
         """Получает статус печати из Redis"""
+        _, status_dict = await self._load_report_data(redis_url, chunk_size)
+        return status_dict
+        
+    async def _load_report_data(self, redis_url: str, chunk_size: int = 1000) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        """
+        Получает заказы и их статус печати из Redis
+        
+        Очередь, отложенные повторы, dead_letter и выполненные задачи читаются
+        порциями через ZSCAN, список заказов и карта "заказ -> статус"
+        строятся за один проход.
+        
+        Returns:
+            Tuple[List[Dict[str, Any]], Dict[str, str]]: Заказы и карта статусов
+        """
         try:
             import redis.asyncio as redis
             r = redis.from_url(redis_url)
             await r.ping()
             
-            # Получаем все задачи из очереди
-            tasks = await r.zrange("print_queue", 0, -1, withscores=True)
+            keys = ["print_queue", "print_queue:delayed", "dead_letter", "completed_tasks"]
             
+            orders: Dict[str, Dict[str, Any]] = {}
             status_dict = {}
-            for task_json, score in tasks:
-                task_data = eval(task_json)  # Безопаснее использовать json.loads
-                order_id = str(task_data.get("order_id", ""))
-                status = task_data.get("status", "pending")
-                
-                if status == "completed":
-                    status_dict[order_id] = "Распечатан"
-                    status_dict[f"{order_id}_printer"] = task_data.get("assigned_printer", "")
-                else:
-                    status_dict[order_id] = "В очереди"
+            ranks: Dict[str, int] = {}
+            for key in keys:
+                async for task_data, score in scan_tasks(r, key, chunk_size):
+                    order_id = str(task_data.get("order_id", ""))
+                    label, rank = self.TASK_STATUS_LABELS.get(
+                        task_data.get("status", "pending"), self.TASK_STATUS_LABELS["pending"]
+                    )
+                    
+                    # Если по заказу несколько задач, показываем самый "продвинутый" статус
+                    if ranks.get(order_id, -1) >= rank:
+                        continue
+                    ranks[order_id] = rank
+                    status_dict[order_id] = label
+                    
+                    printer = task_data.get("completed_by") or task_data.get("assigned_printer")
+                    if printer:
+                        status_dict[f"{order_id}_printer"] = printer
+                        
+                    orders[order_id] = {
+                        "id": task_data.get("order_id", ""),
+                        "article": task_data.get("article", ""),
+                        "createdAt": task_data.get("created_at", ""),
+                        "priority": task_data.get("priority", 1),
+                        "file_path": task_data.get("file_path", "")
+                    }
                     
-            await r.close()
-            return status_dict
+            await r.aclose()
+            report_orders = sorted(orders.values(), key=lambda order: str(order["createdAt"]))
+            return report_orders, status_dict
             
         except Exception as e:
             print(f"Ошибка при получении статуса из Redis: {e}")
-            return {}
+            return [], {}
             
     def update_status(self, order_id: str, status: str, printer: str = ""):
         """
         Обновляет статус конкретного заказа в Excel
         
+        Внутри запущенного event loop обновление только ставится в очередь:
+        фоновая задача-писатель применяет накопленные изменения и сохраняет
+        файл не чаще одного раза за flush_interval.
+        
         Args:
             order_id: ID заказа
             status: Новый статус
@@ -156,40 +380,249 @@ class ExcelReportManager:
         if not self.sheet:
             return
             
-        # Ищем строку с заказом
-        for row in range(2, self.sheet.max_row + 1):
-            if self.sheet.cell(row=row, column=2).value == order_id:
-                # Обновляем статус
-                status_cell = self.sheet.cell(row=row, column=3, value=status)
+        order_id = str(order_id)
+        _, previous_printer = self._pending_updates.get(order_id, ("", ""))
+        self._pending_updates[order_id] = (status, printer or previous_printer)
+        
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Вызов вне event loop - сохраняем сразу
+            updates, self._pending_updates = self._pending_updates, {}
+            self._write_updates(updates)
+            return
+            
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._writer_loop())
+            
+    async def _writer_loop(self):
+        """Единственный писатель: сохраняет накопленные обновления раз в flush_interval"""
+        while self._pending_updates:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            
+    async def flush(self):
+        """Применяет накопленные обновления и сохраняет файл в отдельном потоке"""
+        # Прежнее сохранение могло продолжаться после отмены писателя
+        await self._wait_for_save()
+        if not self._pending_updates:
+            return
+            
+        updates, self._pending_updates = self._pending_updates, {}
+        self._save_future = asyncio.ensure_future(asyncio.to_thread(self._write_updates, updates))
+        try:
+            # shield: отмена писателя не прерывает запись файла, ее дождется close()
+            await asyncio.shield(self._save_future)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Ошибка при сохранении Excel отчета: {e}")
+            
+    async def _wait_for_save(self):
+        """Дожидается сохранения, начатого ранее"""
+        if self._save_future and not self._save_future.done():
+            await asyncio.gather(self._save_future, return_exceptions=True)
+            
+    async def close(self):
+        """Дожидается записи всех накопленных обновлений"""
+        if self._writer_task and not self._writer_task.done():
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+        self._writer_task = None
+        await self._wait_for_save()
+        await self.flush()
+        
+    def _write_updates(self, updates: Dict[str, Tuple[str, str]]) -> int:
+        """
+        Перечитывает отчет при необходимости, применяет обновления и сохраняет файл
+        
+        Все шаги выполняются под общей блокировкой файла, поэтому менеджеры
+        одного отчета не перезаписывают изменения друг друга.
+        
+        Returns:
+            int: Количество обновленных строк (0 - файл не сохранялся)
+        """
+        with _report_file(self.filename).lock:
+            self._load_index()
+            # Файл сохраняется, только если в нем есть строки обновленных заказов
+            applied = self._apply_updates(updates)
+            if applied:
+                self._save()
+            return applied
+        
+    def _file_state(self, report_file: _ReportFile) -> Tuple[int, int]:
+        return report_file.generation, os.stat(self.filename).st_mtime_ns
+        
+    def _save(self):
+        """Сохраняет книгу и запоминает состояние файла (вызывается под блокировкой файла)"""
+        report_file = _report_file(self.filename)
+        _save_workbook(self.workbook, self.filename)
+        report_file.generation += 1
+        self._indexed_state = self._file_state(report_file)
+        
+    def _load_index(self):
+        """
+        Загружает отчет с диска и строит индекс строк (вызывается под блокировкой файла)
+        
+        Файл перечитывается, только если в него записывали со времени
+        построения индекса (другой менеджер этого процесса или, например,
+        пересоздание отчета), - иначе сохранение книги из памяти затерло бы
+        чужие изменения.
+        """
+        if not os.path.exists(self.filename):
+            return
+        state = self._file_state(_report_file(self.filename))
+        if state == self._indexed_state:
+            return
+            
+        self.workbook = load_workbook(self.filename)
+        self.sheet = self.workbook.active
+        self._row_index = {}
+        for row, order_id in enumerate(self.sheet.iter_rows(min_row=2, min_col=2, max_col=2, values_only=True), 2):
+            if order_id[0] is not None:
+                self._row_index[str(order_id[0])] = row
+        self._indexed_state = state
+            
+    def _apply_updates(self, updates: Dict[str, Tuple[str, str]]) -> int:
+        """
+        Переносит обновления в лист
+        
+        Returns:
+            int: Количество обновленных строк
+        """
+        applied = 0
+        for order_id, (status, printer) in updates.items():
+            row = self._row_index.get(order_id)
+            if row is None:
+                continue
+            applied += 1
                 
-                # Применяем цвет
-                if status == "Распечатан":
-                    status_cell.fill = self.green_fill
-                else:
-                    status_cell.fill = self.yellow_fill
-                    
-                # Обновляем принтер
-                if printer:
-                    self.sheet.cell(row=row, column=6, value=printer)
-                    
-                break
+            # Обновляем статус
+            status_cell = self.sheet.cell(row=row, column=3, value=status)
+            
+            # Применяем цвет
+            if status == "Распечатан":
+                status_cell.fill = self.green_fill
+            else:
+                status_cell.fill = self.yellow_fill
+                
+            # Обновляем принтер
+            if printer:
+                self.sheet.cell(row=row, column=6, value=printer)
+                
+        return applied
+
+
+class ReportCache:
+    """
+    Кэш Excel отчета, привязанный к версии состояния очереди
+    
+    Отчет пересобирается только при изменении версии в Redis, а одновременные
+    запросы одной версии ожидают общую сборку. Обычный и потоковый отчеты
+    кэшируются отдельно. Файлы кэша отдельные от отчета, который ведет
+    PrintQueueManager: иначе запись статусов изменяла бы файл, не меняя
+    версию, и кэш отдавал бы чужое содержимое.
+    """
+    
+    def __init__(self, redis_url: str = "redis://localhost:6379",
+                 filename: str = "reports/print_status_report.xlsx",
+                 version_key: str = "print_queue:version"):
+        self.redis_url = redis_url
+        self.filename = filename
+        self.version_key = version_key
+        self.redis = None
+        
+        # Режим (streaming) -> версия очереди, для которой собран файл
+        self._cached_versions: Dict[bool, int] = {}
+        self._builds: Dict[Tuple[int, bool], asyncio.Task] = {}
+        self._build_lock = asyncio.Lock()
+        
+    def get_filename(self, streaming: bool = False) -> str:
+        """Файл кэша для режима сборки"""
+        if not streaming:
+            return self.filename
+        base, ext = os.path.splitext(self.filename)
+        return f"{base}_streaming{ext}"
+        
+    def _is_cached(self, version: int, streaming: bool) -> bool:
+        return self._cached_versions.get(streaming) == version and os.path.exists(self.get_filename(streaming))
+        
+    async def _get_version(self) -> int:
+        """Текущая версия состояния очереди"""
+        if not self.redis:
+            import redis.asyncio as redis
+            self.redis = redis.from_url(self.redis_url)
+        version = await self.redis.get(self.version_key)
+        return int(version) if version else 0
+        
+    async def get_report(self, streaming: bool = False) -> Tuple[str, int, bool]:
+        """
+        Возвращает отчет для текущей версии очереди
+        
+        Args:
+            streaming: Собирать отчет в write-only режиме
+            
+        Returns:
+            Tuple[str, int, bool]: Путь к файлу, версия, взят ли отчет из кэша
+        """
+        version = await self._get_version()
+        
+        if self._is_cached(version, streaming):
+            return self.get_filename(streaming), version, True
+            
+        build_key = (version, streaming)
+        build = self._builds.get(build_key)
+        if build is None:
+            build = asyncio.create_task(self._build(version, streaming))
+            self._builds[build_key] = build
+            build.add_done_callback(lambda _: self._builds.pop(build_key, None))
+            
+        # shield: отмена одного запроса не должна прерывать общую сборку
+        filename = await asyncio.shield(build)
+        return filename, version, False
+        
+    async def _build(self, version: int, streaming: bool) -> str:
+        """Собирает отчет во временный файл и атомарно подменяет кэшированный"""
+        filename = self.get_filename(streaming)
+        async with self._build_lock:
+            if self._is_cached(version, streaming):
+                return filename
                 
-        # Сохраняем изменения
-        self.workbook.save(self.filename)
+            os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+            tmp_filename = f"{filename}.{version}.tmp.xlsx"
+            manager = ExcelReportManager(tmp_filename)
+            if streaming:
+                await manager.generate_streaming_report(self.redis_url)
+            else:
+                await manager.generate_report(self.redis_url)
+            os.replace(tmp_filename, filename)
+            
+            # Во время сборки версия могла вырасти - тогда следующий запрос пересоберет отчет
+            cached_version = self._cached_versions.get(streaming)
+            if cached_version is None or version > cached_version:
+                self._cached_versions[streaming] = version
+            return filename
 
 
-async def create_print_status_report(redis_url: str = "redis://localhost:6379") -> str:
+async def create_print_status_report(redis_url: str = "redis://localhost:6379", streaming: bool = False) -> str:
     """
     Создает Excel отчет со статусом печати всех артикулов
     
     Args:
         redis_url: URL подключения к Redis
+        streaming: Использовать write-only режим для больших объемов заказов
         
     Returns:
         str: Путь к созданному файлу
     """
     manager = ExcelReportManager()
-    filename = await manager.generate_report(redis_url)
+    if streaming:
+        filename = await manager.generate_streaming_report(redis_url)
+    else:
+        filename = await manager.generate_report(redis_url)
     print(f"Отчет создан: {filename}")
     return filename
 
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Потоковая выгрузка задач печати из Redis в CSV / JSONL
+Задачи читаются порциями через курсор ZSCAN, поэтому выгрузка
+начинается сразу и не держит всю очередь в памяти
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, Any, Iterable, List, Optional, Tuple
+
+
+# Колонки CSV выгрузки
+EXPORT_FIELDS = [
+    "id",
+    "order_id",
+    "article",
+    "status",
+    "priority",
+    "created_at",
+    "assigned_printer",
+    "assigned_at",
+    "completed_at",
+    "completed_by",
+    "job_id",
+    "attempts",
+    "last_error",
+    "file_path"
+]
+
+
+async def scan_tasks(redis_client, key: str, count: int = 500) -> AsyncIterator[Tuple[Dict[str, Any], float]]:
+    """
+    Постранично читает задачи из sorted set через ZSCAN
+
+    Args:
+        redis_client: Асинхронный клиент Redis
+        key: Ключ sorted set (print_queue, completed_tasks, ...)
+        count: Размер порции
+
+    Yields:
+        Tuple[Dict[str, Any], float]: Данные задачи и ее score
+    """
+    cursor = 0
+    while True:
+        cursor, items = await redis_client.zscan(key, cursor, count=count)
+        for task_json, score in items:
+            yield json.loads(task_json), score
+        if cursor == 0:
+            break
+
+
+def _to_naive(value: datetime) -> datetime:
+    """Дата со смещением переводится в локальное время без смещения, как даты задач"""
+    if value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    """Разбирает дату фильтра в формате ISO (YYYY-MM-DD или полный datetime)"""
+    if not value:
+        return None
+    return _to_naive(datetime.fromisoformat(value))
+
+
+def parse_date_range(date_from: Optional[str], date_to: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Разбирает границы фильтра по дате
+
+    Даты со смещением (например, 2026-10-19T10:00:00+03:00) переводятся
+    в локальное время без смещения, в котором записаны даты задач.
+
+    Args:
+        date_from: Нижняя граница даты (включительно)
+        date_to: Верхняя граница даты (включительно)
+
+    Returns:
+        Tuple[Optional[datetime], Optional[datetime]]: Начало и конец интервала
+
+    Raises:
+        ValueError: Дата не в формате ISO
+    """
+    start = _parse_date(date_from)
+    end = _parse_date(date_to)
+    # Дата без времени в date_to означает "до конца дня"
+    if end and date_to and len(date_to) == 10:
+        end = end.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return start, end
+
+
+async def filter_tasks(
+    redis_client,
+    keys: Iterable[str],
+    date_field: str = "created_at",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    printer: Optional[str] = None,
+    count: int = 500
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Читает задачи из нескольких sorted set с фильтрами по дате и принтеру
+
+    Args:
+        redis_client: Асинхронный клиент Redis
+        keys: Ключи sorted set
+        date_field: Поле задачи, по которому фильтруется дата
+        date_from: Нижняя граница даты (включительно, см. parse_date_range)
+        date_to: Верхняя граница даты (включительно)
+        printer: Имя принтера (assigned_printer или completed_by)
+        count: Размер порции ZSCAN
+
+    Yields:
+        Dict[str, Any]: Данные задачи
+    """
+    start, end = parse_date_range(date_from, date_to)
+
+    for key in keys:
+        async for task, score in scan_tasks(redis_client, key, count):
+            if printer and printer not in (task.get("assigned_printer"), task.get("completed_by")):
+                continue
+
+            if start or end:
+                value = task.get(date_field)
+                if not value:
+                    continue
+                # Ошибка посреди выгрузки оборвала бы уже начатый ответ,
+                # поэтому задачи с нечитаемой датой пропускаются
+                try:
+                    task_date = _to_naive(datetime.fromisoformat(value))
+                except (TypeError, ValueError):
+                    continue
+                if start and task_date < start:
+                    continue
+                if end and task_date > end:
+                    continue
+
+            yield task
+
+
+async def iter_csv(tasks: AsyncIterator[Dict[str, Any]], fields: List[str] = EXPORT_FIELDS) -> AsyncIterator[str]:
+    """Форматирует поток задач в CSV построчно"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+
+    writer.writeheader()
+    yield buffer.getvalue()
+
+    async for task in tasks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(task)
+        yield buffer.getvalue()
+
+
+async def iter_jsonl(tasks: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Форматирует поток задач в JSON Lines"""
+    async for task in tasks:
+        yield json.dumps(task, ensure_ascii=False) + "\n"
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Состояние принтеров и автоматическое отключение неисправных
+Считаются ошибки печати подряд; после failure_threshold ошибок принтер
+отключается (размыкатель открыт) на время, которое удваивается с каждой
+следующей неудачей. После паузы принтер получает одну пробную задачу
+(остальные задачи ему не выдаются, пока она не завершится): успех
+возвращает его в работу, ошибка - отключает на более долгий срок.
+Состояние хранится в Redis, поэтому его видят веб-интерфейс и все процессоры
+"""
+
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent.parent))
+
+from printer.add_to_print import PrintQueueManager
+
+
+# Состояния размыкателя
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class PrinterHealth:
+    """Счетчики ошибок и размыкатель по каждому принтеру"""
+
+    def __init__(self, queue_manager: PrintQueueManager, failure_threshold: int = 3,
+                 base_cooldown: float = 10, max_cooldown: float = 600, health_key: str = "printer_health"):
+        """
+        Args:
+            queue_manager: Менеджер очереди печати (его подключение к Redis)
+            failure_threshold: Ошибок подряд, после которых принтер отключается
+            base_cooldown: Пауза после первого отключения в секундах
+            max_cooldown: Максимальная пауза в секундах
+            health_key: Хэш Redis: имя принтера -> состояние
+        """
+        self.queue_manager = queue_manager
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.health_key = health_key
+        # Последнее известное состояние принтеров, у которых были ошибки
+        self._states: Dict[str, Dict[str, Any]] = {}
+        # Выданные пробные задачи: имя принтера -> событие их завершения.
+        # Хранятся в процессе: принтером управляет только владелец блокировки
+        self._probes: Dict[str, asyncio.Event] = {}
+
+    async def _redis(self):
+        if not self.queue_manager.redis:
+            await self.queue_manager.connect()
+        return self.queue_manager.redis
+
+    async def load(self) -> Dict[str, Dict[str, Any]]:
+        """Загружает состояние всех принтеров из Redis (одна команда)"""
+        redis_client = await self._redis()
+        raw = await redis_client.hgetall(self.health_key)
+        self._states = {
+            (name.decode() if isinstance(name, bytes) else name): json.loads(data)
+            for name, data in raw.items()
+        }
+        return self._states
+
+    def state(self, printer_id: str, now: Optional[float] = None) -> str:
+        """Состояние размыкателя: closed - работает, open - отключен, half_open - ждет пробную задачу"""
+        health = self._states.get(printer_id)
+        if not health or health["consecutive_failures"] < self.failure_threshold:
+            return STATE_CLOSED
+        now = time.time() if now is None else now
+        return STATE_OPEN if now < health["open_until"] else STATE_HALF_OPEN
+
+    def is_open(self, printer_id: str) -> bool:
+        """Принтер отключен и задачи ему не выдаются"""
+        return self.state(printer_id) == STATE_OPEN
+
+    def start_probe(self, printer_id: str) -> bool:
+        """
+        Можно ли выдать принтеру задачу с учетом пробной задачи
+
+        В half_open выдача запоминается как пробная задача; следующие задачи
+        принтер получит только после end_probe.
+
+        Returns:
+            bool: False, если пробная задача принтера еще выполняется
+        """
+        if self.state(printer_id) != STATE_HALF_OPEN:
+            return True
+        if printer_id in self._probes:
+            return False
+        self._probes[printer_id] = asyncio.Event()
+        return True
+
+    def is_probing(self, printer_id: str) -> bool:
+        """Принтеру выдана пробная задача, и она еще не завершена"""
+        return printer_id in self._probes
+
+    def end_probe(self, printer_id: str):
+        """Пробная задача завершена (или не была получена из очереди)"""
+        probe = self._probes.pop(printer_id, None)
+        if probe:
+            probe.set()
+
+    async def wait_for_probe(self, printer_id: str, timeout: float):
+        """Ожидает завершения пробной задачи не дольше timeout секунд"""
+        probe = self._probes.get(printer_id)
+        if probe is None:
+            return
+        try:
+            await asyncio.wait_for(probe.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def cooldown(self, consecutive_failures: int) -> float:
+        """Пауза для данного числа ошибок подряд: base, 2*base, 4*base ... не больше max_cooldown"""
+        extra = max(0, consecutive_failures - self.failure_threshold)
+        return min(self.base_cooldown * (2 ** extra), self.max_cooldown)
+
+    async def record_failure(self, printer_id: str, error: str) -> Optional[float]:
+        """
+        Учитывает ошибку печати
+
+        Returns:
+            Optional[float]: Пауза в секундах, если принтер отключен (размыкатель открылся)
+        """
+        now = time.time()
+        health = dict(self._states.get(printer_id) or {"consecutive_failures": 0, "total_failures": 0})
+        health["consecutive_failures"] += 1
+        health["total_failures"] += 1
+        health["last_error"] = error
+        health["last_failure_at"] = datetime.fromtimestamp(now).isoformat()
+
+        cooldown = None
+        if health["consecutive_failures"] >= self.failure_threshold:
+            cooldown = self.cooldown(health["consecutive_failures"])
+            health["cooldown"] = cooldown
+            health["open_until"] = now + cooldown
+
+        self._states[printer_id] = health
+        redis_client = await self._redis()
+        await redis_client.hset(self.health_key, printer_id, json.dumps(health))
+        return cooldown
+
+    async def record_success(self, printer_id: str):
+        """Успешная печать сбрасывает счетчик ошибок (исправный принтер не пишет в Redis)"""
+        health = self._states.get(printer_id)
+        if not health or not health["consecutive_failures"]:
+            return
+        health = {key: value for key, value in health.items() if key not in ("cooldown", "open_until")}
+        health["consecutive_failures"] = 0
+        self._states[printer_id] = health
+        redis_client = await self._redis()
+        await redis_client.hset(self.health_key, printer_id, json.dumps(health))
+
+    async def reset(self, printer_id: str) -> bool:
+        """
+        Возвращает принтер в работу вручную и забывает его ошибки
+
+        Returns:
+            bool: False, если у принтера не было ошибок
+        """
+        self._states.pop(printer_id, None)
+        redis_client = await self._redis()
+        return bool(await redis_client.hdel(self.health_key, printer_id))
+
+    async def get_all(self) -> Dict[str, Dict[str, Any]]:
+        """Состояние принтеров с ошибками для API"""
+        await self.load()
+        now = time.time()
+        report = {}
+        for printer_id, health in sorted(self._states.items()):
+            state = self.state(printer_id, now)
+            report[printer_id] = {
+                **health,
+                "state": state,
+                "probing": self.is_probing(printer_id),
+                "retry_in": round(health["open_until"] - now, 1) if state == STATE_OPEN else 0,
+            }
+        return report
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+LRU кэш подготовленных к печати изображений
+Одна и та же этикетка артикула печатается сотни раз в день - вместо
+повторного Image.open + convert("RGB") + масштабирования берем готовый
+bitmap из памяти. Размер кэша ограничен в байтах
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+
+# Ограничение кэша по умолчанию - 256 МБ
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _image_size_bytes(image) -> int:
+    """Оценка занимаемой памяти: ширина x высота x число каналов"""
+    return image.width * image.height * len(image.getbands())
+
+
+def prepare_image(file_path: str, target_size: Optional[Tuple[int, int]] = None):
+    """
+    Загружает изображение и готовит его к печати
+
+    Args:
+        file_path: Путь к изображению
+        target_size: Область печати (ширина, высота) в точках принтера;
+            изображение больше области уменьшается с сохранением пропорций
+
+    Returns:
+        PIL.Image.Image: Изображение в RGB
+    """
+    with Image.open(file_path) as img:
+        bmp = img.convert("RGB")
+
+    if target_size:
+        max_width, max_height = target_size
+        if bmp.width > max_width or bmp.height > max_height:
+            scale = min(max_width / bmp.width, max_height / bmp.height)
+            new_size = (max(1, int(bmp.width * scale)), max(1, int(bmp.height * scale)))
+            bmp = bmp.resize(new_size, Image.LANCZOS)
+
+    return bmp
+
+
+class ImageCache:
+    """Потокобезопасный LRU кэш изображений с ограничением по байтам"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            max_bytes: Максимальный суммарный размер изображений в кэше
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: "OrderedDict[tuple, Tuple[Any, int]]" = OrderedDict()
+        # Печать через GDI идет в отдельных потоках (asyncio.to_thread)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(file_path: str, target_size: Optional[Tuple[int, int]] = None, dpi: Optional[int] = None) -> tuple:
+        """Ключ: путь + время изменения файла + параметры принтера"""
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, target_size, dpi)
+
+    def get(self, file_path: str, target_size: Optional[Tuple[int, int]] = None, dpi: Optional[int] = None):
+        """
+        Получить подготовленное изображение (из кэша или с диска)
+
+        Изображения из кэша общие - изменять их нельзя.
+
+        Args:
+            file_path: Путь к изображению
+            target_size: Область печати принтера (ширина, высота) в точках
+            dpi: Разрешение принтера
+
+        Returns:
+            PIL.Image.Image: Изображение в RGB
+        """
+        key = self.make_key(file_path, target_size, dpi)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Декодирование выполняем без блокировки - другие потоки могут брать готовые изображения
+        image = prepare_image(file_path, target_size)
+        size = _image_size_bytes(image)
+
+        with self._lock:
+            if size > self.max_bytes:
+                # Слишком большое изображение не кэшируем, чтобы не вытеснить все остальные
+                return image
+            if key in self._entries:
+                # Параллельный промах уже положил изображение в кэш
+                return self._entries[key][0]
+
+            self._entries[key] = (image, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+        return image
+
+    def clear(self):
+        """Очистить кэш (счетчики сохраняются)"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кэша для API"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+
+_cache: Optional[ImageCache] = None
+
+
+def get_image_cache() -> ImageCache:
+    """Общий кэш изображений процесса"""
+    global _cache
+    if _cache is None:
+        _cache = ImageCache()
+    return _cache
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Печать по протоколу IPP (CUPS или принтеры с поддержкой IPP)
+Задание отправляется операцией Print-Job через HTTP с keep-alive,
+из ответа берется job-id, а завершение отслеживается операцией
+Get-Job-Attributes с адаптивным интервалом опроса
+"""
+
+import asyncio
+import mimetypes
+import struct
+import sys
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import aiohttp
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent.parent))
+
+from printer.backend import PrintBackend, PrintJobError
+from printer.status_service import (
+    STATUS_READY, STATUS_PAUSED, STATUS_ERROR, STATUS_PAPER_OUT, STATUS_OFFLINE, STATUS_DOOR_OPEN
+)
+
+
+IPP_PORT = 631
+
+# Операции IPP
+OP_PRINT_JOB = 0x0002
+OP_GET_JOB_ATTRIBUTES = 0x0009
+OP_GET_PRINTER_ATTRIBUTES = 0x000B
+
+# Теги групп атрибутов
+TAG_OPERATION = 0x01
+TAG_JOB = 0x02
+TAG_END = 0x03
+TAG_PRINTER = 0x04
+TAG_UNSUPPORTED = 0x05
+
+# Теги значений
+TAG_INTEGER = 0x21
+TAG_BOOLEAN = 0x22
+TAG_ENUM = 0x23
+TAG_TEXT = 0x41
+TAG_NAME = 0x42
+TAG_KEYWORD = 0x44
+TAG_URI = 0x45
+TAG_CHARSET = 0x47
+TAG_LANGUAGE = 0x48
+TAG_MIME_TYPE = 0x49
+
+# Значения job-state
+JOB_PENDING = 3
+JOB_HELD = 4
+JOB_PROCESSING = 5
+JOB_STOPPED = 6
+JOB_CANCELED = 7
+JOB_ABORTED = 8
+JOB_COMPLETED = 9
+
+# Значения printer-state
+PRINTER_IDLE = 3
+PRINTER_PROCESSING = 4
+PRINTER_STOPPED = 5
+
+# printer-state-reasons -> код статуса (префикс причины, без суффикса -error/-warning)
+PRINTER_REASON_STATUSES = [
+    ("media-empty", STATUS_PAPER_OUT),
+    ("media-needed", STATUS_PAPER_OUT),
+    ("door-open", STATUS_DOOR_OPEN),
+    ("cover-open", STATUS_DOOR_OPEN),
+    ("media-jam", STATUS_ERROR),
+    ("offline", STATUS_OFFLINE),
+    ("shutdown", STATUS_OFFLINE),
+    ("paused", STATUS_PAUSED),
+]
+
+
+class IppError(RuntimeError):
+    """Ошибка протокола IPP или отказ принтера"""
+
+
+def _encode_attribute(tag: int, name: str, values) -> bytes:
+    """Атрибут IPP; для нескольких значений у следующих имя пустое"""
+    if not isinstance(values, (list, tuple)):
+        values = [values]
+
+    out = b""
+    for index, value in enumerate(values):
+        if tag in (TAG_INTEGER, TAG_ENUM):
+            data = struct.pack(">i", value)
+        elif tag == TAG_BOOLEAN:
+            data = b"\x01" if value else b"\x00"
+        else:
+            data = str(value).encode("utf-8")
+        attr_name = name.encode("utf-8") if index == 0 else b""
+        out += struct.pack(">BH", tag, len(attr_name)) + attr_name + struct.pack(">H", len(data)) + data
+    return out
+
+
+def encode_request(operation: int, request_id: int, attributes: List[Tuple[int, str, Any]],
+                   job_attributes: Optional[List[Tuple[int, str, Any]]] = None) -> bytes:
+    """
+    Кодирует запрос IPP 1.1
+
+    Args:
+        operation: Код операции
+        request_id: Номер запроса
+        attributes: Атрибуты операции (тег, имя, значение или список значений)
+        job_attributes: Атрибуты задания
+
+    Returns:
+        bytes: Заголовок и атрибуты запроса (без данных документа)
+    """
+    out = struct.pack(">BBHI", 1, 1, operation, request_id)
+    out += bytes([TAG_OPERATION])
+    for tag, name, value in attributes:
+        out += _encode_attribute(tag, name, value)
+    if job_attributes:
+        out += bytes([TAG_JOB])
+        for tag, name, value in job_attributes:
+            out += _encode_attribute(tag, name, value)
+    return out + bytes([TAG_END])
+
+
+def _decode_value(tag: int, data: bytes):
+    if tag in (TAG_INTEGER, TAG_ENUM) and len(data) == 4:
+        return struct.unpack(">i", data)[0]
+    if tag == TAG_BOOLEAN:
+        return data != b"\x00"
+    if 0x40 <= tag <= 0x4F:
+        return data.decode("utf-8", errors="replace")
+    return data
+
+
+def decode_message(data: bytes) -> Dict[str, Any]:
+    """
+    Разбирает сообщение IPP (ответ или запрос)
+
+    Returns:
+        Dict[str, Any]: version, code (status-code или operation-id), request_id,
+            groups - список (тег группы, {имя: значение или список значений}), data - документ
+    """
+    if len(data) < 9:
+        raise IppError("Слишком короткий ответ IPP")
+
+    major, minor, code, request_id = struct.unpack(">BBHI", data[:8])
+    groups: List[Tuple[int, Dict[str, Any]]] = []
+    current: Optional[Dict[str, Any]] = None
+    name = None
+    pos = 8
+
+    while pos < len(data):
+        tag = data[pos]
+        pos += 1
+        if tag == TAG_END:
+            break
+        if tag < 0x10:
+            current = {}
+            groups.append((tag, current))
+            continue
+
+        name_length = struct.unpack(">H", data[pos:pos + 2])[0]
+        pos += 2
+        if name_length:
+            name = data[pos:pos + name_length].decode("utf-8")
+        pos += name_length
+        value_length = struct.unpack(">H", data[pos:pos + 2])[0]
+        pos += 2
+        value = _decode_value(tag, data[pos:pos + value_length])
+        pos += value_length
+
+        if current is None:
+            raise IppError("Атрибут вне группы")
+        if name_length:
+            current[name] = value
+        else:
+            # Дополнительное значение предыдущего атрибута
+            previous = current[name]
+            current[name] = (previous if isinstance(previous, list) else [previous]) + [value]
+
+    return {
+        "version": (major, minor),
+        "code": code,
+        "request_id": request_id,
+        "groups": groups,
+        "data": data[pos:]
+    }
+
+
+def group_attributes(message: Dict[str, Any], group_tag: int) -> Dict[str, Any]:
+    """Атрибуты первой группы с указанным тегом"""
+    for tag, attributes in message["groups"]:
+        if tag == group_tag:
+            return attributes
+    return {}
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def document_format(file_path: str) -> str:
+    """MIME-тип документа (application/octet-stream - автоопределение на стороне принтера)"""
+    mime, _ = mimetypes.guess_type(file_path)
+    return mime or "application/octet-stream"
+
+
+class IppPrinter(PrintBackend):
+    """Принтер или очередь CUPS, доступные по IPP"""
+
+    def __init__(self, uri: str, user: str = "wb-print", timeout: float = 30.0,
+                 min_poll_interval: float = 0.25, max_poll_interval: float = 5.0):
+        """
+        Args:
+            uri: Адрес принтера (ipp://host:631/printers/NAME или http://...)
+            user: Имя пользователя в заданиях
+            timeout: Таймаут HTTP запроса в секундах
+            min_poll_interval: Начальный интервал опроса состояния задания
+            max_poll_interval: Максимальный интервал опроса
+        """
+        self.uri = uri
+        self.user = user
+        self.timeout = timeout
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+
+        # ipp:// - это HTTP, по умолчанию на порту 631
+        parsed = urlsplit(uri)
+        if parsed.scheme in ("ipp", "ipps"):
+            scheme = "https" if parsed.scheme == "ipps" else "http"
+            netloc = parsed.netloc if parsed.port else f"{parsed.netloc}:{IPP_PORT}"
+            self.url = urlunsplit((scheme, netloc, parsed.path, parsed.query, ""))
+        else:
+            self.url = uri
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._request_id = 0
+
+    @classmethod
+    def for_cups_queue(cls, printer_name: str, host: str = "localhost", port: int = IPP_PORT, **kwargs) -> "IppPrinter":
+        """Очередь локального (или удаленного) CUPS"""
+        return cls(f"ipp://{host}:{port}/printers/{printer_name}", **kwargs)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Одна сессия с keep-alive на все запросы к принтеру"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=4, keepalive_timeout=60)
+            )
+        return self._session
+
+    def _operation_attributes(self) -> List[Tuple[int, str, Any]]:
+        return [
+            (TAG_CHARSET, "attributes-charset", "utf-8"),
+            (TAG_LANGUAGE, "attributes-natural-language", "en"),
+            (TAG_URI, "printer-uri", self.uri),
+            (TAG_NAME, "requesting-user-name", self.user),
+        ]
+
+    async def request(self, operation: int, attributes: List[Tuple[int, str, Any]],
+                      document: bytes = b"") -> Dict[str, Any]:
+        """
+        Выполняет операцию IPP
+
+        Raises:
+            IppError: HTTP ошибка или status-code IPP не из класса successful
+        """
+        self._request_id += 1
+        body = encode_request(operation, self._request_id, self._operation_attributes() + attributes) + document
+
+        async with self._get_session().post(
+            self.url, data=body, headers={"Content-Type": "application/ipp"}
+        ) as response:
+            payload = await response.read()
+            if response.status != 200:
+                raise IppError(f"HTTP {response.status} от {self.url}")
+
+        message = decode_message(payload)
+        if message["code"] >= 0x0100:
+            raise IppError(f"Ошибка IPP 0x{message['code']:04x}")
+        return message
+
+    async def print_file(self, file_path: str) -> str:
+        """
+        Отправляет файл операцией Print-Job
+
+        Returns:
+            str: job-id, назначенный принтером
+        """
+        document = await asyncio.to_thread(Path(file_path).read_bytes)
+        message = await self.request(OP_PRINT_JOB, [
+            (TAG_NAME, "job-name", Path(file_path).name),
+            (TAG_MIME_TYPE, "document-format", document_format(file_path)),
+        ], document)
+
+        job_id = group_attributes(message, TAG_JOB).get("job-id")
+        if job_id is None:
+            raise IppError("В ответе Print-Job нет job-id")
+        return str(job_id)
+
+    async def get_job_state(self, job_id: str) -> Tuple[int, List[str]]:
+        """Состояние задания: job-state и job-state-reasons"""
+        message = await self.request(OP_GET_JOB_ATTRIBUTES, [
+            (TAG_INTEGER, "job-id", int(job_id)),
+            (TAG_KEYWORD, "requested-attributes", ["job-state", "job-state-reasons"]),
+        ])
+        attributes = group_attributes(message, TAG_JOB)
+        return attributes.get("job-state", 0), _as_list(attributes.get("job-state-reasons"))
+
+    async def wait_for_job(self, job_id: str, timeout: float = 60) -> bool:
+        """
+        Ожидает завершения задания
+
+        Интервал опроса растет, пока состояние не меняется, и сбрасывается
+        к минимальному при каждом изменении (pending -> processing).
+
+        Returns:
+            bool: True - задание напечатано, False - таймаут
+
+        Raises:
+            PrintJobError: Задание отменено или прервано
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        interval = self.min_poll_interval
+        last_state = None
+
+        while True:
+            state, reasons = await self.get_job_state(job_id)
+            if state == JOB_COMPLETED:
+                return True
+            if state in (JOB_CANCELED, JOB_ABORTED):
+                raise PrintJobError(f"Задание {job_id} не напечатано: {', '.join(reasons) or state}")
+
+            if state != last_state:
+                interval = self.min_poll_interval
+                last_state = state
+            else:
+                interval = min(interval * 2, self.max_poll_interval)
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(interval, remaining))
+
+    async def get_printer_attributes(self) -> Dict[str, Any]:
+        """printer-state, printer-state-reasons и printer-is-accepting-jobs"""
+        message = await self.request(OP_GET_PRINTER_ATTRIBUTES, [
+            (TAG_KEYWORD, "requested-attributes",
+             ["printer-state", "printer-state-reasons", "printer-is-accepting-jobs"]),
+        ])
+        return group_attributes(message, TAG_PRINTER)
+
+    async def get_status(self) -> int:
+        """
+        Статус принтера в виде кода PrinterStatus
+
+        Returns:
+            int: 0 - готов, иначе код ошибки
+        """
+        try:
+            attributes = await self.get_printer_attributes()
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+            return STATUS_OFFLINE
+        except IppError:
+            return STATUS_ERROR
+
+        # Предупреждения (-warning) не мешают печати
+        reasons = [
+            reason for reason in _as_list(attributes.get("printer-state-reasons"))
+            if reason != "none" and not reason.endswith("-warning")
+        ]
+        for prefix, status in PRINTER_REASON_STATUSES:
+            if any(reason.startswith(prefix) for reason in reasons):
+                return status
+
+        if attributes.get("printer-state") == PRINTER_STOPPED:
+            return STATUS_PAUSED
+        if attributes.get("printer-is-accepting-jobs") is False:
+            return STATUS_PAUSED
+        return STATUS_READY
+
+    async def close(self):
+        """Закрывает HTTP сессию"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Блокировки принтеров в Redis для нескольких процессоров печати
+Принтером управляет только процессор, владеющий его блокировкой. Блокировка
+выдается в аренду (SET NX PX) и продлевается в фоне; если процессор
+завершился или потерял связь, аренда истекает и принтер забирает другой
+"""
+
+import os
+import socket
+import sys
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent.parent))
+
+from printer.add_to_print import PrintQueueManager
+
+
+# Продление аренды, только если блокировка все еще наша
+RENEW_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Снятие блокировки, только если она все еще наша
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def make_owner_id() -> str:
+    """Уникальный ID процессора: хост, процесс и случайный суффикс"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class PrinterLocks:
+    """Арендуемые блокировки принтеров одного процессора"""
+
+    def __init__(self, queue_manager: PrintQueueManager, owner_id: Optional[str] = None,
+                 lease_time: float = 15.0, key_prefix: str = "printer_lock:"):
+        """
+        Args:
+            queue_manager: Менеджер очереди печати (его подключение к Redis)
+            owner_id: ID процессора (по умолчанию хост:pid:суффикс)
+            lease_time: Срок аренды в секундах; продлевать нужно чаще (renew_interval)
+            key_prefix: Префикс ключей блокировок
+        """
+        self.queue_manager = queue_manager
+        self.owner_id = owner_id or make_owner_id()
+        self.lease_time = lease_time
+        self.key_prefix = key_prefix
+        # Принтеры, блокировки которых принадлежат этому процессору
+        self.owned: Set[str] = set()
+
+    @property
+    def renew_interval(self) -> float:
+        """Продление трижды за срок аренды - один пропуск не теряет принтер"""
+        return self.lease_time / 3
+
+    def _key(self, printer_id: str) -> str:
+        return f"{self.key_prefix}{printer_id}"
+
+    async def _redis(self):
+        if not self.queue_manager.redis:
+            await self.queue_manager.connect()
+        return self.queue_manager.redis
+
+    async def acquire(self, printer_ids: Iterable[str]) -> Set[str]:
+        """
+        Забирает свободные принтеры и продлевает аренду своих (один запрос в Redis)
+
+        Args:
+            printer_ids: Принтеры, которыми процессор хочет управлять
+
+        Returns:
+            Set[str]: Принтеры из printer_ids, которыми управляет этот процессор
+        """
+        printer_ids = list(dict.fromkeys(printer_ids))
+        if not printer_ids:
+            return set()
+
+        redis_client = await self._redis()
+        lease_ms = int(self.lease_time * 1000)
+        pipe = redis_client.pipeline(transaction=False)
+        for printer_id in printer_ids:
+            if printer_id in self.owned:
+                pipe.eval(RENEW_LOCK_SCRIPT, 1, self._key(printer_id), self.owner_id, lease_ms)
+            else:
+                pipe.set(self._key(printer_id), self.owner_id, nx=True, px=lease_ms)
+        results = await pipe.execute()
+
+        acquired = {printer_id for printer_id, result in zip(printer_ids, results) if result}
+        self.owned -= set(printer_ids) - acquired
+        self.owned |= acquired
+        return acquired
+
+    async def renew(self) -> List[str]:
+        """
+        Продлевает аренду всех своих принтеров
+
+        Returns:
+            List[str]: Принтеры, блокировки которых потеряны (аренда истекла и принтер занят)
+        """
+        owned = list(self.owned)
+        if not owned:
+            return []
+        acquired = await self.acquire(owned)
+        return [printer_id for printer_id in owned if printer_id not in acquired]
+
+    async def release(self, printer_id: str):
+        """Освобождает принтер для других процессоров"""
+        if printer_id not in self.owned:
+            return
+        self.owned.discard(printer_id)
+        redis_client = await self._redis()
+        await redis_client.eval(RELEASE_LOCK_SCRIPT, 1, self._key(printer_id), self.owner_id)
+
+    async def release_all(self):
+        """Освобождает все принтеры процессора"""
+        for printer_id in list(self.owned):
+            await self.release(printer_id)
+
+    async def get_owners(self, printer_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Текущие владельцы принтеров (None - принтер свободен)"""
+        printer_ids = list(printer_ids)
+        if not printer_ids:
+            return {}
+        redis_client = await self._redis()
+        owners = await redis_client.mget([self._key(printer_id) for printer_id in printer_ids])
+        return {
+            printer_id: owner.decode() if isinstance(owner, bytes) else owner
+            for printer_id, owner in zip(printer_ids, owners)
+        }
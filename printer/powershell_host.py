@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Постоянный процесс PowerShell для запросов к принтерам
+Вместо запуска нового powershell на каждый Get-Printer / Get-PrintJob
+команды отправляются в уже запущенный процесс через stdin,
+а результат возвращается в виде JSON на stdout
+"""
+
+import asyncio
+import base64
+import json
+import platform
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent.parent))
+
+from printer.async_command import run_command
+
+
+# Префикс строки ответа: все остальные строки stdout (например, Write-Host) игнорируются
+RESPONSE_MARKER = "@@PSHOST@@"
+
+# Цикл внутри PowerShell: одна строка JSON запроса -> одна строка JSON ответа
+HOST_SCRIPT = r"""
+$ProgressPreference = 'SilentlyContinue'
+[Console]::OutputEncoding = New-Object System.Text.UTF8Encoding $false
+$stdin = [Console]::In
+while ($true) {
+    $line = $stdin.ReadLine()
+    if ($null -eq $line) { break }
+    if ($line.Trim() -eq '') { continue }
+    $request = $line | ConvertFrom-Json
+    $errs = $null
+    try {
+        $output = Invoke-Expression $request.command -ErrorVariable errs 2>$null | Out-String
+    } catch {
+        $output = ''
+        $errs = @($_)
+    }
+    if ($errs) { $code = 1; $stderr = ($errs | Out-String) } else { $code = 0; $stderr = '' }
+    $response = @{ id = $request.id; returncode = $code; stdout = $output; stderr = $stderr } | ConvertTo-Json -Compress
+    [Console]::Out.WriteLine('@@PSHOST@@' + $response)
+    [Console]::Out.Flush()
+}
+"""
+
+
+def default_host_argv() -> List[str]:
+    """Команда запуска PowerShell с циклом обработки запросов"""
+    encoded = base64.b64encode(HOST_SCRIPT.encode("utf-16-le")).decode("ascii")
+    return ["powershell", "-NoLogo", "-NoProfile", "-NonInteractive", "-EncodedCommand", encoded]
+
+
+class PowerShellHostError(RuntimeError):
+    """Процесс PowerShell завершился или нарушил протокол"""
+
+
+class PowerShellHost:
+    """Один долгоживущий процесс PowerShell, выполняющий команды по очереди"""
+
+    def __init__(self, argv: Optional[List[str]] = None):
+        self.argv = argv or default_host_argv()
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.restarts = 0
+        self._request_id = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        """Запускает процесс (перезапускает, если предыдущий завершился)"""
+        if self.process is not None:
+            self.restarts += 1
+        self.process = await asyncio.create_subprocess_exec(
+            *self.argv,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            # Вывод Get-Printer | ConvertTo-Json бывает больше стандартных 64 КБ на строку
+            limit=16 * 1024 * 1024
+        )
+
+    async def run(self, command: str, timeout: float = 30) -> subprocess.CompletedProcess:
+        """
+        Выполняет команду PowerShell в постоянном процессе
+
+        Args:
+            command: Текст команды
+            timeout: Таймаут выполнения в секундах
+
+        Returns:
+            subprocess.CompletedProcess: Результат в том же виде, что и у run_command
+        """
+        async with self._lock:
+            if not self.is_running:
+                await self.start()
+
+            self._request_id += 1
+            request_id = self._request_id
+            payload = json.dumps({"id": request_id, "command": command}) + "\n"
+
+            try:
+                self.process.stdin.write(payload.encode("utf-8"))
+                await self.process.stdin.drain()
+                response = await asyncio.wait_for(self._read_response(request_id), timeout)
+            except asyncio.TimeoutError:
+                # Состояние зависшего процесса неизвестно - перезапустим при следующем вызове
+                await self._kill()
+                raise subprocess.TimeoutExpired(command, timeout)
+            except (ConnectionError, PowerShellHostError) as e:
+                await self._kill()
+                raise PowerShellHostError(f"Процесс PowerShell завершился: {e}")
+
+        return subprocess.CompletedProcess(
+            command,
+            response.get("returncode", 1),
+            response.get("stdout") or "",
+            response.get("stderr") or ""
+        )
+
+    async def _read_response(self, request_id: int) -> dict:
+        """Читает stdout до ответа на запрос request_id"""
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                raise PowerShellHostError("неожиданный конец вывода")
+
+            text = line.decode("utf-8", errors="replace").strip()
+            if not text.startswith(RESPONSE_MARKER):
+                continue
+
+            response = json.loads(text[len(RESPONSE_MARKER):])
+            # Ответы на прерванные ранее запросы пропускаем
+            if response.get("id") == request_id:
+                return response
+
+    async def _kill(self):
+        """Принудительно завершает процесс"""
+        if self.is_running:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+            await self.process.wait()
+
+    async def close(self):
+        """Завершает процесс, закрыв его stdin"""
+        if not self.is_running:
+            return
+        try:
+            self.process.stdin.close()
+            await asyncio.wait_for(self.process.wait(), 2)
+        except (asyncio.TimeoutError, ConnectionError):
+            await self._kill()
+
+
+class PowerShellHostPool:
+    """Небольшой пул постоянных процессов PowerShell"""
+
+    def __init__(self, size: int = 2, argv: Optional[List[str]] = None):
+        self.hosts = [PowerShellHost(argv) for _ in range(size)]
+        self._idle: asyncio.Queue = asyncio.Queue()
+        for host in self.hosts:
+            self._idle.put_nowait(host)
+
+    async def run(self, command: str, timeout: float = 30) -> subprocess.CompletedProcess:
+        """Выполняет команду на первом свободном процессе пула"""
+        host = await self._idle.get()
+        try:
+            return await host.run(command, timeout)
+        finally:
+            self._idle.put_nowait(host)
+
+    @property
+    def restarts(self) -> int:
+        return sum(host.restarts for host in self.hosts)
+
+    async def close(self):
+        """Завершает все процессы пула"""
+        await asyncio.gather(*(host.close() for host in self.hosts))
+
+
+# Постоянные процессы используются только в Windows
+USE_POWERSHELL_HOST = platform.system() == "Windows"
+
+_pool: Optional[PowerShellHostPool] = None
+_pool_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_powershell_pool() -> PowerShellHostPool:
+    """Общий пул процессов PowerShell для текущего event loop"""
+    global _pool, _pool_loop
+    loop = asyncio.get_running_loop()
+    if _pool is None or _pool_loop is not loop:
+        _pool = PowerShellHostPool()
+        _pool_loop = loop
+    return _pool
+
+
+async def run_powershell(command: str, timeout: float = 10) -> subprocess.CompletedProcess:
+    """
+    Выполняет команду PowerShell
+
+    В Windows команда уходит в постоянный процесс из пула, иначе
+    запускается отдельный powershell -Command, как раньше.
+
+    Args:
+        command: Текст команды
+        timeout: Таймаут выполнения в секундах
+
+    Returns:
+        subprocess.CompletedProcess: Результат выполнения
+    """
+    if not USE_POWERSHELL_HOST:
+        return await run_command(["powershell", "-Command", command], timeout=timeout)
+    return await get_powershell_pool().run(command, timeout)
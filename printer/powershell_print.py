@@ -5,11 +5,18 @@
 """
 
 import os
+import asyncio
 import subprocess
 import platform
+import sys
 from pathlib import Path
 from typing import List, Dict, Optional
 
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent.parent))
+
+from printer.async_command import run_command
+
 
 class PowerShellPrinter:
     """Класс для работы с принтерами через PowerShell"""
@@ -17,7 +24,7 @@ class PowerShellPrinter:
     def __init__(self):
         self.available = platform.system() == "Windows"
         
-    def get_printers(self) -> List[Dict[str, str]]:
+    async def get_printers(self) -> List[Dict[str, str]]:
         """Получает список доступных принтеров через PowerShell"""
         if not self.available:
             return []
@@ -29,7 +36,7 @@ class PowerShellPrinter:
                 "Get-Printer | Select-Object Name, DriverName, PortName | ConvertTo-Json"
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+            result = await run_command(cmd, timeout=10)
             
             if result.returncode == 0:
                 import json
@@ -46,7 +53,7 @@ class PowerShellPrinter:
             print(f"❌ Ошибка получения списка принтеров: {e}")
             return []
             
-    def get_default_printer(self) -> Optional[str]:
+    async def get_default_printer(self) -> Optional[str]:
         """Получает имя принтера по умолчанию через PowerShell"""
         if not self.available:
             return None
@@ -59,14 +66,14 @@ class PowerShellPrinter:
                 "Get-Printer | Where-Object {$_.Default -eq $true} | Select-Object -ExpandProperty Name"
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+            result = await run_command(cmd, timeout=10)
             
             if result.returncode == 0 and result.stdout.strip():
                 return result.stdout.strip()
                 
             # Если не получилось, берем первый доступный принтер
             print("⚠️ Принтер по умолчанию не найден, используем первый доступный")
-            printers = self.get_printers()
+            printers = await self.get_printers()
             if printers:
                 return printers[0].get('Name', 'HP DeskJet 2300 series')
             else:
@@ -77,7 +84,7 @@ class PowerShellPrinter:
             print(f"❌ Ошибка получения принтера по умолчанию: {e}")
             return None
             
-    def print_file(self, file_path: str, printer_name: Optional[str] = None) -> bool:
+    async def print_file(self, file_path: str, printer_name: Optional[str] = None) -> bool:
         """
         Печатает файл через PowerShell
         
@@ -99,7 +106,7 @@ class PowerShellPrinter:
         try:
             # Определяем принтер
             if not printer_name:
-                printer_name = self.get_default_printer()
+                printer_name = await self.get_default_printer()
                 if not printer_name:
                     print("❌ Не найден принтер по умолчанию")
                     return False
@@ -132,7 +139,7 @@ class PowerShellPrinter:
             ]
             
             print(f"🔄 Выполняем команду PowerShell для печати...")
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+            result = await run_command(cmd, timeout=60)
             
             if result.returncode == 0:
                 print(f"✅ Файл отправлен на печать: {file_path}")
@@ -149,7 +156,7 @@ class PowerShellPrinter:
             print(f"❌ Ошибка печати: {e}")
             return False
             
-    def print_file_alternative(self, file_path: str, printer_name: Optional[str] = None) -> bool:
+    async def print_file_alternative(self, file_path: str, printer_name: Optional[str] = None) -> bool:
         """
         Альтернативный способ печати через rundll32
         
@@ -166,7 +173,7 @@ class PowerShellPrinter:
         try:
             # Определяем принтер
             if not printer_name:
-                printer_name = self.get_default_printer()
+                printer_name = await self.get_default_printer()
                 if not printer_name:
                     print("❌ Не найден принтер по умолчанию")
                     return False
@@ -181,7 +188,7 @@ class PowerShellPrinter:
                 printer_name
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            result = await run_command(cmd, timeout=30)
             
             if result.returncode == 0:
                 print(f"✅ Файл отправлен на печать (rundll32): {file_path}")
@@ -195,7 +202,7 @@ class PowerShellPrinter:
             return False
 
 
-def print_file_powershell(file_path: str, printer_name: Optional[str] = None) -> bool:
+async def print_file_powershell(file_path: str, printer_name: Optional[str] = None) -> bool:
     """
     Функция для печати файла через PowerShell
     
@@ -209,14 +216,14 @@ def print_file_powershell(file_path: str, printer_name: Optional[str] = None) ->
     printer = PowerShellPrinter()
     
     # Сначала пробуем PowerShell
-    if printer.print_file(file_path, printer_name):
+    if await printer.print_file(file_path, printer_name):
         return True
         
     # Если не получилось, пробуем альтернативный способ
-    return printer.print_file_alternative(file_path, printer_name)
+    return await printer.print_file_alternative(file_path, printer_name)
 
 
-def get_powershell_printers() -> List[Dict[str, str]]:
+async def get_powershell_printers() -> List[Dict[str, str]]:
     """
     Получает список принтеров через PowerShell
     
@@ -224,26 +231,29 @@ def get_powershell_printers() -> List[Dict[str, str]]:
         List[Dict[str, str]]: Список принтеров
     """
     printer = PowerShellPrinter()
-    return printer.get_printers()
+    return await printer.get_printers()
 
 
 if __name__ == "__main__":
-    # Тестирование
-    printer = PowerShellPrinter()
-    
-    print("📋 Доступные принтеры:")
-    printers = printer.get_printers()
-    for p in printers:
-        print(f"  - {p.get('Name', 'Unknown')} ({p.get('DriverName', 'Unknown')})")
+    async def main():
+        # Тестирование
+        printer = PowerShellPrinter()
+        
+        print("📋 Доступные принтеры:")
+        printers = await printer.get_printers()
+        for p in printers:
+            print(f"  - {p.get('Name', 'Unknown')} ({p.get('DriverName', 'Unknown')})")
+            
+        default = await printer.get_default_printer()
+        print(f"🖨️ Принтер по умолчанию: {default}")
         
-    default = printer.get_default_printer()
-    print(f"🖨️ Принтер по умолчанию: {default}")
+        # Тест печати
+        test_file = "for_print/test-article-001/ПЕЧАТЬ.png"
+        if os.path.exists(test_file):
+            print(f"🖨️ Тестируем печать: {test_file}")
+            success = await printer.print_file(test_file)
+            print(f"Результат: {'✅ Успешно' if success else '❌ Ошибка'}")
+        else:
+            print(f"❌ Тестовый файл не найден: {test_file}")
     
-    # Тест печати
-    test_file = "for_print/test-article-001/ПЕЧАТЬ.png"
-    if os.path.exists(test_file):
-        print(f"🖨️ Тестируем печать: {test_file}")
-        success = printer.print_file(test_file)
-        print(f"Результат: {'✅ Успешно' if success else '❌ Ошибка'}")
-    else:
-        print(f"❌ Тестовый файл не найден: {test_file}") 
\ No newline at end of file
+    asyncio.run(main())
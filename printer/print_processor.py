@@ -5,22 +5,39 @@
 """
 
 import asyncio
-import json
 import os
+import re
+import socket
 import subprocess
 import platform
+import time
+from collections import Counter, deque
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Set, Tuple
 import sys
 
 # Добавляем корневую папку в путь для импортов
 sys.path.append(str(Path(__file__).parent.parent))
 
 from printer.add_to_print import PrintQueueManager
+from printer.async_command import run_command
+from printer.image_cache import ImageCache, get_image_cache
+from printer.backend import PrintBackend, PrintJobError
+from printer.health import PrinterHealth
+from printer.ipp_printer import IppPrinter
+from printer.locks import PrinterLocks
+from printer.powershell_host import run_powershell
+from printer.printer_manager import PrinterManager
+from printer.registry import ProcessorRegistry
+from printer.render import RenderStage, PIL_AVAILABLE as RENDER_AVAILABLE
+from printer.scheduler import LoadAwareScheduler
+from printer.simulated_printer import create_simulated_printers
+from printer.status_service import PrinterStatusService, get_printer_status_service, STATUS_UNKNOWN
 
 # Импортируем модули для Windows печати
 try:
+    import win32con
     import win32print
     import win32ui
     from PIL import Image, ImageWin
@@ -40,62 +57,482 @@ except ImportError:
 class PrintProcessor:
     """Процессор для обработки задач печати"""
     
-    def __init__(self, redis_url: str = "redis://localhost:6379"):
+    def __init__(self, redis_url: str = "redis://localhost:6379", status_service: Optional[PrinterStatusService] = None,
+                 max_jobs_per_printer: int = 3, image_cache: Optional[ImageCache] = None,
+                 render_stage: Optional[RenderStage] = None, render: bool = True,
+                 use_cups_ipp: bool = False, scheduler: Optional[LoadAwareScheduler] = None,
+                 load_aware: bool = True, health: Optional[PrinterHealth] = None,
+                 locks: Optional[PrinterLocks] = None, registry: Optional[ProcessorRegistry] = None,
+                 drain_timeout: float = 30):
         self.queue_manager = PrintQueueManager(redis_url)
+        # Сколько заданий с известным ID может одновременно находиться в спулере одного принтера
+        self.max_jobs_per_printer = max_jobs_per_printer
+        self.image_cache = image_cache or get_image_cache()
         self.running = False
         self.printers = {}
+        # Рабочие задачи по принтерам: имя принтера -> asyncio.Task
+        self.workers: Dict[str, asyncio.Task] = {}
+        # Принтеры, которые по последней проверке готовы к работе
+        self.active_printers: Set[str] = set()
+        # Принтеры, чьи обработчики сейчас ждут новую задачу
+        self.idle_printers: Set[str] = set()
+        self.status_service = status_service or get_printer_status_service()
+        self.printer_manager = PrinterManager(redis_url, status_service=self.status_service)
+        # Подготовка файлов печати в пуле процессов, пока задачи ждут в очереди
+        if render_stage is None and render and RENDER_AVAILABLE:
+            render_stage = RenderStage(self.queue_manager)
+        self.render_stage = render_stage
+        self._render_task: Optional[asyncio.Task] = None
+        # Область печати и разрешение принтеров GDI: имя -> (ширина, высота, dpi)
+        self._printer_geometry: Dict[str, Tuple[int, int, int]] = {}
+        # Принтеры с собственным способом печати (например, RAW 9100): имя -> объект принтера
+        self.backends: Dict[str, PrintBackend] = {}
+        # Печать на очереди CUPS по IPP вместо lp (не в Windows)
+        self.use_cups_ipp = use_cups_ipp and platform.system() != "Windows"
+        # Выбор принтера по измеренной скорости (None - задачу берет первый свободный)
+        if scheduler is None and load_aware:
+            scheduler = LoadAwareScheduler()
+        self.scheduler = scheduler
+        # Ошибки печати по принтерам: неисправный принтер временно отключается
+        self.health = health or PrinterHealth(self.queue_manager)
+        # Блокировки принтеров: каждым принтером управляет один процессор
+        self.locks = locks or PrinterLocks(self.queue_manager)
+        self._lock_renewal: Optional[asyncio.Task] = None
+        # Регистрация в общем реестре процессоров (ID совпадает с владельцем блокировок)
+        self.registry = registry or ProcessorRegistry(self.queue_manager, self.locks.owner_id)
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        # Счетчики для реестра
+        self.started_at: Optional[str] = None
+        self.in_flight = 0
+        self.completed_count = 0
+        self.failed_count = 0
+        self.last_error: Optional[Dict[str, Any]] = None
+        self._completed_times: deque = deque()
+        # Остановка: сколько ждать отправленные задания и задачи, полученные обработчиками
+        self.drain_timeout = drain_timeout
+        self.last_drain: Optional[Dict[str, Any]] = None
+        self._claimed: Dict[str, Dict[str, Any]] = {}
+        self._stop_event: Optional[asyncio.Event] = None
+        self._stopped: Optional[asyncio.Event] = None
         
-    async def start_processing(self, check_interval: int = 5):
+    def register_backend(self, printer_id: str, backend: PrintBackend):
+        """
+        Назначает принтеру собственный способ печати
+        
+        Такие принтеры обрабатываются вместе с принтерами рабочей группы.
+        
+        Args:
+            printer_id: Имя принтера
+            backend: Объект принтера (ZplPrinter, IppPrinter, SimulatedPrinter)
+        """
+        self.backends[printer_id] = backend
+        
+    async def start_processing(self, check_interval: int = 5, idle_timeout: float = 30):
         """
         Запускает обработку очереди печати
         
+        Для каждого готового принтера запускается отдельный рабочий цикл,
+        который сам забирает задачи из очереди и печатает их. Супервизор
+        раз в check_interval обновляет список принтеров рабочей группы,
+        запуская и останавливая рабочие циклы.
+        
         Args:
-            check_interval: Интервал проверки новых задач в секундах
+            check_interval: Интервал проверки принтеров рабочей группы в секундах
+            idle_timeout: Максимальное ожидание сигнала о новой задаче при пустой очереди
         """
         self.running = True
+        self.started_at = datetime.now().isoformat()
+        self._stop_event = asyncio.Event()
+        self._stopped = asyncio.Event()
         print("🚀 Процессор печати запущен")
         
+        if self.render_stage:
+            self._render_task = asyncio.create_task(self.render_stage.run())
+        self._lock_renewal = asyncio.create_task(self._renew_printer_locks())
+        self._heartbeat_task = asyncio.create_task(self._send_heartbeats())
+            
+        drain_timeout = None
         try:
             while self.running:
-                await self._process_queue()
-                await asyncio.sleep(check_interval)
+                await self._supervise_workers(idle_timeout)
+                # stop() прерывает ожидание, не дожидаясь следующей проверки
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), check_interval)
+                except asyncio.TimeoutError:
+                    pass
         except KeyboardInterrupt:
             print("\n⏹️ Остановка процессора печати...")
             self.running = False
+        except asyncio.CancelledError:
+            self.running = False
+            # Отмена - быстрая остановка: отправленные задания не дожидаемся
+            drain_timeout = 0
+            raise
         except Exception as e:
             print(f"❌ Ошибка в процессоре: {e}")
             self.running = False
+        finally:
+            await self._stop_render_stage()
+            self.last_drain = await self._drain_workers(
+                self.drain_timeout if drain_timeout is None else drain_timeout
+            )
+            await self._release_printer_locks()
+            await self._unregister()
+            for backend in self.backends.values():
+                await backend.close()
+            await self.printer_manager.close()
+            # Записываем накопленные изменения статусов в Excel
+            await self.queue_manager.excel_manager.close()
+            self._stopped.set()
             
-    async def _process_queue(self):
-        """Обрабатывает очередь печати"""
+    async def _stop_render_stage(self):
+        """Останавливает подготовку файлов и завершает пул процессов"""
+        if not self.render_stage:
+            return
+        self.render_stage.stop()
+        if self._render_task:
+            self._render_task.cancel()
+            await asyncio.gather(self._render_task, return_exceptions=True)
+            self._render_task = None
+        self.render_stage.close()
+        
+    async def _supervise_workers(self, idle_timeout: float):
+        """Синхронизирует рабочие циклы со списком готовых принтеров"""
         # Получаем список доступных принтеров
         available_printers = await self._get_available_printers()
         
+        # Принтеры, которыми управляет другой процессор, пропускаем
+        previously_owned = set(self.locks.owned)
+        try:
+            owned = await self.locks.acquire(available_printers)
+        except Exception as e:
+            print(f"❌ Ошибка получения блокировок принтеров: {e}")
+            owned = set()
+            
+        # Задачи "Печатается" на только что полученных принтерах остались от процессора,
+        # который завершился аварийно (при штатной остановке он дожидается своих заданий)
+        acquired = {
+            printer_id for printer_id in owned - previously_owned
+            # Собственные задания еще печатаются, если аренда истекла при работающем обработчике
+            if printer_id not in self.workers or self.workers[printer_id].done()
+        }
+        if acquired:
+            try:
+                requeued = await self.queue_manager.requeue_printing_tasks(acquired)
+                if requeued:
+                    print(f"♻️ Возвращено в очередь задач прежнего владельца принтеров: {requeued}")
+            except Exception as e:
+                print(f"❌ Ошибка возврата задач прежнего владельца: {e}")
+        for printer_id in available_printers:
+            if printer_id not in owned:
+                print(f"🔒 Принтер {printer_id} обслуживает другой процессор")
+        available_printers = [printer_id for printer_id in available_printers if printer_id in owned]
+        self.active_printers = set(available_printers)
+        
         if not available_printers:
             print("⚠️ Нет доступных принтеров")
-            return
             
-        # Обрабатываем задачи для каждого принтера
+        # Принтеры, которые больше не готовы, завершат текущую задачу и остановятся сами,
+        # а простаивающие обработчики таких принтеров останавливаем сразу
+        for printer_id, worker in list(self.workers.items()):
+            if printer_id not in self.active_printers and printer_id in self.idle_printers:
+                worker.cancel()
+                
         for printer_id in available_printers:
-            task = await self.queue_manager.get_next_task(printer_id)
-            if task:
+            worker = self.workers.get(printer_id)
+            if worker is None or worker.done():
+                self.workers[printer_id] = asyncio.create_task(
+                    self._printer_worker(printer_id, idle_timeout)
+                )
+                
+    async def _renew_printer_locks(self):
+        """Продлевает аренду принтеров; потерянные принтеры останавливаются"""
+        while True:
+            await asyncio.sleep(self.locks.renew_interval)
+            try:
+                lost = await self.locks.renew()
+            except Exception as e:
+                print(f"❌ Ошибка продления блокировок принтеров: {e}")
+                continue
+            for printer_id in lost:
+                print(f"🔓 Принтер {printer_id} перешел к другому процессору")
+                # Обработчик остановится после текущих заданий, ожидающий задачу - сразу
+                self.active_printers.discard(printer_id)
+                worker = self.workers.get(printer_id)
+                if worker and printer_id in self.idle_printers:
+                    worker.cancel()
+                    
+    async def _release_printer_locks(self):
+        """Останавливает продление аренды и освобождает принтеры"""
+        if self._lock_renewal:
+            self._lock_renewal.cancel()
+            await asyncio.gather(self._lock_renewal, return_exceptions=True)
+            self._lock_renewal = None
+        try:
+            await self.locks.release_all()
+        except Exception as e:
+            print(f"❌ Ошибка освобождения блокировок принтеров: {e}")
+            
+    async def _send_heartbeats(self):
+        """Периодически обновляет запись процессора в реестре"""
+        while True:
+            try:
+                await self.registry.heartbeat(self.get_stats())
+            except Exception as e:
+                print(f"❌ Ошибка отправки heartbeat: {e}")
+            await asyncio.sleep(self.registry.heartbeat_interval)
+            
+    async def _unregister(self):
+        """Останавливает heartbeat и удаляет процессор из реестра"""
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+            self._heartbeat_task = None
+        try:
+            await self.registry.unregister()
+        except Exception as e:
+            print(f"❌ Ошибка удаления процессора из реестра: {e}")
+            
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Сведения о процессоре для реестра
+        
+        Returns:
+            Dict[str, Any]: Принтеры, задания в работе, задачи за последнюю минуту и последняя ошибка
+        """
+        now = time.monotonic()
+        while self._completed_times and now - self._completed_times[0] > 60:
+            self._completed_times.popleft()
+            
+        return {
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "running": self.running,
+            "printers": sorted(self.locks.owned),
+            "in_flight": self.in_flight,
+            "tasks_per_min": len(self._completed_times),
+            "completed": self.completed_count,
+            "failed": self.failed_count,
+            "last_error": self.last_error,
+        }
+        
+    async def _printer_worker(self, printer_id: str, idle_timeout: float):
+        """
+        Рабочий цикл принтера: забирает задачи из очереди и печатает их
+        
+        Args:
+            printer_id: ID принтера
+            idle_timeout: Максимальное ожидание сигнала о новой задаче при пустой очереди
+        """
+        print(f"▶️ Запущен обработчик принтера {printer_id}")
+        # Задания в спулере принтера, завершение которых отслеживается отдельно
+        slots = asyncio.Semaphore(self.max_jobs_per_printer)
+        in_flight: Set[asyncio.Task] = set()
+        # Обработчик проснулся по сигналу о новой задаче
+        woken = False
+        try:
+            while self.running and printer_id in self.active_printers:
+                await slots.acquire()
+                # Пока ждали свободный слот, процессор могли начать останавливать
+                if not (self.running and printer_id in self.active_printers):
+                    slots.release()
+                    break
+                if not await self._should_claim(printer_id):
+                    slots.release()
+                    # Другие принтеры закончат задачи раньше - ждем, пока оценки изменятся
+                    self.idle_printers.add(printer_id)
+                    try:
+                        await self.scheduler.wait_for_change(
+                            min(idle_timeout, self.scheduler.service_time(printer_id))
+                        )
+                    finally:
+                        self.idle_printers.discard(printer_id)
+                    continue
+                    
+                if not self.health.start_probe(printer_id):
+                    slots.release()
+                    # Принтер после паузы проверяется одной задачей - ждем ее результата
+                    self.idle_printers.add(printer_id)
+                    try:
+                        await self.health.wait_for_probe(printer_id, idle_timeout)
+                    finally:
+                        self.idle_printers.discard(printer_id)
+                    continue
+                    
+                task = await self.queue_manager.get_next_task(printer_id)
+                if not task:
+                    slots.release()
+                    self.health.end_probe(printer_id)
+                    if woken:
+                        # Сигнал оказался лишним: задачу забрал другой обработчик
+                        await self.queue_manager.sync_notifications()
+                    # Спим до сигнала о новой задаче, а не опрашиваем очередь
+                    self.idle_printers.add(printer_id)
+                    try:
+                        woken = await self.queue_manager.wait_for_task(idle_timeout)
+                    finally:
+                        self.idle_printers.discard(printer_id)
+                    continue
+                woken = False
+                    
                 print(f"🖨️ Принтер {printer_id} получил задачу: {task['id']}")
-                await self._print_task(task, printer_id)
+                # При остановке по этой записи задача возвращается в очередь или помечается выполненной
+                self._claimed[task["id"]] = {
+                    "task": task, "printer_id": printer_id, "submitted": False, "job_id": None,
+                    "probe": self.health.is_probing(printer_id)
+                }
+                submitted, job_id = await self._submit_task(task, printer_id)
+                
+                if submitted and job_id is not None:
+                    # Завершение отслеживается по ID задания - можно отправлять следующую задачу
+                    tracker = asyncio.create_task(self._complete_task(task, printer_id, job_id))
+                    in_flight.add(tracker)
+                    tracker.add_done_callback(in_flight.discard)
+                    tracker.add_done_callback(lambda _: slots.release())
+                    continue
+                    
+                if submitted:
+                    # ID задания неизвестен - ждем, пока спулер принтера опустеет
+                    await self._complete_task(task, printer_id, None)
+                slots.release()
+        except asyncio.CancelledError:
+            for tracker in in_flight:
+                tracker.cancel()
+            raise
+        except Exception as e:
+            print(f"❌ Ошибка в обработчике принтера {printer_id}: {e}")
+        finally:
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+            if self.workers.get(printer_id) is asyncio.current_task():
+                del self.workers[printer_id]
+                # Принтер больше не обслуживается - его может забрать другой процессор
+                if printer_id not in self.active_printers:
+                    try:
+                        await self.locks.release(printer_id)
+                    except Exception as e:
+                        print(f"❌ Ошибка освобождения принтера {printer_id}: {e}")
+            print(f"⏹️ Обработчик принтера {printer_id} остановлен")
+            
+    async def _should_claim(self, printer_id: str) -> bool:
+        """
+        Брать ли принтеру следующую задачу из очереди
+        
+        Принтер, который закончит ее раньше остальных, берет задачу сразу.
+        Более медленный - только если быстрые принтеры не успеют разобрать
+        очередь до того, как он сам закончит задачу.
+        """
+        if not self.scheduler:
+            return True
+            
+        printers = [name for name in self.workers if name in self.active_printers]
+        ahead = self.scheduler.tasks_ahead(printer_id, printers)
+        if ahead == 0:
+            return True
+            
+        try:
+            pending = await self.queue_manager.get_queue_length() - self.scheduler.in_flight_count()
+        except Exception as e:
+            print(f"⚠️ Не удалось получить длину очереди: {e}")
+            return True
+        return pending > ahead
+        
+    async def _drain_workers(self, timeout: float) -> Dict[str, Any]:
+        """
+        Останавливает все рабочие циклы принтеров
+        
+        Новые задачи уже не берутся; отправленные задания дожидаются не дольше
+        timeout. Затем обработчики прерываются: задачи, полученные, но не
+        отправленные на печать, одним запросом возвращаются в очередь, а
+        отправленные без подтверждения помечаются выполненными без подтверждения -
+        повторная отправка напечатала бы этикетку дважды.
+        
+        Args:
+            timeout: Сколько ждать текущие задания в секундах (0 - прервать сразу)
+            
+        Returns:
+            Dict[str, Any]: Отчет об остановке
+        """
+        started = time.monotonic()
+        completed_before = self.completed_count
+        workers = list(self.workers.values())
+        for printer_id, worker in list(self.workers.items()):
+            # Ожидающие новую задачу обработчики прерываем сразу
+            if printer_id in self.idle_printers:
+                worker.cancel()
+                
+        interrupted = 0
+        claimed = []
+        if workers:
+            _, pending = await asyncio.wait(workers, timeout=timeout)
+            # Задачи прерываемых обработчиков запоминаем до отмены
+            claimed = list(self._claimed.values()) if pending else []
+            for worker in pending:
+                worker.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            interrupted = len(pending)
+        self.workers.clear()
+        for task_id in list(self._claimed):
+            self._release_claim(task_id)
+        
+        unstarted = [entry["task"] for entry in claimed if not entry["submitted"]]
+        unconfirmed = [entry for entry in claimed if entry["submitted"]]
+        requeued = 0
+        try:
+            requeued = await self.queue_manager.release_claimed_tasks(unstarted)
+        except Exception as e:
+            print(f"❌ Ошибка возврата задач в очередь: {e}")
+        for entry in unconfirmed:
+            try:
+                await self.queue_manager.mark_task_completed(
+                    entry["task"]["id"], entry["printer_id"], entry["job_id"], confirmed=False
+                )
+            except Exception as e:
+                print(f"❌ Ошибка завершения задачи {entry['task']['id']}: {e}")
                 
+        report = {
+            "duration_s": round(time.monotonic() - started, 3),
+            "completed": self.completed_count - completed_before,
+            "interrupted_workers": interrupted,
+            "requeued": requeued,
+            "unconfirmed": len(unconfirmed),
+        }
+        print(f"⏹️ Остановка за {report['duration_s']} с: завершено {report['completed']}, "
+              f"возвращено в очередь {requeued}, без подтверждения {len(unconfirmed)}")
+        return report
+        
     async def _get_available_printers(self) -> List[str]:
         """Получает список доступных принтеров из рабочей группы"""
         try:
             # Импортируем PrinterManager для получения принтеров из рабочей группы
-            from .printer_manager import PrinterManager
+            try:
+                workgroup_printers = await self.printer_manager.get_workgroup_printers("wb_print_group")
+            except Exception as e:
+                # Принтеры с собственным способом печати работают и без рабочей группы
+                print(f"Ошибка при получении принтеров из рабочей группы: {e}")
+                workgroup_printers = []
+            printer_names = [printer.get("name", "") for printer in workgroup_printers]
+            if self.use_cups_ipp:
+                for printer_name in printer_names:
+                    if printer_name and printer_name not in self.backends:
+                        self.register_backend(printer_name, IppPrinter.for_cups_queue(printer_name))
+            printer_names += [name for name in self.backends if name not in printer_names]
             
-            printer_manager = PrinterManager()
-            workgroup_printers = await printer_manager.get_workgroup_printers("wb_print_group")
+            try:
+                await self.health.load()
+            except Exception as e:
+                print(f"⚠️ Не удалось получить состояние принтеров: {e}")
             
             available = []
-            for printer in workgroup_printers:
-                printer_name = printer.get("name", "")
+            for printer_name in printer_names:
                 
-                # Получаем актуальный статус принтера из системы
+                # Принтер с серией ошибок пропускаем до окончания паузы
+                if self.health.is_open(printer_name):
+                    print(f"🚫 Принтер {printer_name} отключен после ошибок печати")
+                    continue
+                    
+                # Статус берется из общего снимка статусов всех принтеров
                 current_status = await self._get_printer_status(printer_name)
                 
                 # Проверяем статус принтера
@@ -108,176 +545,316 @@ class PrintProcessor:
             if not available:
                 print("⚠️ Нет доступных принтеров в рабочей группе")
                 
+            await self._update_render_stage(available)
             return available
         except Exception as e:
             print(f"Ошибка при получении принтеров из рабочей группы: {e}")
             return []
             
-    async def _get_printer_status(self, printer_name: str) -> int:
-        """Получает актуальный статус принтера из системы"""
-        try:
-            cmd = [
-                "powershell", 
-                "-Command", 
-                f"Get-Printer -Name '{printer_name}' | Select-Object -ExpandProperty PrinterStatus"
-            ]
+    async def _update_render_stage(self, printer_names: List[str]):
+        """
+        Настраивает подготовку файлов под готовые принтеры
+        
+        Подготовленный файл нужен только принтерам, печатающим через спулер ОС:
+        если все принтеры со своим способом печати (ZPL/EPL/IPP), подготовка
+        выключается. В Windows файлы готовятся под область печати и разрешение
+        большинства принтеров GDI, чтобы при печати не масштабировать их снова.
+        """
+        if not self.render_stage:
+            return
+        spooler_printers = [name for name in printer_names if name not in self.backends]
+        self.render_stage.enabled = bool(spooler_printers)
+        if not spooler_printers or platform.system() != "Windows" or not WINDOWS_PRINT_AVAILABLE:
+            return
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+        for printer_name in spooler_printers:
+            if printer_name in self._printer_geometry:
+                continue
+            try:
+                self._printer_geometry[printer_name] = await asyncio.to_thread(self._get_gdi_geometry, printer_name)
+            except Exception as e:
+                print(f"⚠️ Не удалось получить область печати принтера {printer_name}: {e}")
+                
+        geometries = Counter(
+            self._printer_geometry[name] for name in spooler_printers if name in self._printer_geometry
+        )
+        if geometries:
+            (width, height, dpi), _ = geometries.most_common(1)[0]
+            self.render_stage.set_target((width, height), dpi)
             
-            if result.returncode == 0:
-                status_str = result.stdout.strip()
-                # Новая логика: если строка, проверяем на 'normal', 'idle', 'ready'
-                try:
-                    return int(status_str)
-                except ValueError:
-                    status_str_l = status_str.lower()
-                    if status_str_l in ["normal", "idle", "ready"]:
-                        return 0
-                    print(f"⚠️ Неизвестный статус принтера: {status_str}")
-                    return 999  # Неизвестный статус
-            else:
-                print(f"❌ Ошибка получения статуса принтера {printer_name}: {result.stderr}")
-                return 999
+    def _rendered_for(self, printer_id: str, task: Dict[str, Any]) -> bool:
+        """Подготовленный файл задачи подходит принтеру (файл без размеров подходит всем)"""
+        render_target = task.get("render_target")
+        if not render_target:
+            return True
+        return self._printer_geometry.get(printer_id) == tuple(render_target)
+        
+    async def _get_printer_status(self, printer_name: str) -> int:
+        """Получает статус принтера из кэшированного снимка статусов системы"""
+        try:
+            backend = self.backends.get(printer_name)
+            if backend is not None:
+                return await backend.get_status()
+                
+            status = await self.status_service.get_status(printer_name)
+            if status == STATUS_UNKNOWN:
+                print(f"⚠️ Неизвестный статус принтера: {printer_name}")
+            return status
                 
         except Exception as e:
             print(f"❌ Ошибка получения статуса принтера {printer_name}: {e}")
-            return 999
+            return STATUS_UNKNOWN
             
-    async def _print_task(self, task: Dict[str, Any], printer_id: str):
+    async def _submit_task(self, task: Dict[str, Any], printer_id: str) -> Tuple[bool, Optional[str]]:
         """
-        Выполняет печать задачи
+        Отправляет задачу в спулер принтера
+        
+        При ошибке задача возвращается в очередь (или переносится в dead_letter).
         
         Args:
             task: Данные задачи
             printer_id: ID принтера
+            
+        Returns:
+            Tuple[bool, Optional[str]]: Отправлена ли задача и ID задания в спулере (если известен)
         """
         file_path = task.get("file_path")
         task_id = task.get("id")
         
         if not file_path or not os.path.exists(file_path):
             print(f"❌ Файл не найден: {file_path}")
-            if task_id:
-                await self.queue_manager.mark_task_completed(task_id, printer_id)
-            return
+            # Повтор не поможет - сразу переносим задачу в dead_letter
+            await self._return_task_to_queue(task, f"Файл не найден: {file_path}", permanent=True)
+            self._release_claim(task_id)
+            return False, None
+            
+        # Файл, подготовленный заранее, если он еще на месте. Он в формате спулера ОС;
+        # принтеры со своим способом печати (register_backend) получают исходный файл
+        rendered_path = task.get("rendered_path")
+        prerendered = bool(
+            printer_id not in self.backends and rendered_path and os.path.exists(rendered_path)
+            and self._rendered_for(printer_id, task)
+        )
+        if prerendered:
+            file_path = rendered_path
             
         try:
             print(f"🖨️ Печатаем файл: {file_path} на принтере {printer_id}")
             
             # Запускаем печать
-            success = await self._print_file(file_path, printer_id)
+            success, job_id = await self._print_file(file_path, printer_id, prerendered)
             
             if success:
-                # Ждем завершения печати
-                if task_id:
-                    print(f"⏳ Ожидаем завершения печати: {task_id}")
-                    await self._wait_for_print_completion(printer_id, str(task_id))
-                    
-                    print(f"✅ Печать завершена: {task_id}")
-                    await self.queue_manager.mark_task_completed(task_id, printer_id)
-            else:
-                print(f"❌ Ошибка печати: {task_id}")
-                # Возвращаем задачу в очередь
-                await self._return_task_to_queue(task)
+                self.in_flight += 1
+                claim = self._claimed.get(task_id)
+                if claim:
+                    claim["submitted"] = True
+                    claim["job_id"] = job_id
+                if self.scheduler:
+                    self.scheduler.on_submit(printer_id, task)
+                return True, job_id
+                
+            print(f"❌ Ошибка печати: {task_id}")
+            error = f"Ошибка печати на принтере {printer_id}"
                 
         except Exception as e:
             print(f"❌ Ошибка при печати: {e}")
-            await self._return_task_to_queue(task)
+            error = str(e)
+            
+        # Возвращаем задачу в очередь
+        await self._record_printer_failure(printer_id, error)
+        await self._return_task_to_queue(task, error)
+        self._release_claim(task_id)
+        return False, None
+            
+    def _release_claim(self, task_id: str):
+        """Задача больше не числится за процессором; завершенная пробная задача снимает блокировку принтера"""
+        claim = self._claimed.pop(task_id, None)
+        if claim and claim.get("probe"):
+            self.health.end_probe(claim["printer_id"])
+            
+    async def _complete_task(self, task: Dict[str, Any], printer_id: str, job_id: Optional[str]):
+        """
+        Ожидает завершения задания и помечает задачу выполненной
+        
+        Args:
+            task: Данные задачи
+            printer_id: ID принтера
+            job_id: ID задания в спулере (None - ждем, пока спулер опустеет)
+        """
+        task_id = task.get("id")
+        if not task_id:
+            self.in_flight -= 1
+            return
+            
+        printed = False
+        try:
+            # Ждем завершения печати
+            print(f"⏳ Ожидаем завершения печати: {task_id} (задание {job_id or 'неизвестно'})")
+            await self._wait_for_print_completion(printer_id, str(task_id), job_id=job_id)
+            printed = True
             
-    async def _print_file(self, file_path: str, printer_id: str) -> bool:
+            print(f"✅ Печать завершена: {task_id}")
+            await self.queue_manager.mark_task_completed(task_id, printer_id, job_id)
+            self.completed_count += 1
+            self._completed_times.append(time.monotonic())
+            await self.health.record_success(printer_id)
+        except PrintJobError as e:
+            # Принтер сообщил, что задание не напечатано - повторяем
+            print(f"❌ {e}")
+            await self._record_printer_failure(printer_id, str(e))
+            await self._return_task_to_queue(task, str(e))
+        except Exception as e:
+            print(f"❌ Ошибка при завершении задачи {task_id}: {e}")
+            # Задание уже в спулере: повтор мог бы напечатать этикетку дважды,
+            # поэтому задача завершается без подтверждения, а не остается в printing
+            try:
+                await self.queue_manager.mark_task_completed(task_id, printer_id, job_id, confirmed=printed)
+            except Exception as mark_error:
+                print(f"❌ Ошибка завершения задачи {task_id}: {mark_error}")
+        finally:
+            self.in_flight -= 1
+            self._release_claim(task_id)
+            if self.scheduler:
+                self.scheduler.on_complete(printer_id, task, printed)
+            
+    async def _print_file(self, file_path: str, printer_id: str, prerendered: bool = False) -> Tuple[bool, Optional[str]]:
         """
         Запускает печать файла
         
         Args:
             file_path: Путь к файлу
             printer_id: ID принтера
+            prerendered: Файл подготовлен RenderStage под этот принтер
             
         Returns:
-            bool: Успешность печати
+            Tuple[bool, Optional[str]]: Успешность печати и ID задания в спулере (если известен)
         """
         try:
+            backend = self.backends.get(printer_id)
+            if backend is not None:
+                job_id = await backend.print_file(file_path)
+                print(f"✅ Файл отправлен на печать: {file_path} (задание {job_id})")
+                return True, job_id
+                
             if platform.system() == "Windows":
                 # Windows - используем адаптированный код для печати изображений
                 if file_path.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif')):
-                    return await self._print_image_windows(file_path, printer_id)
+                    return await self._print_image_windows(file_path, printer_id, prerendered)
                 else:
-                    # Для других файлов используем PowerShell
-                    return await self._print_file_powershell(file_path, printer_id)
+                    # Для других файлов используем PowerShell (ID задания не возвращается)
+                    return await self._print_file_powershell(file_path, printer_id), None
             else:
                 # Linux/Mac - используем lp
-                result = subprocess.run(
+                result = await run_command(
                     ["lp", "-d", printer_id, file_path], 
-                    capture_output=True, 
-                    text=True, 
                     timeout=30
                 )
                 
                 if result.returncode == 0:
-                    print(f"✅ Файл отправлен на печать: {file_path}")
-                    return True
+                    # lp печатает: "request id is PRINTER-123 (1 file(s))"
+                    match = re.search(r"request id is (\S+)", result.stdout)
+                    job_id = match.group(1) if match else None
+                    print(f"✅ Файл отправлен на печать: {file_path} (задание {job_id})")
+                    return True, job_id
                 else:
                     print(f"❌ Ошибка печати: {result.stderr}")
-                    return False
+                    return False, None
                 
         except subprocess.TimeoutExpired:
             print(f"⏰ Таймаут печати: {file_path}")
-            return False
+            return False, None
         except FileNotFoundError:
             print(f"❌ Команда печати не найдена")
-            return False
+            return False, None
         except Exception as e:
             print(f"❌ Ошибка печати: {e}")
-            return False
+            return False, None
             
-    async def _print_image_windows(self, file_path: str, printer_id: str) -> bool:
+    async def _print_image_windows(self, file_path: str, printer_id: str,
+                                   prerendered: bool = False) -> Tuple[bool, Optional[str]]:
         """
         Печатает изображение в Windows через win32print
         
         Args:
             file_path: Путь к изображению
             printer_id: Имя принтера из рабочей группы
+            prerendered: Bitmap уже подготовлен под область печати принтера
             
         Returns:
-            bool: Успешность печати
+            Tuple[bool, Optional[str]]: Успешность печати и ID задания в спулере
         """
         if not WINDOWS_PRINT_AVAILABLE:
             print("❌ win32print недоступен")
-            return False
+            return False, None
             
         try:
             # Используем реальное имя принтера из рабочей группы
             printer_name = printer_id
             print(f"🖨️ Печатаем изображение через win32print: {file_path}")
             
-            # Открываем принтер
-            hprinter = win32print.OpenPrinter(printer_name)
-            printer_info = win32print.GetPrinter(hprinter, 2)
+            # Вызовы GDI блокирующие - выполняем их в отдельном потоке
+            job_id = await asyncio.to_thread(self._print_image_gdi, file_path, printer_name, prerendered)
             
-            # Создаем DC для принтера
-            pdc = win32ui.CreateDC()
-            pdc.CreatePrinterDC(printer_name)
-            pdc.StartDoc("Image Print Job")
-            pdc.StartPage()
+            print(f"✅ Изображение отправлено на печать: {file_path} (задание {job_id})")
+            return True, job_id
             
-            # Открываем и вставляем изображение
-            img = Image.open(file_path)
-            bmp = img.convert("RGB")  # Конвертируем в RGB
-            
-            # Масштабирование под A4 (например)
-            width, height = bmp.size
-            dib = ImageWin.Dib(bmp)
-            dib.draw(pdc.GetHandleOutput(), (0, 0, width, height))
+        except Exception as e:
+            print(f"❌ Ошибка печати изображения: {e}")
+            return False, None
             
-            # Завершаем печать
-            pdc.EndPage()
-            pdc.EndDoc()
+    @staticmethod
+    def _get_gdi_geometry(printer_name: str) -> Tuple[int, int, int]:
+        """Область печати (ширина, высота) в точках и разрешение принтера GDI (блокирующий вызов)"""
+        pdc = win32ui.CreateDC()
+        pdc.CreatePrinterDC(printer_name)
+        try:
+            return (
+                pdc.GetDeviceCaps(win32con.HORZRES),
+                pdc.GetDeviceCaps(win32con.VERTRES),
+                pdc.GetDeviceCaps(win32con.LOGPIXELSX),
+            )
+        finally:
             pdc.DeleteDC()
             
-            print(f"✅ Изображение отправлено на печать: {file_path}")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Ошибка печати изображения: {e}")
-            return False
+    def _print_image_gdi(self, file_path: str, printer_name: str, prerendered: bool = False) -> Optional[str]:
+        """
+        Отрисовывает изображение на принтере через GDI (блокирующий вызов)
+        
+        Returns:
+            Optional[str]: ID задания в спулере (StartDoc возвращает JobId)
+        """
+        # Открываем принтер
+        hprinter = win32print.OpenPrinter(printer_name)
+        printer_info = win32print.GetPrinter(hprinter, 2)
+        
+        # Создаем DC для принтера
+        pdc = win32ui.CreateDC()
+        pdc.CreatePrinterDC(printer_name)
+        
+        if prerendered:
+            # Bitmap уже в RGB и под область печати этого принтера - только читаем его
+            with Image.open(file_path) as img:
+                bmp = img.convert("RGB")
+        else:
+            # Изображение в RGB, уменьшенное под область печати - повторные печати берут его из кэша
+            target_size = (pdc.GetDeviceCaps(win32con.HORZRES), pdc.GetDeviceCaps(win32con.VERTRES))
+            dpi = pdc.GetDeviceCaps(win32con.LOGPIXELSX)
+            bmp = self.image_cache.get(file_path, target_size, dpi)
+        
+        job_id = pdc.StartDoc("Image Print Job")
+        pdc.StartPage()
+        
+        width, height = bmp.size
+        dib = ImageWin.Dib(bmp)
+        dib.draw(pdc.GetHandleOutput(), (0, 0, width, height))
+        
+        # Завершаем печать
+        pdc.EndPage()
+        pdc.EndDoc()
+        pdc.DeleteDC()
+        
+        return str(job_id) if job_id and job_id > 0 else None
             
     async def _print_file_powershell(self, file_path: str, printer_id: str) -> bool:
         """
@@ -294,7 +871,7 @@ class PrintProcessor:
             if POWERSHELL_PRINT_AVAILABLE:
                 # Используем реальное имя принтера из рабочей группы
                 printer_name = printer_id
-                success = print_file_powershell(file_path, printer_name)
+                success = await print_file_powershell(file_path, printer_name)
                 return success
             else:
                 # Fallback - простой PowerShell с указанием принтера
@@ -305,7 +882,7 @@ class PrintProcessor:
                     f"Start-Process -FilePath '{file_path}' -Verb Print -WindowStyle Hidden"
                 ]
                 
-                result = subprocess.run(print_cmd, capture_output=True, text=True, timeout=60)
+                result = await run_command(print_cmd, timeout=60)
                 
                 if result.returncode == 0:
                     print(f"✅ Файл отправлен на печать: {file_path}")
@@ -318,28 +895,87 @@ class PrintProcessor:
             print(f"❌ Ошибка PowerShell печати: {e}")
             return False
             
-    async def _wait_for_print_completion(self, printer_id: str, task_id: str, timeout: int = 60):
+    async def _wait_for_print_completion(self, printer_id: str, task_id: str, timeout: int = 60,
+                                         job_id: Optional[str] = None):
         """
         Ожидает завершения печати
         
+        Если ID задания известен, ждем именно его, а не пустой очереди принтера -
+        остальные задания на этом принтере не мешают.
+        
         Args:
             printer_id: ID принтера
             task_id: ID задачи
             timeout: Таймаут ожидания в секундах
+            job_id: ID задания в спулере
         """
         try:
-            if platform.system() == "Windows":
+            backend = self.backends.get(printer_id)
+            if backend is not None:
+                if job_id is not None and not await backend.wait_for_job(job_id, timeout):
+                    print(f"⚠️ Нет подтверждения печати задания {job_id} для задачи {task_id}")
+            elif job_id is not None:
+                await self._wait_for_job_completion(printer_id, task_id, job_id, timeout)
+            elif platform.system() == "Windows":
                 # В Windows используем PowerShell для проверки статуса печати
                 await self._wait_for_windows_print_completion(printer_id, task_id, timeout)
             else:
                 # В Linux/Mac ждем фиксированное время
                 await asyncio.sleep(5)
                 
+        except PrintJobError:
+            raise
         except Exception as e:
             print(f"⚠️ Ошибка при ожидании завершения печати: {e}")
             # В случае ошибки ждем фиксированное время
             await asyncio.sleep(5)
             
+    async def _wait_for_job_completion(self, printer_id: str, task_id: str, job_id: str, timeout: int = 60,
+                                       poll_interval: float = 1.0):
+        """
+        Ожидает, пока задание job_id не исчезнет из спулера принтера
+        
+        Интервал опроса растет до 3 секунд, пока задание остается в очереди.
+        """
+        start_time = asyncio.get_event_loop().time()
+        
+        while (asyncio.get_event_loop().time() - start_time) < timeout:
+            active = await self._is_job_active(printer_id, job_id)
+            
+            if active is False:
+                print(f"✅ Задание {job_id} на принтере {printer_id} завершено")
+                return
+            if active:
+                print(f"⏳ Задание {job_id} на принтере {printer_id} печатается")
+                
+            await asyncio.sleep(poll_interval)
+            poll_interval = min(poll_interval * 1.5, 3)
+            
+        print(f"⏰ Таймаут ожидания задания {job_id} для задачи {task_id}")
+        
+    async def _is_job_active(self, printer_id: str, job_id: str) -> Optional[bool]:
+        """
+        Проверяет, находится ли задание в спулере принтера
+        
+        Returns:
+            Optional[bool]: True - задание в очереди, False - завершено, None - не удалось проверить
+        """
+        if platform.system() == "Windows":
+            result = await run_powershell(
+                f"Get-PrintJob -PrinterName '{printer_id}' -ID {int(job_id)} -ErrorAction SilentlyContinue"
+                f" | Select-Object -ExpandProperty Id",
+                timeout=10
+            )
+        else:
+            # lpstat -o выводит только незавершенные задания: "PRINTER-123 user 1024 date"
+            result = await run_command(["lpstat", "-o", printer_id], timeout=10)
+            
+        if result.returncode != 0:
+            print(f"⚠️ Ошибка получения заданий печати: {result.stderr}")
+            return None
+            
+        return job_id in result.stdout.split()
+            
     async def _wait_for_windows_print_completion(self, printer_id: str, task_id: str, timeout: int = 60):
         """
         Ожидает завершения печати в Windows
@@ -349,13 +985,10 @@ class PrintProcessor:
             
             while (asyncio.get_event_loop().time() - start_time) < timeout:
                 # Проверяем задания печати
-                cmd = [
-                    "powershell", 
-                    "-Command", 
-                    f"Get-PrintJob -PrinterName '{printer_id}' | Select-Object JobId, Document, JobStatus | ConvertTo-Json"
-                ]
-                
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+                result = await run_powershell(
+                    f"Get-PrintJob -PrinterName '{printer_id}' | Select-Object JobId, Document, JobStatus | ConvertTo-Json",
+                    timeout=10
+                )
                 
                 if result.returncode == 0:
                     jobs_data = result.stdout.strip()
@@ -368,17 +1001,9 @@ class PrintProcessor:
                         # Есть задания печати - ждем
                         print(f"⏳ Принтер {printer_id} занят (есть активные задания)")
                         
-                        # Дополнительно проверяем статус принтера
-                        status_cmd = [
-                            "powershell", 
-                            "-Command", 
-                            f"Get-Printer -Name '{printer_id}' | Select-Object -ExpandProperty PrinterStatus"
-                        ]
-                        
-                        status_result = subprocess.run(status_cmd, capture_output=True, text=True, timeout=5)
-                        if status_result.returncode == 0:
-                            status = status_result.stdout.strip()
-                            print(f"  Статус принтера: {status}")
+                        # Дополнительно показываем статус принтера
+                        status = await self._get_printer_status(printer_id)
+                        print(f"  Статус принтера: {status}")
                 else:
                     print(f"⚠️ Ошибка получения заданий печати: {result.stderr}")
                 
@@ -390,39 +1015,87 @@ class PrintProcessor:
         except Exception as e:
             print(f"❌ Ошибка проверки статуса принтера: {e}")
             
-    async def _return_task_to_queue(self, task: Dict[str, Any]):
-        """Возвращает задачу в очередь"""
+    async def _record_printer_failure(self, printer_id: str, error: str):
+        """
+        Учитывает ошибку принтера; после серии ошибок принтер отключается
+        
+        Args:
+            printer_id: ID принтера
+            error: Описание ошибки
+        """
+        try:
+            cooldown = await self.health.record_failure(printer_id, error)
+            if cooldown is not None:
+                # Обработчик принтера остановится после текущих заданий
+                self.active_printers.discard(printer_id)
+                print(f"🚫 Принтер {printer_id} отключен на {cooldown:.0f} с после ошибок подряд: {error}")
+        except Exception as e:
+            print(f"❌ Ошибка при учете сбоя принтера {printer_id}: {e}")
+            
+    async def _return_task_to_queue(self, task: Dict[str, Any], error: str = "", permanent: bool = False):
+        """
+        Возвращает задачу в очередь с задержкой или переносит ее в dead_letter
+        
+        Args:
+            task: Данные задачи
+            error: Описание ошибки
+            permanent: Ошибка неустранима, повтор не имеет смысла
+        """
+        self.failed_count += 1
+        self.last_error = {"message": error, "task_id": task.get("id"), "at": datetime.now().isoformat()}
         try:
-            # Сбрасываем статус задачи
-            task["status"] = "pending"
-            task["assigned_printer"] = None
-            
-            # Добавляем обратно в очередь
-            if self.queue_manager.redis:
-                await self.queue_manager.redis.zadd(
-                    self.queue_manager.queue_name, 
-                    {json.dumps(task): task.get("priority", 1)}
-                )
+            result = await self.queue_manager.retry_task(task, error, permanent)
             
-            print(f"🔄 Задача возвращена в очередь: {task['id']}")
+            if result == "dead":
+                print(f"💀 Задача перенесена в dead_letter: {task['id']} ({error})")
+            elif result == "stale":
+                print(f"⚠️ Задача {task['id']} уже изменена в очереди, повтор не нужен")
+            else:
+                print(f"🔄 Задача возвращена в очередь (попытка {task.get('attempts', 0) + 1}): {task['id']}")
             
         except Exception as e:
             print(f"❌ Ошибка при возврате задачи в очередь: {e}")
             
-    def stop(self):
-        """Останавливает процессор"""
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Останавливает процессор: новые задачи не берутся, текущие задания
+        дожидаются не дольше timeout (по умолчанию drain_timeout)
+        """
         self.running = False
+        if timeout is not None:
+            self.drain_timeout = timeout
+        if self._stop_event:
+            self._stop_event.set()
+            
+    async def drain(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Останавливает процессор и ждет окончания остановки
+        
+        Args:
+            timeout: Сколько ждать текущие задания в секундах (по умолчанию drain_timeout)
+            
+        Returns:
+            Dict[str, Any]: Отчет: сколько задач завершено, возвращено в очередь
+                и помечено выполненными без подтверждения
+        """
+        self.stop(timeout)
+        if self._stopped:
+            await self._stopped.wait()
+        return self.last_drain or {}
 
 
 # Функция для запуска процессора
-async def start_print_processor(redis_url: str = "redis://localhost:6379"):
+async def start_print_processor(redis_url: str = "redis://localhost:6379", simulated_printers: int = 0):
     """
     Запускает процессор печати
     
     Args:
         redis_url: URL подключения к Redis
+        simulated_printers: Число эмуляторов принтеров (печать без оборудования)
     """
     processor = PrintProcessor(redis_url)
+    for name, printer in create_simulated_printers(simulated_printers).items():
+        processor.register_backend(name, printer)
     await processor.start_processing()
 
 
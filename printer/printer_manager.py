@@ -5,19 +5,44 @@
 """
 
 import asyncio
-import subprocess
 import platform
 import re
 import json
 from typing import List, Dict, Any, Optional
 from pathlib import Path
+import sys
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent.parent))
+
+from printer.async_command import run_command
+from printer.powershell_host import run_powershell
+
+try:
+    import redis.asyncio as redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Строка принтера в выводе lpstat -p: "printer <имя> is <статус>.",
+# "printer <имя> now printing <задание>." или "printer <имя> disabled since ..."
+LPSTAT_PRINTER_RE = re.compile(r'printer\s+(\S+)\s+(?:is\s+(\w+)|now printing|(disabled))')
 
 
 class PrinterManager:
     """Менеджер для работы с системными принтерами"""
     
-    def __init__(self):
+    def __init__(self, redis_url: str = "redis://localhost:6379", status_service=None):
+        """
+        Args:
+            redis_url: URL подключения к Redis рабочей группы
+            status_service: Сервис статусов со снимком системных принтеров
+                (по умолчанию общий экземпляр get_printer_status_service())
+        """
         self.system = platform.system().lower()
+        self.redis_url = redis_url
+        self.redis = None
+        self.status_service = status_service
         
     async def get_system_printers(self) -> List[Dict[str, Any]]:
         """
@@ -39,16 +64,8 @@ class PrinterManager:
         """Получить принтеры в Windows"""
         try:
             # Используем PowerShell для получения информации о принтерах
-            cmd = [
-                "powershell", 
-                "-Command", 
-                "Get-Printer | ConvertTo-Json -Depth 3"
-            ]
-            
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True, 
+            result = await run_powershell(
+                "Get-Printer | ConvertTo-Json -Depth 3",
                 timeout=10
             )
             
@@ -83,38 +100,13 @@ class PrinterManager:
         """Получить принтеры в Linux"""
         try:
             # Используем lpstat для получения списка принтеров
-            result = subprocess.run(
+            result = await run_command(
                 ["lpstat", "-p", "-d"], 
-                capture_output=True, 
-                text=True, 
                 timeout=10
             )
             
             if result.returncode == 0:
-                printers = []
-                lines = result.stdout.split('\n')
-                
-                for line in lines:
-                    if line.startswith('printer'):
-                        # Парсим строку вида: printer HP_LaserJet is idle.  enabled since ...
-                        match = re.match(r'printer\s+(\w+)\s+is\s+(\w+)', line)
-                        if match:
-                            name = match.group(1)
-                            status = match.group(2)
-                            
-                            printers.append({
-                                "name": name,
-                                "id": name,
-                                "type": self._detect_printer_type(name),
-                                "status": status,
-                                "location": "",
-                                "port": "",
-                                "driver": "",
-                                "is_shared": False,
-                                "is_default": False
-                            })
-                            
-                return printers
+                return self._parse_lpstat(result.stdout)
             else:
                 print(f"Ошибка получения принтеров Linux: {result.stderr}")
                 return []
@@ -127,38 +119,13 @@ class PrinterManager:
         """Получить принтеры в macOS"""
         try:
             # Используем lpstat для получения списка принтеров
-            result = subprocess.run(
+            result = await run_command(
                 ["lpstat", "-p"], 
-                capture_output=True, 
-                text=True, 
                 timeout=10
             )
             
             if result.returncode == 0:
-                printers = []
-                lines = result.stdout.split('\n')
-                
-                for line in lines:
-                    if line.startswith('printer'):
-                        # Парсим строку вида: printer HP_LaserJet is idle.  enabled since ...
-                        match = re.match(r'printer\s+(\w+)\s+is\s+(\w+)', line)
-                        if match:
-                            name = match.group(1)
-                            status = match.group(2)
-                            
-                            printers.append({
-                                "name": name,
-                                "id": name,
-                                "type": self._detect_printer_type(name),
-                                "status": status,
-                                "location": "",
-                                "port": "",
-                                "driver": "",
-                                "is_shared": False,
-                                "is_default": False
-                            })
-                            
-                return printers
+                return self._parse_lpstat(result.stdout)
             else:
                 print(f"Ошибка получения принтеров macOS: {result.stderr}")
                 return []
@@ -167,6 +134,42 @@ class PrinterManager:
             print(f"Ошибка при получении принтеров macOS: {e}")
             return []
             
+    def _parse_lpstat(self, output: str) -> List[Dict[str, Any]]:
+        """
+        Разобрать вывод lpstat -p
+        
+        Строки вида "printer HP_LaserJet is idle.  enabled since ..." и
+        "printer Zebra-ZD420.1 now printing Zebra-ZD420.1-123.  enabled since ...";
+        печатающий принтер получает статус "busy", остановленный - "disabled".
+        Имена CUPS могут содержать "-" и ".".
+        
+        Args:
+            output: Вывод команды lpstat
+            
+        Returns:
+            List[Dict[str, Any]]: Список принтеров со статусами
+        """
+        printers = []
+        for line in output.split('\n'):
+            match = LPSTAT_PRINTER_RE.match(line)
+            if not match:
+                continue
+                
+            name = match.group(1)
+            status = match.group(2) or ("disabled" if match.group(3) else "busy")
+            printers.append({
+                "name": name,
+                "id": name,
+                "type": self._detect_printer_type(name),
+                "status": status,
+                "location": "",
+                "port": "",
+                "driver": "",
+                "is_shared": False,
+                "is_default": False
+            })
+        return printers
+        
     def _detect_printer_type(self, name: str) -> str:
         """Определить тип принтера по названию"""
         name_lower = name.lower()
@@ -182,6 +185,52 @@ class PrinterManager:
         else:
             return 'unknown'
             
+    async def _redis(self):
+        """Асинхронное подключение к Redis рабочей группы (создается при первом обращении)"""
+        if not REDIS_AVAILABLE:
+            raise ImportError("Redis не установлен")
+        if self.redis is None:
+            self.redis = redis.from_url(self.redis_url, decode_responses=True)
+        return self.redis
+        
+    def _status_service(self):
+        """Сервис статусов (общий экземпляр создается при первом обращении)"""
+        if self.status_service is None:
+            # Импорт здесь: status_service сам импортирует PrinterManager
+            from printer.status_service import get_printer_status_service
+            self.status_service = get_printer_status_service()
+        return self.status_service
+        
+    async def close(self):
+        """Закрывает подключение к Redis"""
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+            
+    @staticmethod
+    def _to_redis_fields(printer_data: Dict[str, Any]) -> Dict[str, str]:
+        """Преобразует все значения в строки для Redis"""
+        fields = {}
+        for key, value in printer_data.items():
+            if isinstance(value, bool):
+                fields[key] = str(value).lower()
+            else:
+                fields[key] = str(value)
+        return fields
+        
+    @staticmethod
+    def _from_redis_fields(fields: Dict[str, str]) -> Dict[str, Any]:
+        """Восстанавливает типы значений, сохраненных в Redis"""
+        printer_data = {}
+        for key, value in fields.items():
+            if value.lower() in ['true', 'false']:
+                printer_data[key] = value.lower() == 'true'
+            elif value.isdigit():
+                printer_data[key] = int(value)
+            else:
+                printer_data[key] = value
+        return printer_data
+            
     async def add_printer_to_workgroup(self, printer_name: str, workgroup_name: str = "wb_print_group") -> bool:
         """
         Добавить принтер в рабочую группу
@@ -196,40 +245,24 @@ class PrinterManager:
         try:
             # Проверяем, что принтер существует в системе
             system_printers = await self.get_system_printers()
-            printer_exists = any(p["name"] == printer_name for p in system_printers)
+            printer_info = next((p for p in system_printers if p["name"] == printer_name), None)
             
-            if not printer_exists:
+            if not printer_info:
                 print(f"Принтер {printer_name} не найден в системе")
                 return False
             
-            # Используем Redis для хранения информации о рабочей группе
-            import redis
-            r = redis.Redis(host='localhost', port=6379, decode_responses=True)
-            
-            # Добавляем принтер в группу
-            result = r.sadd(f"workgroup:{workgroup_name}", printer_name)
-            
-            # Сохраняем информацию о принтере
-            printer_info = next((p for p in system_printers if p["name"] == printer_name), None)
-            if printer_info:
-                # Преобразуем все значения в строки для Redis
-                printer_data = {}
-                for key, value in printer_info.items():
-                    if isinstance(value, bool):
-                        printer_data[key] = str(value).lower()
-                    else:
-                        printer_data[key] = str(value)
-                r.hset(f"printer:{printer_name}", mapping=printer_data)
-            
-            r.close()
+            # Добавляем принтер в группу и сохраняем информацию о нем одним запросом
+            r = await self._redis()
+            pipe = r.pipeline(transaction=False)
+            pipe.sadd(f"workgroup:{workgroup_name}", printer_name)
+            pipe.hset(f"printer:{printer_name}", mapping=self._to_redis_fields(printer_info))
+            await pipe.execute()
             return True
                 
         except Exception as e:
             print(f"Ошибка при добавлении принтера в группу: {e}")
             return False
             
-
-            
     async def remove_printer_from_workgroup(self, printer_name: str, workgroup_name: str = "wb_print_group") -> bool:
         """
         Удалить принтер из рабочей группы
@@ -242,29 +275,28 @@ class PrinterManager:
             bool: Успешность операции
         """
         try:
-            # Используем Redis для удаления принтера из группы
-            import redis
-            r = redis.Redis(host='localhost', port=6379, decode_responses=True)
-            
-            # Удаляем принтер из группы
-            r.srem(f"workgroup:{workgroup_name}", printer_name)
-            
-            # Удаляем информацию о принтере
-            r.delete(f"printer:{printer_name}")
-            
-            r.close()
+            # Удаляем принтер из группы и информацию о нем одним запросом
+            r = await self._redis()
+            pipe = r.pipeline(transaction=False)
+            pipe.srem(f"workgroup:{workgroup_name}", printer_name)
+            pipe.delete(f"printer:{printer_name}")
+            await pipe.execute()
             return True
                 
         except Exception as e:
             print(f"Ошибка при удалении принтера из группы: {e}")
             return False
             
-
-            
     async def get_workgroup_printers(self, workgroup_name: str = "wb_print_group") -> List[Dict[str, Any]]:
         """
         Получить принтеры из рабочей группы
         
+        Системные принтеры берутся из общего снимка сервиса статусов, поэтому
+        /api/printers, процессор и этот метод не перечисляют их повторно.
+        К Redis выполняется два запроса: SMEMBERS группы и один pipeline
+        с обновлением данных найденных принтеров и чтением сохраненных
+        данных остальных.
+        
         Args:
             workgroup_name: Название рабочей группы
             
@@ -272,45 +304,32 @@ class PrinterManager:
             List[Dict[str, Any]]: Список принтеров в группе
         """
         try:
-            # Используем Redis для получения принтеров из группы
-            import redis
-            r = redis.Redis(host='localhost', port=6379, decode_responses=True)
-            
-            # Получаем принтеры из группы
-            printer_names = r.smembers(f"workgroup:{workgroup_name}")
+            r = await self._redis()
+            printer_names = sorted(await r.smembers(f"workgroup:{workgroup_name}"))
+            if not printer_names:
+                return []
+                
+            # Актуальная информация о принтерах из снимка сервиса статусов
+            snapshot = await self._status_service().get_snapshot()
+            system_printers = {p["name"]: dict(p) for p in snapshot}
             
-            printers = []
+            pipe = r.pipeline(transaction=False)
             for printer_name in printer_names:
-                # Получаем актуальную информацию о принтере из системы
-                system_printers = await self.get_system_printers()
-                printer_data = next((p for p in system_printers if p["name"] == printer_name), None)
-                
+                printer_data = system_printers.get(printer_name)
                 if printer_data:
                     # Обновляем информацию в Redis
-                    printer_info = {}
-                    for key, value in printer_data.items():
-                        if isinstance(value, bool):
-                            printer_info[key] = str(value).lower()
-                        else:
-                            printer_info[key] = str(value)
-                    r.hset(f"printer:{printer_name}", mapping=printer_info)
-                    
-                    printers.append(printer_data)
+                    pipe.hset(f"printer:{printer_name}", mapping=self._to_redis_fields(printer_data))
                 else:
-                    # Если принтер не найден в системе, получаем из Redis
-                    printer_info = r.hgetall(f"printer:{printer_name}")
-                    if printer_info:
-                        printer_data = {}
-                        for key, value in printer_info.items():
-                            if value.lower() in ['true', 'false']:
-                                printer_data[key] = value.lower() == 'true'
-                            elif value.isdigit():
-                                printer_data[key] = int(value)
-                            else:
-                                printer_data[key] = value
-                        printers.append(printer_data)
+                    # Если принтер не найден в системе, берем сохраненную в Redis
+                    pipe.hgetall(f"printer:{printer_name}")
+            results = await pipe.execute()
             
-            r.close()
+            printers = []
+            for printer_name, result in zip(printer_names, results):
+                if printer_name in system_printers:
+                    printers.append(system_printers[printer_name])
+                elif result:
+                    printers.append(self._from_redis_fields(result))
             return printers
                 
         except Exception as e:
@@ -335,5 +354,6 @@ if __name__ == "__main__":
         print("\n🏷️ Принтеры в рабочей группе:")
         workgroup_printers = await manager.get_workgroup_printers()
         print(f"  Найдено: {len(workgroup_printers)}")
+        await manager.close()
         
     asyncio.run(main()) 
\ No newline at end of file
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Реестр процессоров печати в Redis
+Каждый процессор периодически записывает о себе сведения: принтеры, задания
+в работе, скорость печати и последнюю ошибку. Запись живет ttl секунд, так
+что остановившийся без отмены регистрации процессор пропадает из реестра сам.
+Веб-интерфейс по реестру показывает всю систему, а не только свой процессор
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent.parent))
+
+from printer.add_to_print import PrintQueueManager
+
+
+class ProcessorRegistry:
+    """Регистрация процессоров с heartbeat и сводка по всем живым процессорам"""
+
+    def __init__(self, queue_manager: PrintQueueManager, processor_id: Optional[str] = None,
+                 ttl: float = 15.0, key_prefix: str = "processor:", index_key: str = "processors"):
+        """
+        Args:
+            queue_manager: Менеджер очереди печати (его подключение к Redis)
+            processor_id: ID своего процессора (не нужен, если реестр только читается)
+            ttl: Время жизни записи в секундах; heartbeat нужно отправлять чаще (heartbeat_interval)
+            key_prefix: Префикс ключей с данными процессоров
+            index_key: Множество ID зарегистрированных процессоров
+        """
+        self.queue_manager = queue_manager
+        self.processor_id = processor_id
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self.index_key = index_key
+
+    @property
+    def heartbeat_interval(self) -> float:
+        """Три heartbeat за время жизни записи - один пропуск не убирает процессор из реестра"""
+        return self.ttl / 3
+
+    def _key(self, processor_id: str) -> str:
+        return f"{self.key_prefix}{processor_id}"
+
+    async def _redis(self):
+        if not self.queue_manager.redis:
+            await self.queue_manager.connect()
+        return self.queue_manager.redis
+
+    async def heartbeat(self, info: Dict[str, Any]):
+        """Записывает сведения о своем процессоре и продлевает запись (один запрос в Redis)"""
+        redis_client = await self._redis()
+        info = {**info, "id": self.processor_id, "heartbeat_at": time.time()}
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.set(self._key(self.processor_id), json.dumps(info), px=int(self.ttl * 1000))
+        pipe.sadd(self.index_key, self.processor_id)
+        await pipe.execute()
+
+    async def unregister(self):
+        """Удаляет свой процессор из реестра"""
+        redis_client = await self._redis()
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.delete(self._key(self.processor_id))
+        pipe.srem(self.index_key, self.processor_id)
+        await pipe.execute()
+
+    async def get_processors(self) -> List[Dict[str, Any]]:
+        """Живые процессоры; записи с истекшим сроком убираются из индекса"""
+        redis_client = await self._redis()
+        processor_ids = [
+            processor_id.decode() if isinstance(processor_id, bytes) else processor_id
+            for processor_id in await redis_client.smembers(self.index_key)
+        ]
+        if not processor_ids:
+            return []
+
+        values = await redis_client.mget([self._key(processor_id) for processor_id in processor_ids])
+        processors = []
+        stale = []
+        for processor_id, value in zip(processor_ids, values):
+            if value is None:
+                stale.append(processor_id)
+            else:
+                processors.append(json.loads(value))
+        if stale:
+            await redis_client.srem(self.index_key, *stale)
+
+        now = time.time()
+        for processor in processors:
+            processor["heartbeat_age"] = round(now - processor["heartbeat_at"], 1)
+        return sorted(processors, key=lambda processor: processor["id"])
+
+    @staticmethod
+    def summarize(processors: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Сводка по всем процессорам: сколько принтеров и заданий в работе, суммарная скорость"""
+        return {
+            "processors": len(processors),
+            "printers": sum(len(processor.get("printers", [])) for processor in processors),
+            "in_flight": sum(processor.get("in_flight", 0) for processor in processors),
+            "tasks_per_min": sum(processor.get("tasks_per_min", 0) for processor in processors),
+        }
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Предварительная подготовка файлов печати
+Пока задачи ждут в очереди, изображения декодируются, масштабируются
+и конвертируются в готовый для принтера формат в пуле процессов.
+Результат сохраняется на диск, а путь записывается в задачу (rendered_path),
+так что при освобождении принтера остается только отправка в спулер
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Callable, Optional, Set, Tuple
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent.parent))
+
+from printer.add_to_print import PrintQueueManager
+from printer.zpl_printer import image_to_epl, image_to_zpl
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+
+# Файлы, которые имеет смысл подготавливать заранее
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+
+
+def _render_bmp(img, path: str):
+    """RGB bitmap для печати через GDI"""
+    img.convert("RGB").save(path, "BMP", dpi=img.info.get("dpi", (96, 96)))
+
+
+def _render_mono(img, path: str):
+    """1-битный bitmap для термопринтеров"""
+    img.convert("L").convert("1").save(path, "BMP", dpi=img.info.get("dpi", (203, 203)))
+
+
+def _render_pdf(img, path: str):
+    """PDF для CUPS (lp) - без растеризации в фильтрах"""
+    img.convert("RGB").save(path, "PDF", resolution=img.info.get("dpi", (203, 203))[0])
+
+
+def _render_zpl(img, path: str):
+    """Задание ZPL для термопринтеров (RAW 9100)"""
+    with open(path, "wb") as f:
+        f.write(image_to_zpl(img))
+
+
+def _render_epl(img, path: str):
+    """Задание EPL для термопринтеров (RAW 9100)"""
+    with open(path, "wb") as f:
+        f.write(image_to_epl(img))
+
+
+# Bitmap-форматы: подготовка имеет смысл, только если известна область печати
+# (иначе это просто копия исходного изображения)
+SIZED_FORMATS = {"bmp", "mono"}
+
+# Формат -> (расширение файла, функция сохранения)
+RENDER_FORMATS: Dict[str, Tuple[str, Callable]] = {
+    "bmp": (".bmp", _render_bmp),
+    "mono": (".bmp", _render_mono),
+    "pdf": (".pdf", _render_pdf),
+    "zpl": (".zpl", _render_zpl),
+    "epl": (".epl", _render_epl),
+}
+
+
+def default_render_format() -> str:
+    """Формат по умолчанию: bitmap для GDI в Windows, PDF для CUPS"""
+    return "bmp" if platform.system() == "Windows" else "pdf"
+
+
+def artifact_path(file_path: str, output_dir: str, fmt: str, target_size: Optional[Tuple[int, int]] = None,
+                  dpi: Optional[int] = None) -> str:
+    """
+    Путь к подготовленному файлу
+
+    Имя зависит от исходного файла (путь, время изменения, размер) и параметров
+    подготовки, поэтому одинаковые этикетки подготавливаются один раз.
+    """
+    stat = os.stat(file_path)
+    source = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}|{fmt}|{target_size}|{dpi}"
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()
+    extension = RENDER_FORMATS[fmt][0]
+    return os.path.join(output_dir, digest + extension)
+
+
+def render_file(file_path: str, output_dir: str, fmt: str = "bmp",
+                target_size: Optional[Tuple[int, int]] = None, dpi: Optional[int] = None) -> str:
+    """
+    Готовит файл к печати (выполняется в процессе пула)
+
+    Args:
+        file_path: Исходное изображение
+        output_dir: Папка для готовых файлов
+        fmt: Формат результата (bmp, mono, pdf, zpl, epl)
+        target_size: Область печати (ширина, высота); большее изображение уменьшается
+        dpi: Разрешение принтера, записываемое в результат
+
+    Returns:
+        str: Путь к готовому файлу
+    """
+    path = artifact_path(file_path, output_dir, fmt, target_size, dpi)
+    if os.path.exists(path):
+        return path
+
+    with Image.open(file_path) as img:
+        img.load()
+        if target_size:
+            img.thumbnail(target_size, Image.LANCZOS)
+        if dpi:
+            img.info["dpi"] = (dpi, dpi)
+
+        os.makedirs(output_dir, exist_ok=True)
+        # Пишем во временный файл, чтобы принтер не получил недописанный результат
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            RENDER_FORMATS[fmt][1](img, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return path
+
+
+class RenderStage:
+    """Фоновая подготовка ожидающих задач в пуле процессов"""
+
+    def __init__(self, queue_manager: PrintQueueManager, output_dir: str = "rendered",
+                 fmt: Optional[str] = None, target_size: Optional[Tuple[int, int]] = None,
+                 dpi: Optional[int] = None, max_workers: Optional[int] = None, executor: Optional[Executor] = None,
+                 interval: float = 1.0, batch_size: int = 50):
+        """
+        Args:
+            queue_manager: Менеджер очереди печати
+            output_dir: Папка для готовых файлов
+            fmt: Формат результата (по умолчанию зависит от ОС)
+            target_size: Область печати принтера (ширина, высота) в точках
+            dpi: Разрешение принтера
+            max_workers: Число процессов пула
+            executor: Готовый пул (например, ThreadPoolExecutor в тестах)
+            interval: Интервал проверки очереди в секундах
+            batch_size: Сколько задач подготавливать за один проход
+        """
+        if not PIL_AVAILABLE:
+            raise RuntimeError("Pillow не установлен. Установите: pip install pillow")
+        if fmt is not None and fmt not in RENDER_FORMATS:
+            raise ValueError(f"Неизвестный формат: {fmt}")
+
+        self.queue_manager = queue_manager
+        self.output_dir = output_dir
+        self.fmt = fmt or default_render_format()
+        self.target_size = target_size
+        self.dpi = dpi
+        self.max_workers = max_workers
+        self.interval = interval
+        self.batch_size = batch_size
+        self.running = False
+        # Выключается, если все готовые принтеры печатают своим способом
+        # (ZPL/EPL/IPP) и подготовленный файл им не нужен
+        self.enabled = True
+        self.rendered = 0
+
+        self._executor = executor
+        self._owns_executor = executor is None
+        # Задачи, которые не удалось подготовить - печатаются из исходного файла
+        self._failed: Set[str] = set()
+
+    @property
+    def active(self) -> bool:
+        """Включена, и для bitmap-формата известна область печати"""
+        return self.enabled and (self.fmt not in SIZED_FORMATS or self.target_size is not None)
+
+    def set_target(self, target_size: Optional[Tuple[int, int]], dpi: Optional[int] = None):
+        """
+        Задает область печати и разрешение принтеров
+
+        Уже подготовленные задачи не переделываются: у них записан
+        render_target, и принтер с другими параметрами печатает исходный файл.
+        """
+        self.target_size = tuple(target_size) if target_size else None
+        self.dpi = dpi
+
+    def _get_executor(self) -> Executor:
+        """Пул процессов создается при первой подготовке"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def run(self):
+        """Цикл подготовки задач до вызова stop()"""
+        self.running = True
+        print(f"🎨 Подготовка файлов печати запущена (формат {self.fmt})")
+        try:
+            while self.running:
+                try:
+                    rendered = await self.render_pending() if self.active else 0
+                except Exception as e:
+                    print(f"❌ Ошибка подготовки файлов печати: {e}")
+                    rendered = 0
+                # Полная порция - сразу берем следующую
+                if rendered < self.batch_size:
+                    await asyncio.sleep(self.interval)
+        finally:
+            self.running = False
+
+    def stop(self):
+        """Останавливает цикл подготовки"""
+        self.running = False
+
+    def close(self):
+        """Завершает собственный пул процессов"""
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def render_pending(self) -> int:
+        """
+        Один проход: готовит порцию ожидающих задач без rendered_path
+
+        Returns:
+            int: Число задач, которым записан rendered_path
+        """
+        if not self.queue_manager.redis:
+            await self.queue_manager.connect()
+
+        batch = await self._collect_batch()
+        if not batch:
+            return 0
+
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        # Параметры принтера могут смениться во время подготовки порции
+        target_size, dpi = self.target_size, self.dpi
+        # Одинаковые файлы в порции подготавливаем один раз
+        renders: Dict[str, asyncio.Future] = {}
+        for task_json, task in batch:
+            file_path = task["file_path"]
+            if file_path not in renders:
+                renders[file_path] = loop.run_in_executor(
+                    executor, render_file, file_path, self.output_dir, self.fmt, target_size, dpi
+                )
+
+        results = await asyncio.gather(*renders.values(), return_exceptions=True)
+        paths = dict(zip(renders.keys(), results))
+
+        fields: Dict[str, Any] = {}
+        if target_size:
+            # Для каких параметров принтера подготовлен файл
+            fields["render_target"] = [*target_size, dpi]
+
+        updated = 0
+        for task_json, task in batch:
+            result = paths[task["file_path"]]
+            if isinstance(result, BaseException):
+                print(f"⚠️ Не удалось подготовить {task['file_path']}: {result}")
+                self._failed.add(task["id"])
+                continue
+            if await self.queue_manager.update_task_fields(task_json, {"rendered_path": result, **fields}):
+                updated += 1
+
+        self.rendered += updated
+        return updated
+
+    async def _collect_batch(self, chunk_size: int = 500):
+        """Ожидающие задачи с изображениями, еще не подготовленные (в порядке приоритета)"""
+        redis_client = self.queue_manager.redis
+        batch = []
+        offset = 0
+        while True:
+            items = await redis_client.zrange(self.queue_manager.queue_name, offset, offset + chunk_size - 1)
+            if not items:
+                return batch
+            for task_json in items:
+                task = json.loads(task_json)
+                if self._needs_render(task):
+                    batch.append((task_json, task))
+                    if len(batch) >= self.batch_size:
+                        return batch
+            offset += chunk_size
+
+    def _needs_render(self, task: Dict[str, Any]) -> bool:
+        file_path = task.get("file_path")
+        return (
+            task.get("status", "pending") == "pending"
+            and not task.get("rendered_path")
+            and task.get("id") not in self._failed
+            and bool(file_path)
+            and file_path.lower().endswith(IMAGE_EXTENSIONS)
+            and os.path.exists(file_path)
+        )
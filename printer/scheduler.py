@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Распределение задач между принтерами с учетом их реальной скорости
+Для каждого принтера измеряется время обслуживания задания (EWMA, отдельно
+по артикулам), и задачу берет принтер, который закончит ее раньше всех.
+Медленные принтеры получают задачи, только когда быстрые не успевают
+разобрать очередь, - это сокращает время печати больших партий
+"""
+
+import asyncio
+import math
+import time
+from typing import Dict, Any, Optional, Iterable, Tuple
+
+
+# Оценка времени задания, пока ни один принтер не завершил ни одной задачи
+DEFAULT_SERVICE_TIME = 5.0
+# Наименьшее учитываемое время задания: задание, завершившееся "мгновенно"
+# (грубый таймер Windows ~15 мс, ожидание без задержки), не дает нулевую скорость
+MIN_SERVICE_TIME = 1e-3
+
+
+class LoadAwareScheduler:
+    """Оценка времени окончания работы принтеров по измеренной скорости"""
+
+    def __init__(self, alpha: float = 0.3, default_service_time: float = DEFAULT_SERVICE_TIME):
+        """
+        Args:
+            alpha: Вес нового измерения в EWMA (больше - быстрее реакция на изменения)
+            default_service_time: Время задания в секундах, пока измерений нет
+        """
+        self.alpha = alpha
+        self.default_service_time = default_service_time
+
+        # Время обслуживания: принтер -> EWMA и (принтер, артикул) -> EWMA
+        self._service_times: Dict[str, float] = {}
+        self._article_times: Dict[Tuple[str, Any], float] = {}
+        self._samples: Dict[str, int] = {}
+        # Отправленные и не завершенные задания: принтер -> task_id -> (время отправки, оценка)
+        self._in_flight: Dict[str, Dict[str, Tuple[float, float]]] = {}
+        # Время последнего завершения на принтере (начало обслуживания следующего задания)
+        self._last_done: Dict[str, float] = {}
+        self._changed: Optional[asyncio.Event] = None
+
+    def service_time(self, printer_id: str, article: Any = None) -> float:
+        """
+        Ожидаемое время задания на принтере
+
+        Порядок: измерение по артикулу -> по принтеру -> среднее по всем
+        принтерам (новый принтер считается средним) -> default_service_time
+        """
+        if article is not None and (printer_id, article) in self._article_times:
+            return self._article_times[(printer_id, article)]
+        if printer_id in self._service_times:
+            return self._service_times[printer_id]
+        if self._service_times:
+            return sum(self._service_times.values()) / len(self._service_times)
+        return self.default_service_time
+
+    def backlog(self, printer_id: str, now: Optional[float] = None) -> float:
+        """Сколько секунд принтеру осталось печатать уже отправленные задания"""
+        jobs = self._in_flight.get(printer_id)
+        if not jobs:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        total = sum(estimate for _, estimate in jobs.values())
+        # Принтер печатает по одному заданию: первое началось не раньше предыдущего завершения
+        started = max(min(submitted for submitted, _ in jobs.values()), self._last_done.get(printer_id, 0.0))
+        return max(0.0, total - (now - started))
+
+    def estimated_finish(self, printer_id: str, article: Any = None, now: Optional[float] = None) -> float:
+        """Через сколько секунд принтер закончит еще одну задачу, если возьмет ее сейчас"""
+        return self.backlog(printer_id, now) + self.service_time(printer_id, article)
+
+    def tasks_ahead(self, printer_id: str, printers: Iterable[str]) -> int:
+        """
+        Сколько задач остальные принтеры успеют закончить раньше, чем этот принтер - одну
+
+        0 - принтер закончит следующую задачу раньше всех и берет ее сразу.
+        Иначе ему стоит брать задачу, только если в очереди их больше.
+
+        Args:
+            printer_id: Принтер, который хочет взять задачу
+            printers: Все принтеры, готовые к работе
+        """
+        now = time.monotonic()
+        finish = self.estimated_finish(printer_id, now=now)
+        ahead = 0
+        for other in printers:
+            if other == printer_id:
+                continue
+            service = self.service_time(other)
+            if service <= 0:
+                continue
+            backlog = self.backlog(other, now)
+            # Задачи j = 1, 2, ..., которые other закончит строго раньше: backlog + j * service < finish
+            if backlog + service < finish:
+                ahead += math.ceil((finish - backlog) / service) - 1
+        return ahead
+
+    def on_submit(self, printer_id: str, task: Dict[str, Any]):
+        """Задача отправлена на принтер"""
+        estimate = self.service_time(printer_id, task.get("article"))
+        self._in_flight.setdefault(printer_id, {})[str(task.get("id"))] = (time.monotonic(), estimate)
+        self._notify()
+
+    def on_complete(self, printer_id: str, task: Dict[str, Any], success: bool = True):
+        """
+        Задача завершена (success=False - не напечатана, время не учитывается)
+
+        Время обслуживания - от начала печати задания до его завершения: начало -
+        это отправка или завершение предыдущего задания, если спулер был занят
+        """
+        job = self._in_flight.get(printer_id, {}).pop(str(task.get("id")), None)
+        if job is None:
+            return
+        now = time.monotonic()
+        if success:
+            submitted, _ = job
+            started = max(submitted, self._last_done.get(printer_id, 0.0))
+            self._record(printer_id, task.get("article"), now - started)
+        self._last_done[printer_id] = now
+        self._notify()
+
+    def _record(self, printer_id: str, article: Any, sample: float):
+        """Обновляет EWMA принтера и артикула на принтере"""
+        sample = max(sample, MIN_SERVICE_TIME)
+        self._service_times[printer_id] = self._ewma(self._service_times.get(printer_id), sample)
+        if article is not None:
+            key = (printer_id, article)
+            self._article_times[key] = self._ewma(self._article_times.get(key), sample)
+        self._samples[printer_id] = self._samples.get(printer_id, 0) + 1
+
+    def _ewma(self, current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        return self.alpha * sample + (1 - self.alpha) * current
+
+    def _notify(self):
+        """Будит обработчики, отложившие выбор задачи"""
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+
+    async def wait_for_change(self, timeout: float):
+        """Ожидает отправки или завершения задания на любом принтере (не дольше timeout)"""
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def in_flight_count(self) -> int:
+        """Отправленные и не завершенные задания на всех принтерах"""
+        return sum(len(jobs) for jobs in self._in_flight.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Оценки по принтерам"""
+        now = time.monotonic()
+        printers = set(self._service_times) | set(self._in_flight)
+        return {
+            printer_id: {
+                "service_time": round(self.service_time(printer_id), 3),
+                "samples": self._samples.get(printer_id, 0),
+                "in_flight": len(self._in_flight.get(printer_id, {})),
+                "backlog": round(self.backlog(printer_id, now), 3),
+            }
+            for printer_id in sorted(printers)
+        }
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Эмулятор принтера для тестов и измерения производительности
+Печатает с заданной скоростью (страниц в минуту), прогревается после
+простоя, случайно (но воспроизводимо при одинаковом seed) заминает бумагу
+и теряет задания, а очередь спулера ограничена по глубине
+"""
+
+import asyncio
+import random
+import sys
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent.parent))
+
+from printer.backend import PrintBackend, PrintJobError
+from printer.status_service import STATUS_READY, STATUS_PAPER_JAM
+
+
+class SimulatedPrinter(PrintBackend):
+    """Виртуальный принтер: задания печатаются по очереди с заданными характеристиками"""
+
+    def __init__(self, name: str = "sim", pages_per_minute: float = 30, warmup_time: float = 2.0,
+                 sleep_after: float = 60.0, jam_rate: float = 0.0, failure_rate: float = 0.0,
+                 jam_clear_time: float = 10.0, queue_depth: int = 10, pages_per_job: int = 1,
+                 seed: Optional[int] = None, time_scale: float = 1.0):
+        """
+        Args:
+            name: Имя принтера
+            pages_per_minute: Скорость печати
+            warmup_time: Прогрев перед первым заданием после простоя (сек)
+            sleep_after: Простой, после которого нужен прогрев (сек)
+            jam_rate: Вероятность замятия бумаги на задании
+            failure_rate: Вероятность потери задания без замятия
+            jam_clear_time: Время устранения замятия (сек), принтер в это время не готов
+            queue_depth: Максимальное число заданий в спулере; print_file ждет свободного места
+            pages_per_job: Страниц в одном задании
+            seed: Начальное значение генератора случайных чисел
+            time_scale: Множитель времени (0.01 - эмуляция в 100 раз быстрее)
+        """
+        self.name = name
+        self.pages_per_minute = pages_per_minute
+        self.warmup_time = warmup_time
+        self.sleep_after = sleep_after
+        self.jam_rate = jam_rate
+        self.failure_rate = failure_rate
+        self.jam_clear_time = jam_clear_time
+        self.queue_depth = queue_depth
+        self.pages_per_job = pages_per_job
+        self.time_scale = time_scale
+
+        self._random = random.Random(seed)
+        self._queue: Optional[asyncio.Queue] = None
+        self._engine: Optional[asyncio.Task] = None
+        self._jobs: Dict[str, asyncio.Future] = {}
+        self._next_job_id = 0
+        self._last_active: Optional[float] = None
+        self._jammed_until = 0.0
+        # Заданий в спулере, включая печатающееся
+        self.queue_length = 0
+
+        self.stats = {"submitted": 0, "printed": 0, "failed": 0, "jams": 0, "pages": 0}
+
+    def _ensure_started(self):
+        """Очередь и цикл печати создаются в event loop при первом задании"""
+        if self._engine is None or self._engine.done():
+            self._queue = asyncio.Queue(maxsize=self.queue_depth)
+            self._engine = asyncio.create_task(self._run())
+
+    async def _sleep(self, seconds: float):
+        await asyncio.sleep(seconds * self.time_scale)
+
+    def _now(self) -> float:
+        """Время эмуляции в секундах принтера"""
+        return asyncio.get_running_loop().time() / self.time_scale
+
+    async def _run(self):
+        """Цикл печати: задания по одному в порядке поступления"""
+        while True:
+            job_id = await self._queue.get()
+            future = self._jobs[job_id]
+            try:
+                if self._last_active is None or self._now() - self._last_active > self.sleep_after:
+                    await self._sleep(self.warmup_time)
+
+                await self._sleep(60.0 / self.pages_per_minute * self.pages_per_job)
+                self._last_active = self._now()
+
+                # Исход задания определяется генератором с seed - прогоны воспроизводимы
+                roll = self._random.random()
+                if roll < self.jam_rate:
+                    self.stats["jams"] += 1
+                    self.stats["failed"] += 1
+                    self._jammed_until = self._now() + self.jam_clear_time
+                    future.set_exception(PrintJobError(f"{self.name}: замятие бумаги, задание {job_id}"))
+                    await self._sleep(self.jam_clear_time)
+                elif roll < self.jam_rate + self.failure_rate:
+                    self.stats["failed"] += 1
+                    future.set_exception(PrintJobError(f"{self.name}: задание {job_id} прервано"))
+                else:
+                    self.stats["printed"] += 1
+                    self.stats["pages"] += self.pages_per_job
+                    future.set_result(True)
+            finally:
+                self.queue_length -= 1
+
+    async def print_file(self, file_path: str) -> str:
+        """Ставит задание в очередь спулера (ждет, если очередь заполнена)"""
+        self._ensure_started()
+        self._next_job_id += 1
+        job_id = str(self._next_job_id)
+        self._jobs[job_id] = asyncio.get_running_loop().create_future()
+        self.stats["submitted"] += 1
+        self.queue_length += 1
+        try:
+            await self._queue.put(job_id)
+        except asyncio.CancelledError:
+            self.queue_length -= 1
+            self._jobs.pop(job_id, None)
+            raise
+        return job_id
+
+    async def wait_for_job(self, job_id: str, timeout: float = 60) -> bool:
+        """Ожидает завершения задания; замятие или сбой - PrintJobError"""
+        future = self._jobs.get(job_id)
+        if future is None:
+            return False
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout * self.time_scale)
+        except asyncio.TimeoutError:
+            return False
+        except PrintJobError:
+            self._jobs.pop(job_id, None)
+            raise
+        self._jobs.pop(job_id, None)
+        return True
+
+    async def get_status(self) -> int:
+        """Не готов, пока устраняется замятие (во время прогрева задания принимаются)"""
+        if self._jammed_until and self._now() < self._jammed_until:
+            return STATUS_PAPER_JAM
+        return STATUS_READY
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счетчики эмулятора"""
+        return {"name": self.name, **self.stats, "queue_length": self.queue_length}
+
+    async def close(self):
+        """Останавливает цикл печати, незавершенные задания считаются прерванными"""
+        if self._engine is not None:
+            self._engine.cancel()
+            await asyncio.gather(self._engine, return_exceptions=True)
+            self._engine = None
+        for job_id, future in self._jobs.items():
+            if not future.done():
+                future.set_exception(PrintJobError(f"{self.name}: принтер остановлен, задание {job_id}"))
+                # Исключение может так и не быть получено - не засоряем лог
+                future.exception()
+        self._jobs.clear()
+
+
+def create_simulated_printers(count: int, seed: int = 0, prefix: str = "sim", **kwargs) -> Dict[str, SimulatedPrinter]:
+    """
+    Создает набор эмуляторов с разными, но воспроизводимыми seed
+
+    Args:
+        count: Число принтеров
+        seed: Базовый seed (принтер i получает seed + i)
+        prefix: Префикс имен принтеров
+        **kwargs: Параметры SimulatedPrinter
+
+    Returns:
+        Dict[str, SimulatedPrinter]: Имя принтера -> эмулятор
+    """
+    printers = {}
+    for index in range(count):
+        name = f"{prefix}{index + 1}"
+        printers[name] = SimulatedPrinter(name=name, seed=seed + index, **kwargs)
+    return printers
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Сервис статусов принтеров
+Статусы всех принтеров получаются одним запросом (Get-Printer / lpstat -p)
+и кэшируются на короткое время, так что процессор и веб-интерфейс
+не запускают отдельную команду на каждый принтер
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent.parent))
+
+from printer.printer_manager import PrinterManager
+
+
+# Код статуса "готов" (как PrinterStatus = 0 в Windows)
+STATUS_READY = 0
+# Остальные коды PrinterStatus Windows, которые сообщают сетевые принтеры
+STATUS_PAUSED = 1
+STATUS_ERROR = 2
+STATUS_PAPER_JAM = 8
+STATUS_PAPER_OUT = 16
+STATUS_OFFLINE = 128
+STATUS_DOOR_OPEN = 4194304
+# Неизвестный статус или принтер не найден
+STATUS_UNKNOWN = 999
+
+# Текстовые статусы, означающие готовность принтера ("busy" - CUPS печатает
+# задание и принимает следующие в очередь)
+READY_STATUSES = {"normal", "idle", "ready", "busy"}
+
+
+class PrinterStatusService:
+    """Кэш статусов всех принтеров системы с TTL и единственным обновлением"""
+
+    def __init__(self, ttl: float = 3.0, printer_manager: Optional[PrinterManager] = None):
+        """
+        Args:
+            ttl: Время жизни снимка статусов в секундах
+            printer_manager: Менеджер принтеров для перечисления системных принтеров
+        """
+        self.ttl = ttl
+        self.printer_manager = printer_manager or PrinterManager()
+
+        self._snapshot: List[Dict[str, Any]] = []
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+        self._updated_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_fresh(self) -> bool:
+        return self._updated_at is not None and time.monotonic() - self._updated_at < self.ttl
+
+    async def get_snapshot(self, force: bool = False) -> List[Dict[str, Any]]:
+        """
+        Получить список системных принтеров со статусами
+
+        Args:
+            force: Обновить снимок, даже если он еще не устарел
+
+        Returns:
+            List[Dict[str, Any]]: Список принтеров (как у PrinterManager.get_system_printers)
+        """
+        if not force and self.is_fresh:
+            return self._snapshot
+        return await self.refresh()
+
+    async def refresh(self) -> List[Dict[str, Any]]:
+        """Обновляет снимок; одновременные вызовы ожидают одно и то же обновление"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        # shield: отмена одного из ожидающих не прерывает общее обновление
+        return await asyncio.shield(self._refresh_task)
+
+    async def _refresh(self) -> List[Dict[str, Any]]:
+        """Один запрос статусов всех принтеров"""
+        printers = await self.printer_manager.get_system_printers()
+        self._snapshot = printers
+        self._by_name = {printer["name"]: printer for printer in printers}
+        self._updated_at = time.monotonic()
+        return printers
+
+    async def get_printer(self, printer_name: str) -> Optional[Dict[str, Any]]:
+        """Данные принтера из снимка"""
+        await self.get_snapshot()
+        return self._by_name.get(printer_name)
+
+    async def get_status(self, printer_name: str) -> int:
+        """
+        Статус принтера в виде кода
+
+        Returns:
+            int: 0 - готов, 999 - неизвестен или принтер не найден, иначе код PrinterStatus
+        """
+        printer = await self.get_printer(printer_name)
+        if printer is None:
+            return STATUS_UNKNOWN
+        return self.normalize_status(printer.get("status"))
+
+    @staticmethod
+    def normalize_status(status: Any) -> int:
+        """Приводит статус Windows (число) или lpstat (строка) к коду"""
+        if isinstance(status, bool):
+            return STATUS_UNKNOWN
+        if isinstance(status, int):
+            return status
+
+        status_str = str(status).strip()
+        try:
+            return int(status_str)
+        except ValueError:
+            if status_str.lower() in READY_STATUSES:
+                return STATUS_READY
+            return STATUS_UNKNOWN
+
+
+_service: Optional[PrinterStatusService] = None
+
+
+def get_printer_status_service() -> PrinterStatusService:
+    """Общий экземпляр сервиса для процессора и веб-интерфейса"""
+    global _service
+    if _service is None:
+        _service = PrinterStatusService()
+    return _service
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Печать на термопринтеры этикеток по сети (RAW, порт 9100)
+Изображение этикетки один раз конвертируется в графическое поле ZPL (^GFA)
+или EPL (GW) и кэшируется. Задания отправляются через постоянное
+TCP-соединение, а готовность и завершение печати определяются
+запросом состояния ~HS (только ZPL)
+"""
+
+import asyncio
+import os
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent.parent))
+
+from printer.backend import PrintBackend
+from printer.status_service import (
+    STATUS_READY, STATUS_PAUSED, STATUS_ERROR, STATUS_PAPER_OUT, STATUS_OFFLINE, STATUS_DOOR_OPEN
+)
+
+
+RAW_PORT = 9100
+
+# Готовые задания на языке принтера отправляются как есть
+RAW_EXTENSIONS = ('.zpl', '.epl', '.prn')
+
+# Порог черного цвета при переводе в 1 бит
+DEFAULT_THRESHOLD = 128
+
+STX = b"\x02"
+ETX = b"\x03"
+
+
+def _to_bitmap(img, threshold: int = DEFAULT_THRESHOLD):
+    """1-битное изображение, в котором 1 - черная точка (остаток строки - белый)"""
+    gray = ImageOps.invert(img.convert("L"))
+    return gray.point(lambda value: 255 if value > 255 - threshold else 0, "1")
+
+
+def _zpl_repeat(count: int) -> str:
+    """Счетчик повторов сжатия ZPL: G-Y = 1-19, g-z = 20-400"""
+    out = ""
+    while count >= 400:
+        out += "z"
+        count -= 400
+    if count >= 20:
+        out += chr(ord("g") + count // 20 - 1)
+        count %= 20
+    if count:
+        out += chr(ord("G") + count - 1)
+    return out
+
+
+def _zpl_compress_row(row: str) -> str:
+    """Сжатие строки hex-данных ^GFA (счетчики повторов, ',' - нули до конца, '!' - единицы)"""
+    tail = ""
+    body = row.rstrip("0")
+    if len(body) < len(row):
+        tail = ","
+    else:
+        body = row.rstrip("F")
+        if len(body) < len(row):
+            tail = "!"
+
+    out = []
+    i = 0
+    while i < len(body):
+        char = body[i]
+        j = i
+        while j < len(body) and body[j] == char:
+            j += 1
+        count = j - i
+        out.append((_zpl_repeat(count) if count > 1 else "") + char)
+        i = j
+    return "".join(out) + tail
+
+
+def image_to_zpl(img, threshold: int = DEFAULT_THRESHOLD, compress: bool = True) -> bytes:
+    """
+    Формирует задание ZPL с изображением в графическом поле ^GFA
+
+    Args:
+        img: Изображение PIL
+        threshold: Порог черного цвета (0-255)
+        compress: Использовать сжатие ASCII данных ZPL
+
+    Returns:
+        bytes: Задание ^XA ... ^XZ
+    """
+    bitmap = _to_bitmap(img, threshold)
+    width, height = bitmap.size
+    bytes_per_row = (width + 7) // 8
+    total = bytes_per_row * height
+    raw = bitmap.tobytes()
+
+    rows = []
+    previous = None
+    for y in range(height):
+        row = raw[y * bytes_per_row:(y + 1) * bytes_per_row].hex().upper()
+        if compress:
+            # ':' - строка совпадает с предыдущей
+            rows.append(":" if row == previous else _zpl_compress_row(row))
+        else:
+            rows.append(row)
+        previous = row
+
+    data = "".join(rows)
+    return f"^XA^FO0,0^GFA,{total},{total},{bytes_per_row},{data}^FS^XZ\n".encode("ascii")
+
+
+def image_to_epl(img, threshold: int = DEFAULT_THRESHOLD) -> bytes:
+    """
+    Формирует задание EPL с изображением в команде GW
+
+    Args:
+        img: Изображение PIL
+        threshold: Порог черного цвета (0-255)
+
+    Returns:
+        bytes: Задание N / GW / P1
+    """
+    bitmap = _to_bitmap(img, threshold)
+    width, height = bitmap.size
+    bytes_per_row = (width + 7) // 8
+    # В EPL 0 - черная точка
+    data = bytes(byte ^ 0xFF for byte in bitmap.tobytes())
+    header = f"\r\nN\r\nGW0,0,{bytes_per_row},{height},".encode("ascii")
+    return header + data + b"\r\nP1\r\n"
+
+
+CONVERTERS = {
+    "zpl": image_to_zpl,
+    "epl": image_to_epl,
+}
+
+
+@lru_cache(maxsize=256)
+def _convert_cached(path: str, mtime_ns: int, size: int, language: str, threshold: int) -> bytes:
+    """Конвертация с кэшем: ключ включает время изменения и размер файла"""
+    with Image.open(path) as img:
+        return CONVERTERS[language](img, threshold)
+
+
+def convert_label(file_path: str, language: str = "zpl", threshold: int = DEFAULT_THRESHOLD) -> bytes:
+    """
+    Задание на языке принтера для файла этикетки
+
+    Файлы .zpl/.epl/.prn возвращаются без изменений, изображения
+    конвертируются один раз, повторные вызовы берут результат из кэша.
+    """
+    if file_path.lower().endswith(RAW_EXTENSIONS):
+        with open(file_path, "rb") as f:
+            return f.read()
+
+    stat = os.stat(file_path)
+    return _convert_cached(os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, language, threshold)
+
+
+def parse_host_status(response: bytes) -> Dict[str, Any]:
+    """
+    Разбирает ответ ZPL ~HS (три строки STX ... ETX)
+
+    Returns:
+        Dict[str, Any]: Флаги состояния, число форматов в буфере и оставшихся этикеток
+    """
+    strings = []
+    for chunk in response.split(ETX):
+        if STX in chunk:
+            strings.append(chunk.split(STX, 1)[1].decode("ascii", errors="replace"))
+    if len(strings) < 2:
+        raise ValueError(f"Некорректный ответ ~HS: {response!r}")
+
+    first = strings[0].split(",")
+    second = strings[1].split(",")
+    return {
+        "paper_out": first[1] == "1",
+        "paused": first[2] == "1",
+        "formats_in_buffer": int(first[4]),
+        "buffer_full": first[5] == "1",
+        "corrupt_ram": first[9] == "1",
+        "under_temperature": first[10] == "1",
+        "over_temperature": first[11] == "1",
+        "head_up": second[2] == "1",
+        "ribbon_out": second[3] == "1",
+        "labels_remaining": int(second[8]),
+    }
+
+
+class ZplPrinter(PrintBackend):
+    """Сетевой термопринтер (ZPL или EPL) с постоянным RAW-соединением"""
+
+    def __init__(self, host: str, port: int = RAW_PORT, language: str = "zpl",
+                 threshold: int = DEFAULT_THRESHOLD, timeout: float = 5.0):
+        """
+        Args:
+            host: Адрес принтера
+            port: Порт RAW печати
+            language: Язык принтера (zpl или epl)
+            threshold: Порог черного цвета при конвертации изображений
+            timeout: Таймаут сетевых операций в секундах
+        """
+        if language not in CONVERTERS:
+            raise ValueError(f"Неизвестный язык принтера: {language}")
+
+        self.host = host
+        self.port = port
+        self.language = language
+        self.threshold = threshold
+        self.timeout = timeout
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+        # Номер последнего отправленного задания - принтер печатает их по порядку
+        self._sent = 0
+
+    @property
+    def is_connected(self) -> bool:
+        return (
+            self._writer is not None
+            and not self._writer.is_closing()
+            and not self._reader.at_eof()
+        )
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+
+    async def _disconnect(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self._reader = self._writer = None
+
+    async def _send(self, data: bytes):
+        """Отправляет данные; при разрыве соединения переподключается один раз"""
+        for attempt in range(2):
+            try:
+                if not self.is_connected:
+                    await self._connect()
+                self._writer.write(data)
+                await asyncio.wait_for(self._writer.drain(), self.timeout)
+                return
+            except (ConnectionError, OSError):
+                await self._disconnect()
+                if attempt:
+                    raise
+
+    async def print_file(self, file_path: str) -> str:
+        """
+        Отправляет этикетку на печать
+
+        Args:
+            file_path: Изображение этикетки или готовое задание .zpl/.epl
+
+        Returns:
+            str: Порядковый номер задания на этом принтере
+        """
+        data = await asyncio.to_thread(convert_label, file_path, self.language, self.threshold)
+        async with self._lock:
+            await self._send(data)
+            self._sent += 1
+            return str(self._sent)
+
+    async def get_host_status(self) -> Dict[str, Any]:
+        """Запрос состояния ~HS (только ZPL)"""
+        if self.language != "zpl":
+            raise NotImplementedError("Запрос состояния поддерживается только для ZPL")
+
+        async with self._lock:
+            await self._send(b"~HS")
+            try:
+                response = b""
+                while response.count(ETX) < 3:
+                    chunk = await asyncio.wait_for(self._reader.read(1024), self.timeout)
+                    if not chunk:
+                        raise ConnectionError("Принтер закрыл соединение")
+                    response += chunk
+            except (asyncio.TimeoutError, ConnectionError, OSError):
+                # Поздний ответ нарушит следующий запрос - начинаем с нового соединения
+                await self._disconnect()
+                raise
+            return parse_host_status(response)
+
+    async def get_status(self) -> int:
+        """
+        Статус принтера в виде кода PrinterStatus
+
+        Returns:
+            int: 0 - готов, иначе код ошибки
+        """
+        if self.language != "zpl":
+            # EPL не сообщает состояние - проверяем только доступность
+            try:
+                async with self._lock:
+                    if not self.is_connected:
+                        await self._connect()
+                return STATUS_READY
+            except (asyncio.TimeoutError, ConnectionError, OSError):
+                return STATUS_OFFLINE
+
+        try:
+            status = await self.get_host_status()
+        except (asyncio.TimeoutError, ConnectionError, OSError):
+            return STATUS_OFFLINE
+        except ValueError:
+            return STATUS_ERROR
+
+        if status["paper_out"] or status["ribbon_out"]:
+            return STATUS_PAPER_OUT
+        if status["head_up"]:
+            return STATUS_DOOR_OPEN
+        if status["paused"]:
+            return STATUS_PAUSED
+        if status["buffer_full"] or status["corrupt_ram"] or status["over_temperature"]:
+            return STATUS_ERROR
+        return STATUS_READY
+
+    async def wait_for_job(self, job_id: str, timeout: float = 60, poll_interval: float = 0.5) -> bool:
+        """
+        Ожидает завершения задания по состоянию ~HS
+
+        Задания печатаются по порядку, поэтому задание job_id завершено, когда
+        в буфере принтера осталось меньше заданий, чем было отправлено после него.
+
+        Returns:
+            bool: True - задание напечатано, False - таймаут (или EPL без обратной связи)
+        """
+        if self.language != "zpl":
+            return False
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            status = await self.get_host_status()
+            pending = status["formats_in_buffer"] + (1 if status["labels_remaining"] else 0)
+            if int(job_id) <= self._sent - pending:
+                return True
+            await asyncio.sleep(poll_interval)
+            poll_interval = min(poll_interval * 1.5, 3)
+        return False
+
+    async def close(self):
+        """Закрывает соединение с принтером"""
+        async with self._lock:
+            await self._disconnect()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки асинхронного запуска внешних команд
+Команды - короткие скрипты текущего интерпретатора Python
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+import printer.async_command as async_command
+from printer.async_command import run_command, MAX_CONCURRENT_COMMANDS
+
+
+def sleeper(seconds: float, marker: str = "") -> list:
+    """Команда: спит seconds и создает файл marker (если процесс не был завершен раньше)"""
+    script = f"import time; time.sleep({seconds}); open({marker!r}, 'w').close() if {marker!r} else None"
+    return [sys.executable, "-c", script]
+
+
+def test_output_and_input():
+    """Вывод и код возврата как у subprocess.run(text=True)"""
+    async def run():
+        result = await run_command(
+            [sys.executable, "-c", "import sys; print(sys.stdin.read().upper()); sys.exit(3)"], input="lp"
+        )
+        assert result.returncode == 3
+        assert result.stdout.strip() == "LP"
+
+    asyncio.run(run())
+    print("✅ Вывод и код возврата команды получены")
+
+
+def test_timeout_kills_process():
+    """По таймауту выбрасывается TimeoutExpired, а процесс завершается"""
+    async def run(marker):
+        started = time.monotonic()
+        try:
+            await run_command(sleeper(1.0, marker), timeout=0.3)
+            assert False, "Ожидался TimeoutExpired"
+        except subprocess.TimeoutExpired as e:
+            assert e.timeout == 0.3
+        assert time.monotonic() - started < 1.0
+        await asyncio.sleep(1.2)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        marker = os.path.join(tmp_dir, "finished")
+        asyncio.run(run(marker))
+        assert not os.path.exists(marker)
+    print("✅ Таймаут завершает процесс")
+
+
+def test_cancel_kills_process():
+    """Отмена корутины завершает процесс"""
+    async def run(marker):
+        command = asyncio.create_task(run_command(sleeper(1.0, marker)))
+        await asyncio.sleep(0.3)
+        command.cancel()
+        try:
+            await command
+            assert False, "Ожидалась отмена"
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(1.2)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        marker = os.path.join(tmp_dir, "finished")
+        asyncio.run(run(marker))
+        assert not os.path.exists(marker)
+    print("✅ Отмена завершает процесс")
+
+
+def test_concurrency_limit():
+    """Одновременно выполняется не больше MAX_CONCURRENT_COMMANDS команд"""
+    async def run():
+        running = 0
+        max_running = 0
+        create_subprocess_exec = asyncio.create_subprocess_exec
+
+        async def counting_create_subprocess_exec(*args, **kwargs):
+            nonlocal running, max_running
+            process = await create_subprocess_exec(*args, **kwargs)
+            running += 1
+            max_running = max(max_running, running)
+            wait = process.wait
+
+            async def counted_wait():
+                nonlocal running
+                try:
+                    return await wait()
+                finally:
+                    running -= 1
+
+            process.wait = counted_wait
+            return process
+
+        async_command.asyncio.create_subprocess_exec = counting_create_subprocess_exec
+        try:
+            results = await asyncio.gather(*(run_command(sleeper(0.2)) for _ in range(MAX_CONCURRENT_COMMANDS * 2)))
+        finally:
+            async_command.asyncio.create_subprocess_exec = create_subprocess_exec
+        assert all(result.returncode == 0 for result in results)
+        assert max_running == MAX_CONCURRENT_COMMANDS
+
+    asyncio.run(run())
+    print("✅ Число одновременных команд ограничено")
+
+
+def test_thread_fallback():
+    """Без поддержки подпроцессов в event loop команда выполняется в потоке"""
+    async def run():
+        async def not_implemented(*args, **kwargs):
+            raise NotImplementedError
+
+        create_subprocess_exec = asyncio.create_subprocess_exec
+        async_command.asyncio.create_subprocess_exec = not_implemented
+        try:
+            result = await run_command([sys.executable, "-c", "print('из потока')"])
+            assert result.returncode == 0 and result.stdout.strip() == "из потока"
+            try:
+                await run_command(sleeper(1.0), timeout=0.2)
+                assert False, "Ожидался TimeoutExpired"
+            except subprocess.TimeoutExpired:
+                pass
+        finally:
+            async_command.asyncio.create_subprocess_exec = create_subprocess_exec
+
+    asyncio.run(run())
+    print("✅ Запасной вариант через поток работает")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование запуска внешних команд...")
+    test_output_and_input()
+    test_timeout_kills_process()
+    test_cancel_kills_process()
+    test_concurrency_limit()
+    test_thread_fallback()
+    print("\n🎉 Тестирование завершено!")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки пакетной записи статусов в Excel отчет
+Отчет создается во временной папке, Redis заменяется fakeredis
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+from fake_redis import fake_redis_url
+from printer.excel import ExcelReportManager
+
+
+def make_report(filename, order_ids):
+    """Отчет с заказами в статусе "В очереди", как после generate_report"""
+    rows = [["article", order_id, "В очереди", "", 1, "", ""] for order_id in order_ids]
+    ExcelReportManager(filename)._write_streaming_report(rows, filename)
+
+
+def read_statuses(filename):
+    """ID заказа -> (статус, принтер)"""
+    sheet = load_workbook(filename).active
+    return {
+        str(row[1]): (row[2], row[5] or "")
+        for row in sheet.iter_rows(min_row=2, values_only=True)
+    }
+
+
+def test_updates_existing_report():
+    """Очередь обновлений применяется к строкам отчета, созданного другим процессом"""
+    async def run(filename):
+        manager = ExcelReportManager(filename, flush_interval=0.05)
+        manager.update_status("1", "Печатается", "p1")
+        manager.update_status("2", "Распечатан", "p2")
+        manager.update_status("1", "Распечатан")
+        await asyncio.sleep(0.3)
+        assert read_statuses(filename) == {
+            "1": ("Распечатан", "p1"), "2": ("Распечатан", "p2"), "3": ("В очереди", "")
+        }
+        await manager.close()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, "report.xlsx")
+        make_report(filename, ["1", "2", "3"])
+        asyncio.run(run(filename))
+    print("✅ Статусы записываются в существующий отчет")
+
+
+def test_unknown_orders_do_not_rewrite_file():
+    """Обновления заказов, которых нет в отчете, не перезаписывают файл"""
+    async def run(filename):
+        manager = ExcelReportManager(filename, flush_interval=0.05)
+        mtime = os.path.getmtime(filename)
+        manager.update_status("404", "Распечатан", "p1")
+        await asyncio.sleep(0.2)
+        await manager.close()
+        assert os.path.getmtime(filename) == mtime
+
+        # Без файла отчета пустая книга тоже не сохраняется
+        missing = filename + ".missing.xlsx"
+        manager = ExcelReportManager(missing)
+        manager.update_status("1", "Распечатан")
+        await manager.close()
+        assert not os.path.exists(missing)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, "report.xlsx")
+        make_report(filename, ["1"])
+        asyncio.run(run(filename))
+    print("✅ Файл не перезаписывается без изменений")
+
+
+def test_regenerated_report_is_reloaded():
+    """Если отчет пересоздан, обновления применяются к новому файлу, а не к старой копии"""
+    async def run(filename):
+        manager = ExcelReportManager(filename)
+        manager.update_status("1", "Печатается", "p1")
+        await manager.flush()
+
+        make_report(filename, ["1", "2"])
+        # Время изменения файла могло совпасть с записью в flush
+        os.utime(filename, (0, 0))
+        manager.update_status("2", "Распечатан", "p2")
+        await manager.close()
+        assert read_statuses(filename) == {"1": ("В очереди", ""), "2": ("Распечатан", "p2")}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, "report.xlsx")
+        make_report(filename, ["1"])
+        asyncio.run(run(filename))
+    print("✅ Пересозданный отчет перечитывается")
+
+
+def test_close_waits_for_running_save():
+    """close() дожидается сохранения, начатого писателем, и записывает остаток"""
+    async def run(filename):
+        manager = ExcelReportManager(filename, flush_interval=0)
+        manager.update_status("1", "Распечатан", "p1")
+        # Писатель начинает сохранение в потоке
+        while manager._save_future is None:
+            await asyncio.sleep(0)
+        manager.update_status("2", "Печатается", "p2")
+        save_future = manager._save_future
+        await manager.close()
+        assert save_future.done()
+        assert read_statuses(filename) == {"1": ("Распечатан", "p1"), "2": ("Печатается", "p2")}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, "report.xlsx")
+        make_report(filename, ["1", "2"])
+        asyncio.run(run(filename))
+    print("✅ Закрытие дожидается текущего сохранения")
+
+
+def test_two_managers_share_file():
+    """Два менеджера одного отчета не портят файл и не теряют обновления друг друга"""
+    async def run(filename):
+        managers = [ExcelReportManager(filename, flush_interval=0.01) for _ in range(2)]
+        for order_id in range(600):
+            managers[order_id % 2].update_status(str(order_id), "Распечатан", f"p{order_id % 2}")
+            if order_id % 50 == 0:
+                await asyncio.sleep(0.02)
+        await asyncio.gather(*(manager.close() for manager in managers))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, "report.xlsx")
+        make_report(filename, [str(order_id) for order_id in range(600)])
+        asyncio.run(run(filename))
+        statuses = read_statuses(filename)
+        assert all(statuses[str(order_id)] == ("Распечатан", f"p{order_id % 2}") for order_id in range(600))
+    print("✅ Менеджеры одного отчета записывают его по очереди")
+
+
+def test_streaming_report_from_scan():
+    """Потоковый отчет пишет строки порциями ZSCAN, без загрузки всех заказов"""
+    async def fill(redis_url):
+        import redis.asyncio as redis
+        r = redis.from_url(redis_url)
+        queue = {
+            json.dumps({"order_id": str(order_id), "article": "a1", "status": "pending", "priority": 1}): 1
+            for order_id in range(2500)
+        }
+        await r.zadd("print_queue", queue)
+        # Заказ 7 уже распечатан - в отчете одна строка с главным статусом
+        await r.zadd("completed_tasks", {json.dumps(
+            {"order_id": "7", "article": "a1", "status": "completed", "completed_by": "p1"}
+        ): 1})
+        await r.aclose()
+
+    async def run(redis_url, filename):
+        await fill(redis_url)
+        manager = ExcelReportManager(filename)
+        manager._load_report_data = None  # Общая загрузка заказов не используется
+        await manager.generate_streaming_report(redis_url, chunk_size=300)
+
+    with tempfile.TemporaryDirectory() as tmp_dir, fake_redis_url() as redis_url:
+        filename = os.path.join(tmp_dir, "report.xlsx")
+        asyncio.run(run(redis_url, filename))
+        statuses = read_statuses(filename)
+        assert len(statuses) == 2500
+        assert statuses["7"] == ("Распечатан", "p1")
+        assert statuses["2499"] == ("В очереди", "")
+    print("✅ Потоковый отчет пишется порциями")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование записи статусов в Excel...")
+    test_updates_existing_report()
+    test_unknown_orders_do_not_rewrite_file()
+    test_regenerated_report_is_reloaded()
+    test_close_waits_for_running_save()
+    test_two_managers_share_file()
+    test_streaming_report_from_scan()
+    print("\n🎉 Тестирование завершено!")
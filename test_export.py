@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки выгрузки задач в CSV / JSONL
+Redis заменяется fakeredis
+"""
+
+import asyncio
+import csv
+import io
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+from fake_redis import fake_redis_url
+from printer.export import EXPORT_FIELDS, iter_csv
+from web_interface import WebInterface
+
+
+def run_with_client(test):
+    """Запускает тест с веб-интерфейсом на отдельном fakeredis"""
+    async def run(redis_url):
+        web = WebInterface(redis_url)
+        queue_manager = web.queue_manager
+        await queue_manager.connect()
+        transport = httpx.ASGITransport(app=web.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await test(queue_manager, client)
+        finally:
+            await queue_manager.redis.aclose()
+
+    with fake_redis_url() as redis_url:
+        asyncio.run(run(redis_url))
+
+
+def local_iso(year, month, day, hour):
+    """Дата задачи: локальное время без смещения, как в datetime.now().isoformat()"""
+    return datetime(year, month, day, hour).isoformat()
+
+
+def test_date_filter_with_offset():
+    """Границы со смещением сравниваются с датами задач в локальном времени"""
+    async def test(queue_manager, client):
+        for order_id, hour in (("1", 8), ("2", 12), ("3", 18)):
+            task = {"id": order_id, "order_id": order_id, "status": "completed",
+                    "completed_by": "p1", "completed_at": local_iso(2026, 10, 19, hour)}
+            await queue_manager.redis.zadd("completed_tasks", {json.dumps(task): 1})
+
+        # 10:00 - 14:00 локального времени, записанные в UTC
+        date_from = datetime(2026, 10, 19, 10).astimezone().astimezone(timezone.utc).isoformat()
+        date_to = datetime(2026, 10, 19, 14).astimezone().astimezone(timezone.utc).isoformat()
+        response = await client.get("/api/export/completed-tasks", params={
+            "format": "jsonl", "date_from": date_from, "date_to": date_to
+        })
+        assert response.status_code == 200
+        assert [json.loads(line)["id"] for line in response.text.splitlines()] == ["2"]
+
+        # Дата без времени в date_to - до конца дня
+        response = await client.get("/api/export/completed-tasks", params={
+            "format": "jsonl", "date_from": "2026-10-19", "date_to": "2026-10-19"
+        })
+        assert len(response.text.splitlines()) == 3
+
+    run_with_client(test)
+    print("✅ Даты со смещением фильтруются без ошибок")
+
+
+def test_invalid_date_returns_400():
+    """Неверная дата отклоняется до начала выгрузки"""
+    async def test(queue_manager, client):
+        for params in ({"date_from": "вчера"}, {"date_to": "2026-13-01"}):
+            response = await client.get("/api/export/queue", params=params)
+            assert response.status_code == 400
+
+    run_with_client(test)
+    print("✅ Неверная дата возвращает 400")
+
+
+def test_csv_header_and_quoting():
+    """CSV начинается с заголовка EXPORT_FIELDS, значения с запятыми и кавычками экранируются"""
+    async def tasks():
+        yield {"id": "1", "order_id": "A-1", "last_error": 'Принтер "Zebra", нет бумаги', "extra": "не выгружается"}
+        yield {"id": "2", "order_id": "A-2", "attempts": 3}
+
+    async def run():
+        return "".join([chunk async for chunk in iter_csv(tasks())])
+
+    content = asyncio.run(run())
+    lines = content.splitlines()
+    assert lines[0] == ",".join(EXPORT_FIELDS)
+    assert '"Принтер ""Zebra"", нет бумаги"' in lines[1]
+    assert "не выгружается" not in content
+
+    rows = list(csv.DictReader(io.StringIO(content)))
+    assert rows[0]["last_error"] == 'Принтер "Zebra", нет бумаги'
+    assert rows[1]["attempts"] == "3" and rows[1]["last_error"] == ""
+    print("✅ Заголовок и экранирование CSV")
+
+
+def test_printer_filter():
+    """Фильтр printer= сравнивается с assigned_printer и completed_by"""
+    async def test(queue_manager, client):
+        queued = {"id": "1", "status": "pending", "assigned_printer": "p1"}
+        delayed = {"id": "2", "status": "retry", "assigned_printer": "p1"}
+        other = {"id": "3", "status": "pending", "assigned_printer": "p2"}
+        await queue_manager.redis.zadd(queue_manager.queue_name, {json.dumps(queued): 1, json.dumps(other): 1})
+        await queue_manager.redis.zadd(queue_manager.delayed_queue_name, {json.dumps(delayed): 1})
+        for order_id, printer in (("4", "p1"), ("5", "p2")):
+            task = {"id": order_id, "status": "completed", "completed_by": printer}
+            await queue_manager.redis.zadd("completed_tasks", {json.dumps(task): 1})
+
+        response = await client.get("/api/export/queue", params={"format": "jsonl", "printer": "p1"})
+        assert sorted(json.loads(line)["id"] for line in response.text.splitlines()) == ["1", "2"]
+
+        response = await client.get("/api/export/completed-tasks", params={"format": "csv", "printer": "p1"})
+        assert [row["id"] for row in csv.DictReader(io.StringIO(response.text))] == ["4"]
+
+    run_with_client(test)
+    print("✅ Фильтр по принтеру")
+
+
+def test_unparseable_date_skipped():
+    """Задача с нечитаемой датой пропускается, выгрузка продолжается"""
+    async def test(queue_manager, client):
+        dates = (("1", local_iso(2026, 10, 19, 9)), ("2", "вчера"), ("3", None), ("4", local_iso(2026, 10, 19, 15)))
+        for score, (order_id, completed_at) in enumerate(dates):
+            task = {"id": order_id, "status": "completed", "completed_by": "p1", "completed_at": completed_at}
+            await queue_manager.redis.zadd("completed_tasks", {json.dumps(task): score})
+
+        response = await client.get("/api/export/completed-tasks", params={
+            "format": "jsonl", "date_from": "2026-10-19", "date_to": "2026-10-19"
+        })
+        assert response.status_code == 200
+        assert [json.loads(line)["id"] for line in response.text.splitlines()] == ["1", "4"]
+
+        # Без фильтра по дате задачи выгружаются как есть
+        response = await client.get("/api/export/completed-tasks", params={"format": "jsonl"})
+        assert len(response.text.splitlines()) == 4
+
+    run_with_client(test)
+    print("✅ Задачи с нечитаемой датой пропускаются")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование выгрузки задач...")
+    test_date_filter_with_offset()
+    test_invalid_date_returns_400()
+    test_csv_header_and_quoting()
+    test_printer_filter()
+    test_unparseable_date_skipped()
+    print("\n🎉 Тестирование завершено!")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки отключения неисправных принтеров
+Вместо Redis используется хэш в памяти, время подменяется ручными часами
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+import printer.health as health_module
+from printer.add_to_print import PrintQueueManager
+from printer.health import PrinterHealth, STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN
+
+
+class MemoryHash:
+    """Команды хэшей Redis, которые использует PrinterHealth"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def hgetall(self, key):
+        return {name.encode(): value.encode() for name, value in self.data.get(key, {}).items()}
+
+    async def hset(self, key, name, value):
+        self.data.setdefault(key, {})[name] = value
+
+    async def hdel(self, key, name):
+        return 1 if self.data.get(key, {}).pop(name, None) is not None else 0
+
+
+def make_health(clock, **kwargs) -> PrinterHealth:
+    queue_manager = PrintQueueManager()
+    queue_manager.redis = MemoryHash()
+    health_module.time = SimpleNamespace(time=lambda: clock[0])
+    return PrinterHealth(queue_manager, **kwargs)
+
+
+def test_breaker_opens_after_threshold():
+    """После failure_threshold ошибок подряд принтер отключается"""
+    async def run():
+        clock = [1000.0]
+        health = make_health(clock, failure_threshold=3, base_cooldown=10)
+
+        assert await health.record_failure("p1", "нет бумаги") is None
+        assert await health.record_failure("p1", "нет бумаги") is None
+        assert health.state("p1") == STATE_CLOSED
+        assert await health.record_failure("p1", "замятие") == 10
+        assert health.is_open("p1")
+        assert not health.is_open("p2")
+
+        report = await health.get_all()
+        assert report["p1"]["state"] == STATE_OPEN
+        assert report["p1"]["last_error"] == "замятие"
+        assert report["p1"]["retry_in"] == 10
+
+    try:
+        asyncio.run(run())
+    finally:
+        health_module.time = time
+    print("✅ Принтер отключается после серии ошибок")
+
+
+def test_cooldown_backoff_and_recovery():
+    """Пробная задача после паузы: ошибка удваивает паузу, успех возвращает принтер"""
+    async def run():
+        clock = [1000.0]
+        health = make_health(clock, failure_threshold=2, base_cooldown=10, max_cooldown=30)
+        for _ in range(2):
+            await health.record_failure("p1", "ошибка")
+
+        clock[0] += 10
+        assert health.state("p1") == STATE_HALF_OPEN
+        assert await health.record_failure("p1", "ошибка") == 20
+        assert health.is_open("p1")
+        clock[0] += 20
+        assert await health.record_failure("p1", "ошибка") == 30
+
+        clock[0] += 30
+        await health.record_success("p1")
+        assert health.state("p1") == STATE_CLOSED
+        # Последняя ошибка остается в отчете
+        report = await health.get_all()
+        assert report["p1"]["consecutive_failures"] == 0
+        assert report["p1"]["total_failures"] == 4
+
+    try:
+        asyncio.run(run())
+    finally:
+        health_module.time = time
+    print("✅ Пауза растет с каждой неудачей, успех возвращает принтер")
+
+
+def test_state_shared_through_redis():
+    """Состояние, записанное одним процессором, видят остальные; сброс вручную"""
+    async def run():
+        clock = [1000.0]
+        writer = make_health(clock, failure_threshold=1)
+        reader = PrinterHealth(writer.queue_manager, failure_threshold=1)
+
+        await writer.record_failure("p1", "нет связи")
+        assert not reader.is_open("p1")
+        await reader.load()
+        assert reader.is_open("p1")
+
+        assert await reader.reset("p1")
+        assert not await reader.reset("p1")
+        await writer.load()
+        assert not writer.is_open("p1")
+
+    try:
+        asyncio.run(run())
+    finally:
+        health_module.time = time
+    print("✅ Состояние принтеров общее для всех процессоров")
+
+
+
+def test_half_open_single_probe():
+    """В half_open выдается одна пробная задача, следующая - после ее завершения"""
+    async def run():
+        clock = [1000.0]
+        health = make_health(clock, failure_threshold=1, base_cooldown=10)
+        assert health.start_probe("p1") and health.start_probe("p1")
+        assert not health.is_probing("p1")
+
+        await health.record_failure("p1", "ошибка")
+        assert health.state("p1") == STATE_OPEN
+        clock[0] += 10
+        assert health.start_probe("p1")
+        assert health.is_probing("p1")
+        assert not health.start_probe("p1")
+        assert (await health.get_all())["p1"]["probing"]
+
+        waiter = asyncio.create_task(health.wait_for_probe("p1", 5))
+        await asyncio.sleep(0)
+        health.end_probe("p1")
+        await asyncio.wait_for(waiter, 1)
+
+        # Пробная задача не получена из очереди - принтер снова ждет пробную задачу
+        assert health.start_probe("p1")
+        health.end_probe("p1")
+        await health.record_success("p1")
+        assert health.start_probe("p1") and not health.is_probing("p1")
+
+    try:
+        asyncio.run(run())
+    finally:
+        health_module.time = time
+    print("✅ В half_open выдается одна пробная задача")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование отключения неисправных принтеров...")
+    test_breaker_opens_after_threshold()
+    test_cooldown_backoff_and_recovery()
+    test_state_shared_through_redis()
+    test_half_open_single_probe()
+    print("\n🎉 Тестирование завершено!")
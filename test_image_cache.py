@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки кэша подготовленных изображений
+Изображения создаются во временной папке
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+from PIL import Image
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+from printer.image_cache import ImageCache
+from web_interface import WebInterface
+
+# Изображение 10x10 в RGB занимает в кэше 300 байт
+IMAGE_BYTES = 10 * 10 * 3
+
+
+def make_image(tmp_dir, name: str, color: int = 0) -> str:
+    path = os.path.join(tmp_dir, name)
+    Image.new("L", (10, 10), color).save(path)
+    return path
+
+
+def test_lru_eviction_by_bytes():
+    """При превышении лимита в байтах вытесняется давно не использованное изображение"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        first, second, third = (make_image(tmp_dir, f"{name}.png") for name in ("first", "second", "third"))
+        cache = ImageCache(max_bytes=IMAGE_BYTES * 2)
+
+        cache.get(first)
+        cache.get(second)
+        # first использован последним - вытесняться должен second
+        cache.get(first)
+        cache.get(third)
+
+        stats = cache.get_stats()
+        assert stats["entries"] == 2 and stats["bytes"] == IMAGE_BYTES * 2
+        assert stats["evictions"] == 1
+
+        cache.get(first)
+        assert cache.hits == 2
+        cache.get(second)
+        assert cache.misses == 4
+
+        # Изображение больше всего кэша не кэшируется и ничего не вытесняет
+        small_cache = ImageCache(max_bytes=IMAGE_BYTES - 1)
+        small_cache.get(first)
+        assert small_cache.get_stats()["entries"] == 0 and small_cache.evictions == 0
+    print("✅ LRU вытеснение по размеру в байтах")
+
+
+def test_invalidation_on_mtime_change():
+    """После изменения файла кэш отдает новое изображение"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = make_image(tmp_dir, "label.png", color=0)
+        cache = ImageCache()
+        assert cache.get(path).getpixel((0, 0)) == (0, 0, 0)
+
+        # Файл перезаписан тем же размером - меняется только время изменения
+        make_image(tmp_dir, "label.png", color=255)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        assert cache.get(path).getpixel((0, 0)) == (255, 255, 255)
+        assert cache.misses == 2 and cache.hits == 0
+    print("✅ Кэш сбрасывается при изменении файла")
+
+
+def test_stats_api():
+    """Счетчики попаданий и промахов доступны через /api/image-cache"""
+    async def run(path):
+        web = WebInterface()
+        web.image_cache = ImageCache()
+        for _ in range(3):
+            web.image_cache.get(path)
+
+        transport = httpx.ASGITransport(app=web.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/api/image-cache")
+        assert response.status_code == 200
+        stats = response.json()
+        assert stats["hits"] == 2 and stats["misses"] == 1
+        assert stats["hit_rate"] == round(2 / 3, 4)
+        assert stats["entries"] == 1 and stats["bytes"] == IMAGE_BYTES
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        asyncio.run(run(make_image(tmp_dir, "label.png")))
+    print("✅ Статистика кэша в API")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование кэша изображений...")
+    test_lru_eviction_by_bytes()
+    test_invalidation_on_mtime_change()
+    test_stats_api()
+    print("\n🎉 Тестирование завершено!")
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки печати по IPP
+Вместо CUPS запускается локальный IPP сервер на aiohttp, который
+принимает Print-Job и отдает состояние задания и принтера
+"""
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+from aiohttp import web
+
+from printer.ipp_printer import (
+    IppPrinter, PrintJobError, decode_message, encode_request, group_attributes, _encode_attribute,
+    OP_PRINT_JOB, OP_GET_JOB_ATTRIBUTES, OP_GET_PRINTER_ATTRIBUTES,
+    TAG_OPERATION, TAG_JOB, TAG_PRINTER, TAG_END, TAG_CHARSET, TAG_LANGUAGE,
+    TAG_INTEGER, TAG_ENUM, TAG_KEYWORD, TAG_BOOLEAN,
+    JOB_PENDING, JOB_PROCESSING, JOB_COMPLETED, JOB_ABORTED, PRINTER_IDLE, PRINTER_STOPPED
+)
+from printer.status_service import STATUS_READY, STATUS_PAPER_OUT, STATUS_PAUSED, STATUS_OFFLINE
+
+
+def encode_response(status: int, request_id: int, group_tag: int, attributes) -> bytes:
+    """Ответ IPP: операционные атрибуты и одна группа атрибутов"""
+    out = bytes([1, 1]) + status.to_bytes(2, "big") + request_id.to_bytes(4, "big")
+    out += bytes([TAG_OPERATION])
+    out += _encode_attribute(TAG_CHARSET, "attributes-charset", "utf-8")
+    out += _encode_attribute(TAG_LANGUAGE, "attributes-natural-language", "en")
+    out += bytes([group_tag])
+    for tag, name, value in attributes:
+        out += _encode_attribute(tag, name, value)
+    return out + bytes([TAG_END])
+
+
+class FakeIppServer:
+    """Локальный IPP принтер: задание проходит pending -> processing -> completed"""
+
+    def __init__(self, polls_per_state: int = 2):
+        self.polls_per_state = polls_per_state
+        self.jobs = {}
+        self.documents = []
+        self.poll_times = []
+        self.peers = set()
+        self.abort_jobs = False
+        self.printer_state = PRINTER_IDLE
+        self.printer_reasons = ["none"]
+        self.runner = None
+        self.port = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/printers/test", self._handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    @property
+    def uri(self) -> str:
+        return f"ipp://127.0.0.1:{self.port}/printers/test"
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.peers.add(request.transport.get_extra_info("peername"))
+        message = decode_message(await request.read())
+        operation = message["code"]
+        attributes = group_attributes(message, TAG_OPERATION)
+
+        if operation == OP_PRINT_JOB:
+            job_id = len(self.jobs) + 1
+            self.jobs[job_id] = 0
+            self.documents.append((attributes["document-format"], message["data"]))
+            body = encode_response(0, message["request_id"], TAG_JOB, [
+                (TAG_INTEGER, "job-id", job_id),
+                (TAG_ENUM, "job-state", JOB_PENDING),
+            ])
+        elif operation == OP_GET_JOB_ATTRIBUTES:
+            self.poll_times.append(asyncio.get_running_loop().time())
+            job_id = attributes["job-id"]
+            self.jobs[job_id] += 1
+            states = [JOB_PENDING, JOB_PROCESSING, JOB_ABORTED if self.abort_jobs else JOB_COMPLETED]
+            state = states[min(self.jobs[job_id] // self.polls_per_state, 2)]
+            body = encode_response(0, message["request_id"], TAG_JOB, [
+                (TAG_ENUM, "job-state", state),
+                (TAG_KEYWORD, "job-state-reasons", "aborted-by-system" if state == JOB_ABORTED else "none"),
+            ])
+        elif operation == OP_GET_PRINTER_ATTRIBUTES:
+            body = encode_response(0, message["request_id"], TAG_PRINTER, [
+                (TAG_ENUM, "printer-state", self.printer_state),
+                (TAG_KEYWORD, "printer-state-reasons", self.printer_reasons),
+                (TAG_BOOLEAN, "printer-is-accepting-jobs", True),
+            ])
+        else:
+            body = encode_response(0x0501, message["request_id"], TAG_JOB, [])
+        return web.Response(body=body, content_type="application/ipp")
+
+
+def make_document() -> str:
+    path = tempfile.mktemp(suffix=".pdf")
+    Path(path).write_bytes(b"%PDF-1.4 test label")
+    return path
+
+
+def test_encode_decode_roundtrip():
+    """Запрос кодируется и разбирается обратно, включая несколько значений"""
+    data = encode_request(OP_GET_JOB_ATTRIBUTES, 7, [
+        (TAG_INTEGER, "job-id", 42),
+        (TAG_KEYWORD, "requested-attributes", ["job-state", "job-state-reasons"]),
+    ])
+    message = decode_message(data)
+    attributes = group_attributes(message, TAG_OPERATION)
+    assert message["code"] == OP_GET_JOB_ATTRIBUTES and message["request_id"] == 7
+    assert attributes["job-id"] == 42
+    assert attributes["requested-attributes"] == ["job-state", "job-state-reasons"]
+    print("✅ Кодирование IPP корректно")
+
+
+def test_print_job_and_wait():
+    """Print-Job возвращает job-id, ожидание завершается на completed"""
+    async def run():
+        server = FakeIppServer()
+        await server.start()
+        printer = IppPrinter(server.uri, min_poll_interval=0.01, max_poll_interval=0.05)
+
+        first = await printer.print_file(make_document())
+        second = await printer.print_file(make_document())
+        assert (first, second) == ("1", "2")
+        assert server.documents[0] == ("application/pdf", b"%PDF-1.4 test label")
+
+        assert await printer.wait_for_job(first, timeout=5)
+        assert await printer.wait_for_job(second, timeout=5)
+        # Все запросы через одно keep-alive соединение
+        assert len(server.peers) == 1
+
+        await printer.close()
+        await server.stop()
+
+    asyncio.run(run())
+    print("✅ Задание печатается и отслеживается по job-id")
+
+
+def test_aborted_job_raises():
+    """Прерванное принтером задание - ошибка печати"""
+    async def run():
+        server = FakeIppServer(polls_per_state=1)
+        server.abort_jobs = True
+        await server.start()
+        printer = IppPrinter(server.uri, min_poll_interval=0.01)
+
+        job_id = await printer.print_file(make_document())
+        try:
+            await printer.wait_for_job(job_id, timeout=5)
+            assert False, "ожидался PrintJobError"
+        except PrintJobError as e:
+            assert "aborted-by-system" in str(e)
+
+        await printer.close()
+        await server.stop()
+
+    asyncio.run(run())
+    print("✅ Прерванное задание определяется")
+
+
+def test_poll_interval_backoff():
+    """Интервал опроса растет, пока состояние не меняется"""
+    async def run():
+        server = FakeIppServer(polls_per_state=4)
+        await server.start()
+        printer = IppPrinter(server.uri, min_poll_interval=0.02, max_poll_interval=1)
+
+        job_id = await printer.print_file(make_document())
+        assert await printer.wait_for_job(job_id, timeout=10)
+
+        gaps = [b - a for a, b in zip(server.poll_times, server.poll_times[1:])]
+        # Опросы в состоянии pending: 0.02 -> 0.04 -> 0.08, после смены состояния - снова 0.02
+        assert gaps[0] < gaps[1] < gaps[2], gaps
+        assert gaps[3] < gaps[2], gaps
+
+        await printer.close()
+        await server.stop()
+
+    asyncio.run(run())
+    print("✅ Интервал опроса адаптивный")
+
+
+def test_printer_status():
+    """Статус принтера по printer-state и printer-state-reasons"""
+    async def run():
+        server = FakeIppServer()
+        await server.start()
+        printer = IppPrinter(server.uri)
+
+        assert await printer.get_status() == STATUS_READY
+        server.printer_reasons = ["media-empty-error", "toner-low-warning"]
+        assert await printer.get_status() == STATUS_PAPER_OUT
+        server.printer_reasons = ["toner-low-warning"]
+        assert await printer.get_status() == STATUS_READY
+        server.printer_state = PRINTER_STOPPED
+        assert await printer.get_status() == STATUS_PAUSED
+
+        await printer.close()
+        await server.stop()
+        offline = IppPrinter(server.uri, timeout=1)
+        assert await offline.get_status() == STATUS_OFFLINE
+        await offline.close()
+
+    asyncio.run(run())
+    print("✅ Статус принтера определяется")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование печати по IPP...")
+    test_encode_decode_roundtrip()
+    test_print_job_and_wait()
+    test_aborted_job_raises()
+    test_poll_interval_backoff()
+    test_printer_status()
+    print("\n🎉 Тестирование завершено!")
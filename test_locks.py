@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки блокировок принтеров
+Redis заменяется fakeredis (Lua-скрипты выполняются через lupa)
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+from fake_redis import run_with_redis
+from printer.locks import PrinterLocks
+
+
+KEY_PREFIX = "test_printer_lock:"
+
+
+def test_one_owner_per_printer():
+    """Принтер достается одному процессору, второй получает только свободные"""
+    async def test(queue_manager):
+        first = PrinterLocks(queue_manager, owner_id="host-a", key_prefix=KEY_PREFIX)
+        second = PrinterLocks(queue_manager, owner_id="host-b", key_prefix=KEY_PREFIX)
+
+        assert await first.acquire(["p1", "p2"]) == {"p1", "p2"}
+        assert await second.acquire(["p1", "p2", "p3"]) == {"p3"}
+        # Повторный запрос владельца продлевает аренду
+        assert await first.acquire(["p1", "p2"]) == {"p1", "p2"}
+        assert await first.get_owners(["p1", "p3", "p4"]) == {"p1": "host-a", "p3": "host-b", "p4": None}
+
+        # Чужую блокировку снять нельзя
+        second.owned.add("p1")
+        await second.release("p1")
+        assert (await first.get_owners(["p1"]))["p1"] == "host-a"
+
+    run_with_redis(test)
+    print("✅ У каждого принтера один владелец")
+
+
+def test_failover_after_lease_expires():
+    """Если владелец перестал продлевать аренду, принтер забирает другой процессор"""
+    async def test(queue_manager):
+        first = PrinterLocks(queue_manager, owner_id="host-a", lease_time=0.2, key_prefix=KEY_PREFIX)
+        second = PrinterLocks(queue_manager, owner_id="host-b", lease_time=0.2, key_prefix=KEY_PREFIX)
+
+        assert await first.acquire(["p1"]) == {"p1"}
+        assert await second.acquire(["p1"]) == set()
+        await asyncio.sleep(0.3)
+
+        assert await second.acquire(["p1"]) == {"p1"}
+        # Прежний владелец узнает о потере при продлении
+        assert await first.renew() == ["p1"]
+        assert not first.owned
+
+        await second.release_all()
+        assert await first.acquire(["p1"]) == {"p1"}
+
+    run_with_redis(test)
+    print("✅ Принтер переходит к другому процессору после истечения аренды")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование блокировок принтеров...")
+    test_one_owner_per_printer()
+    test_failover_after_lease_expires()
+    print("\n🎉 Тестирование завершено!")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки разбора вывода lpstat -p
+"""
+
+import sys
+from pathlib import Path
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+from printer.printer_manager import PrinterManager
+from printer.status_service import PrinterStatusService, STATUS_READY, STATUS_UNKNOWN
+
+
+# Вывод lpstat -p -d CUPS 2.4
+LPSTAT_OUTPUT = """printer HP_LaserJet is idle.  enabled since Mon 19 Oct 2026 09:12:03 AM MSK
+printer Zebra-ZD420.1 now printing Zebra-ZD420.1-123.  enabled since Mon 19 Oct 2026 09:40:51 AM MSK
+printer TSC-TE200 disabled since Mon 19 Oct 2026 08:02:44 AM MSK -
+\tPaused
+printer xerox.office is idle.  enabled since Sun 18 Oct 2026 06:30:00 PM MSK
+system default destination: HP_LaserJet
+"""
+
+
+def test_parse_lpstat():
+    """Имена с "-" и ".", печатающие и остановленные принтеры"""
+    printers = PrinterManager()._parse_lpstat(LPSTAT_OUTPUT)
+    statuses = {printer["name"]: printer["status"] for printer in printers}
+    assert statuses == {
+        "HP_LaserJet": "idle",
+        "Zebra-ZD420.1": "busy",
+        "TSC-TE200": "disabled",
+        "xerox.office": "idle",
+    }
+    assert printers[0]["type"] == "laser"
+    print("✅ Вывод lpstat разбирается")
+
+
+def test_busy_printer_is_ready():
+    """Печатающий принтер получает задачи, остановленный - нет"""
+    assert PrinterStatusService.normalize_status("busy") == STATUS_READY
+    assert PrinterStatusService.normalize_status("idle") == STATUS_READY
+    assert PrinterStatusService.normalize_status("disabled") == STATUS_UNKNOWN
+    print("✅ Печатающий принтер считается готовым")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование разбора lpstat...")
+    test_parse_lpstat()
+    test_busy_printer_is_ready()
+    print("\n🎉 Тестирование завершено!")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки протокола постоянного процесса PowerShell
+Вместо powershell запускается поддельная оболочка на Python,
+поэтому тесты работают и в Linux
+"""
+
+import asyncio
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+from printer.powershell_host import PowerShellHost, PowerShellHostPool, PowerShellHostError
+
+# Поддельная оболочка: тот же протокол, что и HOST_SCRIPT
+FAKE_SHELL = r"""
+import json, sys, time
+for line in sys.stdin:
+    if not line.strip():
+        continue
+    request = json.loads(line)
+    command, _, arg = request["command"].partition(" ")
+    code, out, err = 0, "", ""
+    if command == "echo":
+        out = arg + "\n"
+    elif command == "fail":
+        code, err = 1, arg
+    elif command == "noise":
+        print("шум без маркера", flush=True)
+        out = arg
+    elif command == "sleep":
+        time.sleep(float(arg))
+        out = "done"
+    elif command == "crash":
+        sys.exit(3)
+    response = {"id": request["id"], "returncode": code, "stdout": out, "stderr": err}
+    print("@@PSHOST@@" + json.dumps(response), flush=True)
+"""
+
+FAKE_ARGV = [sys.executable, "-c", FAKE_SHELL]
+
+
+def test_host_runs_commands():
+    """Команды выполняются в одном процессе и возвращают CompletedProcess"""
+    async def run():
+        host = PowerShellHost(FAKE_ARGV)
+        result = await host.run("echo Принтер готов")
+        pid = host.process.pid
+
+        assert isinstance(result, subprocess.CompletedProcess)
+        assert result.returncode == 0
+        assert result.stdout.strip() == "Принтер готов"
+
+        failed = await host.run("fail нет принтера")
+        assert failed.returncode == 1
+        assert failed.stderr == "нет принтера"
+
+        # Строки без маркера игнорируются
+        noisy = await host.run("noise ok")
+        assert noisy.stdout == "ok"
+
+        assert host.process.pid == pid
+        await host.close()
+
+    asyncio.run(run())
+    print("✅ Команды выполняются в постоянном процессе")
+
+
+def test_host_restarts_after_crash():
+    """После падения процесса следующий вызов запускает новый"""
+    async def run():
+        host = PowerShellHost(FAKE_ARGV)
+        await host.run("echo 1")
+
+        try:
+            await host.run("crash")
+            assert False, "ожидалась PowerShellHostError"
+        except PowerShellHostError:
+            pass
+
+        result = await host.run("echo 2")
+        assert result.stdout.strip() == "2"
+        assert host.restarts == 1
+        await host.close()
+
+    asyncio.run(run())
+    print("✅ Процесс перезапускается после падения")
+
+
+def test_host_timeout_kills_process():
+    """Зависшая команда завершается по таймауту, процесс перезапускается"""
+    async def run():
+        host = PowerShellHost(FAKE_ARGV)
+        try:
+            await host.run("sleep 5", timeout=0.3)
+            assert False, "ожидался TimeoutExpired"
+        except subprocess.TimeoutExpired:
+            pass
+
+        assert not host.is_running
+        result = await host.run("echo снова")
+        assert result.stdout.strip() == "снова"
+        await host.close()
+
+    asyncio.run(run())
+    print("✅ Таймаут завершает зависший процесс")
+
+
+def test_pool_runs_in_parallel():
+    """Пул выполняет команды на нескольких процессах одновременно"""
+    async def run():
+        pool = PowerShellHostPool(size=3, argv=FAKE_ARGV)
+        # Прогрев: процессы запускаются при первом вызове
+        await asyncio.gather(*(pool.run("echo warmup") for _ in range(3)))
+
+        start = time.monotonic()
+        results = await asyncio.gather(*(pool.run("sleep 0.3") for _ in range(3)))
+        elapsed = time.monotonic() - start
+
+        assert all(r.stdout == "done" for r in results)
+        assert elapsed < 0.8, elapsed
+        await pool.close()
+
+    asyncio.run(run())
+    print("✅ Пул выполняет команды параллельно")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование постоянного процесса PowerShell...")
+    test_host_runs_commands()
+    test_host_restarts_after_crash()
+    test_host_timeout_kills_process()
+    test_pool_runs_in_parallel()
+    print("\n🎉 Тестирование завершено!")
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки процессора печати
+Redis заменяется fakeredis, принтеры - эмуляторами; файлы создаются
+во временной папке
+"""
+
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+
+from PIL import Image
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+import printer.print_processor as print_processor
+from fake_redis import fake_redis_url
+from printer.health import PrinterHealth, STATE_CLOSED, STATE_HALF_OPEN
+from printer.print_processor import PrintProcessor
+from printer.simulated_printer import SimulatedPrinter
+
+
+class RecordingPrinter(SimulatedPrinter):
+    """Эмулятор, запоминающий отправленные файлы"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("pages_per_minute", 600)
+        kwargs.setdefault("warmup_time", 0)
+        kwargs.setdefault("time_scale", 0.1)
+        super().__init__(**kwargs)
+        self.files = []
+
+        # Число заданий в спулере после каждой отправки и наибольшее из них
+        self.queue_lengths = []
+        self.max_queue_length = 0
+
+    async def print_file(self, file_path: str) -> str:
+        self.files.append(file_path)
+        job_id = await super().print_file(file_path)
+        self.queue_lengths.append(self.queue_length)
+        self.max_queue_length = max(self.max_queue_length, self.queue_length)
+        return job_id
+
+
+def make_processor(redis_url, tmp_dir, printers, **kwargs) -> PrintProcessor:
+    """Процессор без подготовки файлов, печатающий только на эмуляторы"""
+    processor = PrintProcessor(redis_url, render=False, **kwargs)
+    processor.queue_manager.excel_manager.filename = os.path.join(tmp_dir, "report.xlsx")
+    for name, printer in printers.items():
+        processor.register_backend(name, printer)
+    return processor
+
+
+def make_label(tmp_dir, name="label.png") -> str:
+    path = os.path.join(tmp_dir, name)
+    Image.new("L", (40, 20), 255).save(path)
+    return path
+
+
+async def wait_for_completed(queue_manager, count: int, timeout: float = 5, key: str = "completed_tasks"):
+    """Ждет, пока в completed_tasks (или другом множестве key) окажется count задач"""
+    deadline = time.monotonic() + timeout
+    while await queue_manager.redis.zcard(key) < count:
+        assert time.monotonic() < deadline, "Задачи не выполнены за отведенное время"
+        await asyncio.sleep(0.02)
+
+
+async def wait_for(condition, timeout: float = 5):
+    """Ждет, пока condition() станет истинным"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Условие не выполнилось за отведенное время"
+        await asyncio.sleep(0.01)
+
+
+async def load_tasks(queue_manager, key: str):
+    return [json.loads(task_json) for task_json in await queue_manager.redis.zrange(key, 0, -1)]
+
+
+@asynccontextmanager
+async def running(processor: PrintProcessor, idle_timeout: float = 0.2):
+    """Процессор работает внутри блока; если тест упал, он останавливается без ожидания заданий"""
+    run = asyncio.create_task(processor.start_processing(check_interval=0.05, idle_timeout=idle_timeout))
+    try:
+        yield run
+    finally:
+        await processor.drain(0)
+        await run
+
+
+@contextmanager
+def stub_run_command(stdout: str, returncode: int = 0, stderr: str = ""):
+    """Подменяет внешние команды (lp, lpstat) готовым выводом на Linux; возвращает список вызовов"""
+    calls = []
+
+    async def fake_run_command(cmd, timeout=30, input=None):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+
+    run_command, system = print_processor.run_command, platform.system
+    print_processor.run_command = fake_run_command
+    platform.system = lambda: "Linux"
+    try:
+        yield calls
+    finally:
+        print_processor.run_command, platform.system = run_command, system
+
+
+# Вывод lpstat -o: незавершенные задания принтера
+LPSTAT_JOBS = (
+    "Office_Printer-12       user          1024   Mon 19 Oct 2026 10:00:00 AM MSK\n"
+    "Office_Printer-123      user          2048   Mon 19 Oct 2026 10:00:05 AM MSK\n"
+)
+
+
+def run_test(test):
+    """Запускает тест с отдельным fakeredis и временной папкой"""
+    with tempfile.TemporaryDirectory() as tmp_dir, fake_redis_url() as redis_url:
+        asyncio.run(test(redis_url, tmp_dir))
+
+
+def test_backends_get_original_file():
+    """Подготовленный для спулера файл не отправляется принтерам со своим способом печати"""
+    async def test(redis_url, tmp_dir):
+        printer = RecordingPrinter(name="zpl")
+        processor = make_processor(redis_url, tmp_dir, {"zpl": printer})
+        queue_manager = processor.queue_manager
+
+        label = make_label(tmp_dir)
+        rendered = os.path.join(tmp_dir, "label.pdf")
+        with open(rendered, "wb") as f:
+            f.write(b"%PDF-1.4")
+        await queue_manager.add_to_queue(label, {"id": "1", "article": "a1"})
+        task_json = (await queue_manager.redis.zrange(queue_manager.queue_name, 0, 0))[0]
+        assert await queue_manager.update_task_fields(task_json, {"rendered_path": rendered})
+
+        async with running(processor):
+            await wait_for_completed(queue_manager, 1)
+        assert printer.files == [label]
+
+    run_test(test)
+    print("✅ Принтеры с собственной печатью получают исходный файл")
+
+
+def test_jobs_per_printer_limit():
+    """В спулере принтера не больше max_jobs_per_printer заданий; все слоты освобождаются"""
+    async def test(redis_url, tmp_dir):
+        # 50 мс на задание - за это время процессор успевает отправить следующее
+        printer = RecordingPrinter(name="p1", pages_per_minute=1200, time_scale=1)
+        processor = make_processor(redis_url, tmp_dir, {"p1": printer}, max_jobs_per_printer=2)
+        queue_manager = processor.queue_manager
+        label = make_label(tmp_dir)
+        for order_id in range(10):
+            await queue_manager.add_to_queue(label, {"id": order_id, "article": "a1"})
+
+        async with running(processor):
+            await wait_for_completed(queue_manager, 10)
+            assert printer.max_queue_length == 2
+            # Слоты освобождаются после записи о завершении
+            await wait_for(lambda: processor.in_flight == 0 and not processor._claimed)
+        report = processor.last_drain
+        assert report["requeued"] == 0 and report["unconfirmed"] == 0
+        assert await queue_manager.get_queue_length() == 0
+
+    run_test(test)
+    print("✅ Задания отправляются с ограничением на принтер")
+
+
+def test_missing_file_releases_claim():
+    """Задача без файла уходит в dead_letter и не возвращается в очередь при остановке"""
+    async def test(redis_url, tmp_dir):
+        processor = make_processor(redis_url, tmp_dir, {"p1": RecordingPrinter(name="p1")})
+        queue_manager = processor.queue_manager
+        await queue_manager.add_to_queue(os.path.join(tmp_dir, "missing.png"), {"id": "1", "article": "a1"})
+
+        async with running(processor):
+            await wait_for_completed(queue_manager, 1, key=queue_manager.dead_letter_name)
+            await wait_for(lambda: not processor._claimed)
+        assert processor.last_drain["requeued"] == 0
+        assert await queue_manager.get_queue_length() == 0
+
+    run_test(test)
+    print("✅ Задача без файла не остается среди полученных")
+
+
+def test_completion_error_does_not_leave_printing():
+    """Ошибка при завершении задачи не оставляет ее в статусе printing"""
+    async def test(redis_url, tmp_dir):
+        processor = make_processor(redis_url, tmp_dir, {"p1": RecordingPrinter(name="p1")})
+        queue_manager = processor.queue_manager
+        await queue_manager.add_to_queue(make_label(tmp_dir), {"id": "1", "article": "a1"})
+
+        # Первая запись о завершении теряется (например, обрыв связи с Redis)
+        mark_task_completed = queue_manager.mark_task_completed
+        calls = []
+
+        async def flaky_mark_task_completed(*args, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                raise ConnectionError("нет связи с Redis")
+            await mark_task_completed(*args, **kwargs)
+
+        queue_manager.mark_task_completed = flaky_mark_task_completed
+
+        async with running(processor):
+            await wait_for_completed(queue_manager, 1)
+        assert await queue_manager.get_queue_length() == 0
+        assert not (await load_tasks(queue_manager, "completed_tasks"))[0].get("unconfirmed")
+
+    run_test(test)
+    print("✅ Задача завершается, даже если первая запись не удалась")
+
+
+def test_half_open_printer_gets_single_probe():
+    """После паузы принтер получает одну пробную задачу, остальные - после ее успеха"""
+    async def test(redis_url, tmp_dir):
+        # Задание печатается 0.3 с
+        printer = RecordingPrinter(name="p1", pages_per_minute=200, time_scale=1)
+        processor = make_processor(redis_url, tmp_dir, {"p1": printer}, max_jobs_per_printer=3)
+        queue_manager = processor.queue_manager
+        processor.health = PrinterHealth(queue_manager, failure_threshold=1, base_cooldown=0.05)
+        await processor.health.record_failure("p1", "замятие")
+        await asyncio.sleep(0.1)
+        assert processor.health.state("p1") == STATE_HALF_OPEN
+
+        label = make_label(tmp_dir)
+        for order_id in range(4):
+            await queue_manager.add_to_queue(label, {"id": order_id, "article": "a1"})
+
+        async with running(processor):
+            await wait_for_completed(queue_manager, 4)
+        # Пока пробное задание печаталось, второе не отправлялось
+        assert printer.queue_lengths[:2] == [1, 1]
+        assert printer.max_queue_length == 3
+        assert processor.health.state("p1") == STATE_CLOSED
+        assert not processor.health.is_probing("p1")
+
+    run_test(test)
+    print("✅ Принтер после паузы получает одну пробную задачу")
+
+
+def test_drain_without_waiting():
+    """drain(0): отправленные задания помечаются выполненными без подтверждения, неотправленные возвращаются"""
+    async def test(redis_url, tmp_dir):
+        # Задание печатается 10 с; в спулере помещается одно ожидающее задание,
+        # поэтому третье зависает в print_file
+        printer = RecordingPrinter(name="p1", pages_per_minute=6, time_scale=1, queue_depth=1)
+        processor = make_processor(redis_url, tmp_dir, {"p1": printer}, max_jobs_per_printer=3)
+        queue_manager = processor.queue_manager
+        label = make_label(tmp_dir)
+        for order_id in range(5):
+            await queue_manager.add_to_queue(label, {"id": order_id, "article": "a1"})
+
+        async with running(processor):
+            await wait_for(lambda: len(printer.files) == 3)
+            report = await processor.drain(0)
+
+        assert report["duration_s"] < 1
+        assert report["completed"] == 0 and report["interrupted_workers"] == 1
+        assert report["unconfirmed"] == 2 and report["requeued"] == 1
+
+        completed = await load_tasks(queue_manager, "completed_tasks")
+        assert len(completed) == 2 and all(task["unconfirmed"] for task in completed)
+        queued = await load_tasks(queue_manager, queue_manager.queue_name)
+        assert len(queued) == 3 and all(task["status"] == "pending" for task in queued)
+        assert not {task["order_id"] for task in completed} & {task["order_id"] for task in queued}
+
+    run_test(test)
+    print("✅ Остановка без ожидания не теряет и не дублирует задачи")
+
+
+def test_drain_waits_for_jobs():
+    """drain(timeout) дожидается отправленных заданий и не берет новые задачи"""
+    async def test(redis_url, tmp_dir):
+        # Задание печатается 0.5 с
+        printer = RecordingPrinter(name="p1", pages_per_minute=120, time_scale=1)
+        processor = make_processor(redis_url, tmp_dir, {"p1": printer}, max_jobs_per_printer=2)
+        queue_manager = processor.queue_manager
+        label = make_label(tmp_dir)
+        for order_id in range(5):
+            await queue_manager.add_to_queue(label, {"id": order_id, "article": "a1"})
+
+        async with running(processor):
+            await wait_for(lambda: len(printer.files) == 2)
+            report = await processor.drain(5)
+
+        assert report["completed"] == 2
+        assert report["interrupted_workers"] == 0
+        assert report["requeued"] == 0 and report["unconfirmed"] == 0
+        assert processor.last_drain == report
+
+        completed = await load_tasks(queue_manager, "completed_tasks")
+        assert len(completed) == 2 and not any(task.get("unconfirmed") for task in completed)
+        assert await queue_manager.get_queue_length() == 3
+
+    run_test(test)
+    print("✅ Остановка дожидается отправленных заданий")
+
+
+def test_stale_notifications_are_discarded():
+    """После всплеска задач, забранных без ожидания, обработчик не просыпается на каждый сигнал"""
+    async def test(redis_url, tmp_dir):
+        processor = make_processor(redis_url, tmp_dir, {"p1": RecordingPrinter(name="p1")})
+        queue_manager = processor.queue_manager
+        label = make_label(tmp_dir)
+
+        # Задачи забраны другим процессором, сигналы остались в списке
+        for order_id in range(50):
+            await queue_manager.add_to_queue(label, {"id": order_id, "article": "a1"})
+        for _ in range(48):
+            await queue_manager.get_next_task("other")
+        assert await queue_manager.redis.llen(queue_manager.notify_key) == 50
+
+        # Сигналов остается столько, сколько задач ждут печати
+        assert await queue_manager.sync_notifications() == 2
+        assert await queue_manager.redis.llen(queue_manager.notify_key) == 2
+        for _ in range(2):
+            await queue_manager.get_next_task("other")
+        for order_id in range(50):
+            await queue_manager.add_to_queue(label, {"id": order_id, "article": "a1"})
+        for _ in range(50):
+            await queue_manager.get_next_task("other")
+
+        wait_for_task = queue_manager.wait_for_task
+        wakeups = []
+
+        async def counting_wait_for_task(timeout):
+            woken = await wait_for_task(timeout)
+            wakeups.append(woken)
+            return woken
+
+        queue_manager.wait_for_task = counting_wait_for_task
+        async with running(processor, idle_timeout=10):
+            await asyncio.sleep(0.5)
+        # Первый сигнал будит обработчик, остальные удаляются
+        assert wakeups == [True]
+        assert await queue_manager.redis.llen(queue_manager.notify_key) == 0
+
+    run_test(test)
+    print("✅ Устаревшие сигналы о задачах удаляются")
+
+
+def test_lp_job_id():
+    """ID задания берется из вывода lp"""
+    async def test():
+        processor = PrintProcessor(render=False)
+        with stub_run_command("request id is Office_Printer-42 (1 file(s))\n") as calls:
+            assert await processor._print_file("label.pdf", "Office_Printer") == (True, "Office_Printer-42")
+        assert calls == [["lp", "-d", "Office_Printer", "label.pdf"]]
+
+        # Без строки request id печать успешна, но ID неизвестен
+        with stub_run_command(""):
+            assert await processor._print_file("label.pdf", "Office_Printer") == (True, None)
+        with stub_run_command("", returncode=1, stderr="lp: The printer or class does not exist."):
+            assert await processor._print_file("label.pdf", "Office_Printer") == (False, None)
+
+    asyncio.run(test())
+    print("✅ ID задания из вывода lp")
+
+
+def test_is_job_active():
+    """Задание активно, пока оно есть в выводе lpstat -o"""
+    async def test():
+        processor = PrintProcessor(render=False)
+        with stub_run_command(LPSTAT_JOBS) as calls:
+            assert await processor._is_job_active("Office_Printer", "Office_Printer-12") is True
+            # Office_Printer-1 - префикс активных заданий, но само оно завершено
+            assert await processor._is_job_active("Office_Printer", "Office_Printer-1") is False
+        assert calls[0] == ["lpstat", "-o", "Office_Printer"]
+        with stub_run_command(""):
+            assert await processor._is_job_active("Office_Printer", "Office_Printer-12") is False
+        with stub_run_command("", returncode=1, stderr="lpstat: Invalid destination name"):
+            assert await processor._is_job_active("Office_Printer", "Office_Printer-12") is None
+
+    asyncio.run(test())
+    print("✅ Состояние задания по выводу lpstat -o")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование процессора печати...")
+    test_backends_get_original_file()
+    test_jobs_per_printer_limit()
+    test_missing_file_releases_claim()
+    test_completion_error_does_not_leave_printing()
+    test_half_open_printer_gets_single_probe()
+    test_drain_without_waiting()
+    test_drain_waits_for_jobs()
+    test_stale_notifications_are_discarded()
+    test_lp_job_id()
+    test_is_job_active()
+    print("\n🎉 Тестирование завершено!")
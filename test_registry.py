@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки реестра процессоров печати
+Redis заменяется fakeredis (Lua-скрипты выполняются через lupa)
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+from fake_redis import run_with_redis
+from printer.registry import ProcessorRegistry
+
+
+KEY_PREFIX = "test_processor:"
+INDEX_KEY = "test_processors"
+
+
+def make_registry(queue_manager, processor_id=None, ttl=15.0) -> ProcessorRegistry:
+    return ProcessorRegistry(queue_manager, processor_id, ttl=ttl, key_prefix=KEY_PREFIX, index_key=INDEX_KEY)
+
+
+def test_heartbeat_and_summary():
+    """Процессоры видны в реестре, сводка суммирует их показатели"""
+    async def test(queue_manager):
+        first = make_registry(queue_manager, "host-a")
+        second = make_registry(queue_manager, "host-b")
+        await first.heartbeat({"printers": ["p1", "p2"], "in_flight": 3, "tasks_per_min": 40})
+        await second.heartbeat({"printers": ["p3"], "in_flight": 1, "tasks_per_min": 12})
+
+        processors = await make_registry(queue_manager).get_processors()
+        assert [processor["id"] for processor in processors] == ["host-a", "host-b"]
+        assert ProcessorRegistry.summarize(processors) == {
+            "processors": 2, "printers": 3, "in_flight": 4, "tasks_per_min": 52
+        }
+
+        await first.unregister()
+        processors = await make_registry(queue_manager).get_processors()
+        assert [processor["id"] for processor in processors] == ["host-b"]
+
+    run_with_redis(test)
+    print("✅ Реестр показывает все процессоры")
+
+
+def test_stale_entries_expire():
+    """Процессор без heartbeat пропадает из реестра после ttl"""
+    async def test(queue_manager):
+        registry = make_registry(queue_manager, "host-a", ttl=0.2)
+        await registry.heartbeat({"printers": ["p1"]})
+        assert len(await registry.get_processors()) == 1
+
+        await asyncio.sleep(0.3)
+        assert await registry.get_processors() == []
+        assert not await queue_manager.redis.smembers(INDEX_KEY)
+
+    run_with_redis(test)
+    print("✅ Устаревшие записи удаляются")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование реестра процессоров...")
+    test_heartbeat_and_summary()
+    test_stale_entries_expire()
+    print("\n🎉 Тестирование завершено!")
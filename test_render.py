@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки предварительной подготовки файлов печати
+Redis заменяется fakeredis, файлы создаются во временной папке
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+from fake_redis import fake_redis_url
+from printer.add_to_print import PrintQueueManager
+from printer.print_processor import PrintProcessor
+from printer.render import RenderStage, render_file
+from printer.simulated_printer import SimulatedPrinter
+
+
+def make_image(path, size=(400, 200)):
+    Image.new("RGB", size, (255, 255, 255)).save(path)
+    return path
+
+
+def test_artifact_key():
+    """Результат переиспользуется, пока не изменились файл и параметры подготовки"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = make_image(os.path.join(tmp_dir, "label.png"))
+        output_dir = os.path.join(tmp_dir, "rendered")
+
+        path = render_file(source, output_dir, "bmp", (100, 100), 203)
+        assert render_file(source, output_dir, "bmp", (100, 100), 203) == path
+        assert render_file(source, output_dir, "pdf") != path
+        assert render_file(source, output_dir, "bmp", (200, 200), 203) != path
+        assert render_file(source, output_dir, "bmp", (100, 100), 300) != path
+
+        # Изменилось время изменения исходного файла
+        stat = os.stat(source)
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        touched = render_file(source, output_dir, "bmp", (100, 100), 203)
+        assert touched != path
+
+        # Изменился размер исходного файла при том же времени изменения
+        with open(source, "ab") as f:
+            f.write(b"\0")
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert render_file(source, output_dir, "bmp", (100, 100), 203) not in (path, touched)
+    print("✅ Ключ подготовленного файла учитывает файл и параметры")
+
+
+def test_thumbnail_bounds():
+    """Изображение уменьшается в область печати с сохранением пропорций и не увеличивается"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_dir = os.path.join(tmp_dir, "rendered")
+        source = make_image(os.path.join(tmp_dir, "big.png"), (400, 200))
+        with Image.open(render_file(source, output_dir, "bmp", (100, 100), 203)) as img:
+            assert img.size == (100, 50)
+            assert img.mode == "RGB"
+            assert round(img.info["dpi"][0]) == 203
+
+        small = make_image(os.path.join(tmp_dir, "small.png"), (40, 20))
+        with Image.open(render_file(small, output_dir, "bmp", (100, 100))) as img:
+            assert img.size == (40, 20)
+    print("✅ Подготовленный bitmap помещается в область печати")
+
+
+def run_with_stage(test, **kwargs):
+    """Запускает тест с отдельным fakeredis и подготовкой в пуле потоков"""
+    async def run(redis_url, tmp_dir):
+        queue_manager = PrintQueueManager(redis_url, os.path.join(tmp_dir, "report.xlsx"))
+        await queue_manager.connect()
+        executor = ThreadPoolExecutor(max_workers=2)
+        stage = RenderStage(queue_manager, output_dir=os.path.join(tmp_dir, "rendered"),
+                            executor=executor, **kwargs)
+        try:
+            await test(queue_manager, stage, tmp_dir)
+        finally:
+            executor.shutdown()
+            await queue_manager.excel_manager.close()
+            await queue_manager.redis.aclose()
+
+    with tempfile.TemporaryDirectory() as tmp_dir, fake_redis_url() as redis_url:
+        asyncio.run(run(redis_url, tmp_dir))
+
+
+async def load_tasks(queue_manager):
+    return {
+        task["order_id"]: task
+        for task in map(json.loads, await queue_manager.redis.zrange(queue_manager.queue_name, 0, -1))
+    }
+
+
+def test_render_pending_sets_rendered_path():
+    """Ожидающие задачи получают rendered_path и параметры принтера"""
+    async def test(queue_manager, stage, tmp_dir):
+        label = make_image(os.path.join(tmp_dir, "label.png"))
+        for order_id in ("1", "2"):
+            await queue_manager.add_to_queue(label, {"id": order_id, "article": "a1"})
+
+        assert await stage.render_pending() == 2
+        tasks = await load_tasks(queue_manager)
+        assert tasks["1"]["rendered_path"] == tasks["2"]["rendered_path"]
+        assert tasks["1"]["render_target"] == [100, 100, 203]
+        with Image.open(tasks["1"]["rendered_path"]) as img:
+            assert img.size == (100, 50)
+
+        # Подготовленные задачи повторно не берутся
+        assert await stage.render_pending() == 0
+
+    run_with_stage(test, fmt="bmp", target_size=(100, 100), dpi=203)
+    print("✅ Подготовленный файл записывается в задачу")
+
+
+def test_render_pending_missing_source():
+    """Задача без исходного файла не подготавливается и не ломает проход"""
+    async def test(queue_manager, stage, tmp_dir):
+        await queue_manager.add_to_queue(os.path.join(tmp_dir, "missing.png"), {"id": "1", "article": "a1"})
+        label = make_image(os.path.join(tmp_dir, "label.png"))
+        removed = make_image(os.path.join(tmp_dir, "removed.png"))
+        await queue_manager.add_to_queue(label, {"id": "2", "article": "a1"})
+        await queue_manager.add_to_queue(removed, {"id": "3", "article": "a1"})
+
+        # Файл удален после того, как задача попала в порцию
+        collect_batch = stage._collect_batch
+
+        async def collect_and_remove():
+            batch = await collect_batch()
+            os.remove(removed)
+            return batch
+
+        stage._collect_batch = collect_and_remove
+        assert await stage.render_pending() == 1
+        stage._collect_batch = collect_batch
+
+        tasks = await load_tasks(queue_manager)
+        assert "rendered_path" not in tasks["1"] and "rendered_path" not in tasks["3"]
+        assert tasks["2"]["rendered_path"].endswith(".pdf")
+        assert await stage.render_pending() == 0
+
+    run_with_stage(test, fmt="pdf")
+    print("✅ Задачи без исходного файла пропускаются")
+
+
+def test_stage_only_for_spooler_printers():
+    """Подготовка выключена, если все принтеры печатают своим способом; bitmap - только с областью печати"""
+    async def run():
+        processor = PrintProcessor(render=False)
+        processor.register_backend("zpl", SimulatedPrinter(name="zpl"))
+        processor.render_stage = RenderStage(processor.queue_manager, fmt="pdf")
+
+        await processor._update_render_stage(["zpl"])
+        assert not processor.render_stage.active
+        await processor._update_render_stage(["zpl", "lp1"])
+        assert processor.render_stage.active
+
+        stage = RenderStage(processor.queue_manager, fmt="bmp")
+        assert not stage.active
+        stage.set_target((100, 100), 203)
+        assert stage.active
+
+    asyncio.run(run())
+    print("✅ Подготовка файлов работает только для принтеров спулера")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование подготовки файлов печати...")
+    test_artifact_key()
+    test_thumbnail_bounds()
+    test_render_pending_sets_rendered_path()
+    test_render_pending_missing_source()
+    test_stage_only_for_spooler_printers()
+    print("\n🎉 Тестирование завершено!")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки кэша Excel отчета веб-интерфейса
+Redis заменяется fakeredis, файлы создаются во временной папке
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+from openpyxl import load_workbook
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+from fake_redis import fake_redis_url
+from web_interface import WebInterface
+
+
+def read_report(filename):
+    """Строки отчета без заголовка"""
+    sheet = load_workbook(filename).active
+    return [row for row in sheet.iter_rows(min_row=2, values_only=True)]
+
+
+def test_status_update_between_reports():
+    """Запись статусов очередью не портит кэшированный отчет"""
+    async def run(redis_url):
+        web = WebInterface(redis_url)
+        queue_manager = web.queue_manager
+        queue_manager.excel_manager.flush_interval = 0.05
+        transport = httpx.ASGITransport(app=web.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await queue_manager.add_to_queue("label.png", {"id": "1", "article": "a1"})
+
+            first = (await client.get("/api/excel/generate")).json()
+            assert not first["cached"]
+            assert [row[2] for row in read_report(first["filename"])] == ["В очереди"]
+
+            # Обработчик забирает задачу: очередь записывает статус в свой файл
+            await queue_manager.get_next_task("p1")
+            await asyncio.sleep(0.2)
+            await queue_manager.excel_manager.close()
+
+            second = (await client.get("/api/excel/generate")).json()
+            assert not second["cached"]
+            assert second["version"] > first["version"]
+            assert [row[2] for row in read_report(second["filename"])] == ["Печатается"]
+
+            third = (await client.get("/api/excel/generate")).json()
+            assert third["cached"]
+            assert [row[2] for row in read_report(third["filename"])] == ["Печатается"]
+            assert os.path.abspath(third["filename"]) != os.path.abspath(queue_manager.excel_manager.filename)
+
+        await queue_manager.redis.aclose()
+        await web.report_cache.redis.aclose()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir, fake_redis_url() as redis_url:
+        # Файлы по умолчанию (отчет очереди и кэш) создаются во временной папке
+        os.chdir(tmp_dir)
+        try:
+            asyncio.run(run(redis_url))
+        finally:
+            os.chdir(cwd)
+    print("✅ Кэшированный отчет не перезаписывается очередью")
+
+
+def test_streaming_report_cached_separately():
+    """Обычный и потоковый отчеты одной версии кэшируются в разных файлах"""
+    async def run(redis_url):
+        web = WebInterface(redis_url)
+        queue_manager = web.queue_manager
+        transport = httpx.ASGITransport(app=web.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await queue_manager.add_to_queue("label.png", {"id": "1", "article": "a1"})
+
+            regular = (await client.get("/api/excel/generate")).json()
+            streaming = (await client.get("/api/excel/generate", params={"streaming": "true"})).json()
+            assert not streaming["cached"]
+            assert streaming["version"] == regular["version"]
+            assert streaming["filename"] != regular["filename"]
+
+            assert (await client.get("/api/excel/generate", params={"streaming": "true"})).json()["cached"]
+            assert (await client.get("/api/excel/generate")).json()["cached"]
+            for report in (regular, streaming):
+                assert [row[2] for row in read_report(report["filename"])] == ["В очереди"]
+
+        await queue_manager.excel_manager.close()
+        await queue_manager.redis.aclose()
+        await web.report_cache.redis.aclose()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir, fake_redis_url() as redis_url:
+        os.chdir(tmp_dir)
+        try:
+            asyncio.run(run(redis_url))
+        finally:
+            os.chdir(cwd)
+    print("✅ Потоковый отчет кэшируется отдельно")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование кэша Excel отчета...")
+    test_status_update_between_reports()
+    test_streaming_report_cached_separately()
+    print("\n🎉 Тестирование завершено!")
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки повторов печати и dead_letter
+Redis заменяется fakeredis
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+from fake_redis import fake_redis_url
+from printer.add_to_print import PrintQueueManager
+from web_interface import WebInterface
+
+
+async def load_tasks(queue_manager, key: str):
+    return [json.loads(task_json) for task_json in await queue_manager.redis.zrange(key, 0, -1)]
+
+
+async def make_due(queue_manager):
+    """Срок всех отложенных повторов наступил"""
+    for task_json in await queue_manager.redis.zrange(queue_manager.delayed_queue_name, 0, -1):
+        await queue_manager.redis.zadd(queue_manager.delayed_queue_name, {task_json: 0})
+
+
+def run_test(test):
+    """Запускает тест с отдельным fakeredis и временной папкой для отчета"""
+    async def run(redis_url, tmp_dir):
+        queue_manager = PrintQueueManager(redis_url, os.path.join(tmp_dir, "report.xlsx"),
+                                          max_attempts=4, retry_base_delay=5, retry_max_delay=12)
+        await queue_manager.connect()
+        try:
+            await test(queue_manager)
+        finally:
+            await queue_manager.excel_manager.close()
+            await queue_manager.redis.aclose()
+
+    with tempfile.TemporaryDirectory() as tmp_dir, fake_redis_url() as redis_url:
+        asyncio.run(run(redis_url, tmp_dir))
+
+
+def test_backoff_schedule():
+    """Задержка повтора удваивается и ограничена retry_max_delay"""
+    async def test(queue_manager):
+        await queue_manager.add_to_queue("label.png", {"id": "1", "article": "a1"})
+
+        delays = []
+        for _ in range(3):
+            task = await queue_manager.get_next_task("p1")
+            assert task is not None
+            before = datetime.now().timestamp()
+            assert await queue_manager.retry_task(task, "нет бумаги") == "retry"
+            assert await queue_manager.get_queue_length() == 0
+
+            [(task_json, retry_at)] = await queue_manager.redis.zrange(
+                queue_manager.delayed_queue_name, 0, -1, withscores=True
+            )
+            delays.append(round(retry_at - before))
+            assert json.loads(task_json)["status"] == "pending"
+            await make_due(queue_manager)
+
+        assert delays == [5, 10, 12]
+
+    run_test(test)
+    print("✅ Задержка повтора растет экспоненциально")
+
+
+def test_max_attempts_moves_to_dead_letter():
+    """После max_attempts неудач задача переносится в dead_letter"""
+    async def test(queue_manager):
+        await queue_manager.add_to_queue("label.png", {"id": "1", "article": "a1"})
+
+        results = []
+        for _ in range(4):
+            await make_due(queue_manager)
+            task = await queue_manager.get_next_task("p1")
+            results.append(await queue_manager.retry_task(task, "замятие"))
+
+        assert results == ["retry", "retry", "retry", "dead"]
+        [dead] = await load_tasks(queue_manager, queue_manager.dead_letter_name)
+        assert dead["status"] == "dead" and dead["attempts"] == 4 and dead["last_error"] == "замятие"
+        assert await queue_manager.get_queue_length() == 0
+        assert not await queue_manager.redis.zcard(queue_manager.delayed_queue_name)
+
+        # Неустранимая ошибка - сразу в dead_letter
+        await queue_manager.add_to_queue("missing.png", {"id": "2", "article": "a2"})
+        task = await queue_manager.get_next_task("p1")
+        assert await queue_manager.retry_task(task, "Файл не найден", permanent=True) == "dead"
+        assert await queue_manager.redis.zcard(queue_manager.dead_letter_name) == 2
+
+    run_test(test)
+    print("✅ Задача попадает в dead_letter после max_attempts")
+
+
+def test_stale_task_is_not_retried():
+    """Если задачу перезапустили во время печати, повтор не создает вторую копию"""
+    async def test(queue_manager):
+        await queue_manager.add_to_queue("label.png", {"id": "1", "article": "a1"})
+        task = await queue_manager.get_next_task("p1")
+        assert await queue_manager.restart_task(task["id"])
+
+        assert await queue_manager.retry_task(task, "ошибка") == "stale"
+        [queued] = await load_tasks(queue_manager, queue_manager.queue_name)
+        assert queued["status"] == "pending" and queued["id"] != task["id"]
+        assert not await queue_manager.redis.zcard(queue_manager.delayed_queue_name)
+
+    run_test(test)
+    print("✅ Устаревшая задача не повторяется")
+
+
+def test_restart_delayed_task():
+    """Задачу, ожидающую повтора, можно перезапустить сразу"""
+    async def test(queue_manager):
+        await queue_manager.add_to_queue("label.png", {"id": "1", "article": "a1"}, priority=2)
+        task = await queue_manager.get_next_task("p1")
+        await queue_manager.retry_task(task, "ошибка")
+        [delayed] = await load_tasks(queue_manager, queue_manager.delayed_queue_name)
+
+        assert await queue_manager.restart_task(delayed["id"])
+        assert not await queue_manager.redis.zcard(queue_manager.delayed_queue_name)
+        [(task_json, score)] = await queue_manager.redis.zrange(queue_manager.queue_name, 0, -1, withscores=True)
+        restarted = json.loads(task_json)
+        assert score == 2
+        assert restarted["status"] == "pending" and "retry_at" not in restarted
+        assert (await queue_manager.get_next_task("p2"))["id"] == restarted["id"]
+
+    run_test(test)
+    print("✅ Отложенная задача перезапускается")
+
+
+def test_promote_delayed_once():
+    """Задача со сроком повтора переносится в очередь один раз, даже при одновременных обработчиках"""
+    async def test(queue_manager):
+        await queue_manager.add_to_queue("label.png", {"id": "1", "article": "a1"}, priority=3)
+        task = await queue_manager.get_next_task("p1")
+        await queue_manager.retry_task(task, "ошибка")
+        await make_due(queue_manager)
+
+        results = await asyncio.gather(*(queue_manager._promote_delayed_tasks() for _ in range(5)))
+        assert sum(results) == 1
+        [(task_json, score)] = await queue_manager.redis.zrange(queue_manager.queue_name, 0, -1, withscores=True)
+        assert score == 3 and json.loads(task_json)["attempts"] == 1
+        assert not await queue_manager.redis.zcard(queue_manager.delayed_queue_name)
+
+    run_test(test)
+    print("✅ Отложенная задача переносится в очередь один раз")
+
+
+def test_requeue_dead_letter_api():
+    """POST /api/dead-letter/requeue возвращает выбранные задачи со сброшенными попытками"""
+    async def test(queue_manager):
+        for order_id in ("1", "2"):
+            await queue_manager.add_to_queue("label.png", {"id": order_id, "article": "a1"})
+            task = await queue_manager.get_next_task("p1")
+            await queue_manager.retry_task(task, "ошибка", permanent=True)
+        dead = await load_tasks(queue_manager, queue_manager.dead_letter_name)
+
+        web = WebInterface(queue_manager.redis_url)
+        web.queue_manager = queue_manager
+        transport = httpx.ASGITransport(app=web.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/api/dead-letter/requeue", json={"task_ids": [dead[0]["id"]]})
+            assert response.status_code == 200
+            assert response.json()["requeued"] == 1
+
+            [queued] = await load_tasks(queue_manager, queue_manager.queue_name)
+            assert queued["id"] == dead[0]["id"]
+            assert queued["status"] == "pending" and queued["attempts"] == 0 and "failed_at" not in queued
+
+            # Без task_ids возвращаются все оставшиеся
+            response = await client.post("/api/dead-letter/requeue", json={})
+            assert response.json()["requeued"] == 1
+            assert (await client.get("/api/dead-letter")).json()["tasks"] == []
+
+    run_test(test)
+    print("✅ API возвращает задачи из dead_letter")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование повторов печати...")
+    test_backoff_schedule()
+    test_max_attempts_moves_to_dead_letter()
+    test_stale_task_is_not_retried()
+    test_restart_delayed_task()
+    test_promote_delayed_once()
+    test_requeue_dead_letter_api()
+    print("\n🎉 Тестирование завершено!")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки распределения задач по скорости принтеров
+Время подменяется ручными часами, поэтому результаты не зависят от машины
+"""
+
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+import printer.scheduler as scheduler_module
+from printer.scheduler import LoadAwareScheduler, MIN_SERVICE_TIME
+
+
+class ManualClock:
+    """Часы, которые идут только по команде"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@contextmanager
+def manual_scheduler(**kwargs):
+    """Планировщик на ручных часах (модуль time восстанавливается после теста)"""
+    clock = ManualClock()
+    scheduler_module.time = SimpleNamespace(monotonic=clock)
+    try:
+        yield LoadAwareScheduler(**kwargs), clock
+    finally:
+        scheduler_module.time = time
+
+
+def print_task(scheduler, clock, printer_id, task_id, seconds, article="A"):
+    """Одна задача от отправки до завершения"""
+    task = {"id": task_id, "article": article}
+    scheduler.on_submit(printer_id, task)
+    clock.now += seconds
+    scheduler.on_complete(printer_id, task)
+
+
+def test_ewma_and_fallbacks():
+    """EWMA по принтеру и артикулу, новый принтер считается средним"""
+    with manual_scheduler(alpha=0.5, default_service_time=5) as (scheduler, clock):
+        assert scheduler.service_time("fast") == 5
+
+        print_task(scheduler, clock, "fast", "1", 2.0, article="A")
+        print_task(scheduler, clock, "fast", "2", 4.0, article="B")
+        print_task(scheduler, clock, "slow", "3", 9.0, article="A")
+
+        assert scheduler.service_time("fast") == 3.0
+        assert scheduler.service_time("fast", "A") == 2.0
+        assert scheduler.service_time("fast", "C") == 3.0
+        # Принтер без измерений - среднее по остальным
+        assert scheduler.service_time("new") == 6.0
+    print("✅ Время обслуживания усредняется по принтеру и артикулу")
+
+
+def test_failed_job_not_recorded():
+    """Ненапечатанное задание не влияет на оценку скорости"""
+    with manual_scheduler() as (scheduler, clock):
+        print_task(scheduler, clock, "p1", "1", 1.0)
+        task = {"id": "2", "article": "A"}
+        scheduler.on_submit("p1", task)
+        clock.now += 30
+        scheduler.on_complete("p1", task, success=False)
+        assert scheduler.service_time("p1") == 1.0
+        assert scheduler.in_flight_count() == 0
+    print("✅ Сбои не портят оценку скорости")
+
+
+def test_pipelined_jobs_measure_service_time():
+    """При нескольких заданиях в спулере учитывается время печати, а не ожидания"""
+    with manual_scheduler() as (scheduler, clock):
+        tasks = [{"id": str(i), "article": "A"} for i in range(3)]
+        for task in tasks:
+            scheduler.on_submit("p1", task)
+        for task in tasks:
+            clock.now += 2.0
+            scheduler.on_complete("p1", task)
+        assert abs(scheduler.service_time("p1") - 2.0) < 1e-9
+
+        # Отправленные задания дают очередь, которая уменьшается со временем
+        for task in tasks:
+            scheduler.on_submit("p1", task)
+        assert scheduler.backlog("p1") == 6.0
+        clock.now += 1.5
+        assert scheduler.backlog("p1") == 4.5
+    print("✅ Время обслуживания и очередь принтера считаются верно")
+
+
+def test_earliest_finish_decides():
+    """Быстрый принтер берет задачу сразу, медленный - только при длинной очереди"""
+    with manual_scheduler() as (scheduler, clock):
+        print_task(scheduler, clock, "fast", "1", 1.0)
+        print_task(scheduler, clock, "slow", "2", 5.0)
+        printers = ["fast", "slow"]
+
+        assert scheduler.tasks_ahead("fast", printers) == 0
+        # Пока медленный печатает одну задачу (5 с), быстрый успеет 4 (к 1, 2, 3 и 4 с)
+        assert scheduler.tasks_ahead("slow", printers) == 4
+
+        # Загруженный быстрый принтер пропускает вперед медленный
+        for task_id in range(10):
+            scheduler.on_submit("fast", {"id": f"f{task_id}", "article": "A"})
+        assert scheduler.tasks_ahead("slow", printers) == 0
+        assert scheduler.tasks_ahead("fast", printers) > 0
+    print("✅ Задачу получает принтер, который закончит ее раньше")
+
+
+def test_zero_duration_job():
+    """Задание, завершившееся за 0 с, не приводит к делению на ноль"""
+    with manual_scheduler() as (scheduler, clock):
+        print_task(scheduler, clock, "instant", "1", 0.0)
+        print_task(scheduler, clock, "p1", "2", 2.0)
+        assert scheduler.service_time("instant") == MIN_SERVICE_TIME
+        assert scheduler.tasks_ahead("p1", ["p1", "instant"]) > 0
+        assert scheduler.tasks_ahead("instant", ["p1", "instant"]) == 0
+
+        # Нулевая оценка по умолчанию тоже не ломает выбор
+        zero = LoadAwareScheduler(default_service_time=0.0)
+        assert zero.tasks_ahead("a", ["a", "b"]) == 0
+    print("✅ Нулевое время задания не ломает выбор принтера")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование распределения задач по принтерам...")
+    test_ewma_and_fallbacks()
+    test_failed_job_not_recorded()
+    test_pipelined_jobs_measure_service_time()
+    test_earliest_finish_decides()
+    test_zero_duration_job()
+    print("\n🎉 Тестирование завершено!")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки эмулятора принтера
+Эмуляция ускорена через time_scale, поэтому тесты занимают доли секунды
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+from printer.backend import PrintJobError
+from printer.simulated_printer import SimulatedPrinter, create_simulated_printers
+from printer.status_service import STATUS_READY, STATUS_PAPER_JAM
+
+
+async def print_jobs(printer: SimulatedPrinter, count: int):
+    """Печатает count заданий и возвращает исход каждого"""
+    outcomes = []
+    for _ in range(count):
+        job_id = await printer.print_file("label.png")
+        try:
+            outcomes.append(await printer.wait_for_job(job_id))
+        except PrintJobError:
+            outcomes.append(False)
+    return outcomes
+
+
+def test_same_seed_same_outcomes():
+    """Одинаковый seed дает одинаковую последовательность сбоев"""
+    async def run():
+        kwargs = dict(pages_per_minute=600, warmup_time=0, jam_rate=0.1, failure_rate=0.2,
+                      jam_clear_time=0, time_scale=0.001)
+        first = await print_jobs(SimulatedPrinter(seed=7, **kwargs), 30)
+        second = await print_jobs(SimulatedPrinter(seed=7, **kwargs), 30)
+        other = await print_jobs(SimulatedPrinter(seed=8, **kwargs), 30)
+        assert first == second
+        assert first != other
+        assert 0 < first.count(False) < 30
+
+    asyncio.run(run())
+    print("✅ Прогоны с одинаковым seed воспроизводимы")
+
+
+def test_speed_and_warmup():
+    """Время печати: прогрев + страницы со скоростью pages_per_minute"""
+    async def run():
+        # 60 стр/мин = 1 с на страницу, прогрев 2 с; в 100 раз быстрее
+        printer = SimulatedPrinter(pages_per_minute=60, warmup_time=2, pages_per_job=2, time_scale=0.01)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await printer.wait_for_job(await printer.print_file("label.png"))
+        first = loop.time() - start
+
+        start = loop.time()
+        await printer.wait_for_job(await printer.print_file("label.png"))
+        second = loop.time() - start
+
+        assert 0.035 < first < 0.08, first
+        assert 0.015 < second < 0.04, second
+        assert printer.get_stats()["pages"] == 4
+        await printer.close()
+
+    asyncio.run(run())
+    print("✅ Скорость печати и прогрев эмулируются")
+
+
+def test_queue_depth_backpressure():
+    """При заполненной очереди спулера print_file ждет свободного места"""
+    async def run():
+        printer = SimulatedPrinter(pages_per_minute=60, warmup_time=0, queue_depth=2, time_scale=0.01)
+        await printer.print_file("label.png")
+        await printer.print_file("label.png")
+        # Первое задание уже печатается, второе в очереди, третье помещается
+        await asyncio.sleep(0)
+        await printer.print_file("label.png")
+
+        blocked = asyncio.create_task(printer.print_file("label.png"))
+        await asyncio.sleep(0.005)
+        assert not blocked.done()
+        assert printer.queue_length == 4
+
+        await asyncio.wait_for(blocked, 1)
+        await printer.close()
+
+    asyncio.run(run())
+    print("✅ Глубина очереди спулера ограничена")
+
+
+def test_jam_blocks_printer():
+    """После замятия принтер не готов, пока замятие не устранено"""
+    async def run():
+        printer = SimulatedPrinter(pages_per_minute=600, warmup_time=0, jam_rate=1.0,
+                                   jam_clear_time=5, time_scale=0.01)
+        job_id = await printer.print_file("label.png")
+        try:
+            await printer.wait_for_job(job_id)
+            assert False, "ожидался PrintJobError"
+        except PrintJobError:
+            pass
+
+        assert await printer.get_status() == STATUS_PAPER_JAM
+        await asyncio.sleep(0.06)
+        assert await printer.get_status() == STATUS_READY
+        assert printer.get_stats()["jams"] == 1
+        await printer.close()
+
+    asyncio.run(run())
+    print("✅ Замятие бумаги блокирует принтер")
+
+
+def test_create_simulated_printers():
+    """Набор эмуляторов с разными seed"""
+    printers = create_simulated_printers(3, seed=10, pages_per_minute=120)
+    assert list(printers) == ["sim1", "sim2", "sim3"]
+    assert all(printer.pages_per_minute == 120 for printer in printers.values())
+    print("✅ Набор эмуляторов создается")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование эмулятора принтера...")
+    test_same_seed_same_outcomes()
+    test_speed_and_warmup()
+    test_queue_depth_backpressure()
+    test_jam_blocks_printer()
+    test_create_simulated_printers()
+    print("\n🎉 Тестирование завершено!")
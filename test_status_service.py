@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки сервиса статусов принтеров
+Команда lpstat заменяется заглушкой, считающей вызовы
+"""
+
+import asyncio
+import subprocess
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+import printer.printer_manager as printer_manager
+from printer.printer_manager import PrinterManager
+from printer.status_service import PrinterStatusService, STATUS_READY, STATUS_UNKNOWN
+
+# Вывод lpstat -p -d
+LPSTAT_PRINTERS = (
+    "printer HP_LaserJet is idle.  enabled since Mon 19 Oct 2026 10:00:00 AM MSK\n"
+    "printer Zebra-ZD420 disabled since Mon 19 Oct 2026 10:00:00 AM MSK -\n"
+    "system default destination: HP_LaserJet\n"
+)
+
+
+@contextmanager
+def stub_lpstat(delay: float = 0.1):
+    """Подменяет run_command менеджера принтеров; возвращает список вызовов"""
+    calls = []
+
+    async def fake_run_command(cmd, timeout=30, input=None):
+        calls.append(cmd)
+        await asyncio.sleep(delay)
+        return subprocess.CompletedProcess(cmd, 0, LPSTAT_PRINTERS, "")
+
+    run_command = printer_manager.run_command
+    printer_manager.run_command = fake_run_command
+    try:
+        yield calls
+    finally:
+        printer_manager.run_command = run_command
+
+
+def make_service(ttl: float = 3.0) -> PrinterStatusService:
+    manager = PrinterManager()
+    manager.system = "linux"
+    return PrinterStatusService(ttl=ttl, printer_manager=manager)
+
+
+def test_snapshot_cached_for_ttl():
+    """Повторный запрос в пределах TTL не запускает lpstat"""
+    async def run():
+        service = make_service(ttl=0.5)
+        with stub_lpstat() as calls:
+            first = await service.get_snapshot()
+            second = await service.get_snapshot()
+            assert [printer["name"] for printer in first] == ["HP_LaserJet", "Zebra-ZD420"]
+            assert second is first
+            assert len(calls) == 1
+            assert calls[0] == ["lpstat", "-p", "-d"]
+
+            await service.get_snapshot(force=True)
+            assert len(calls) == 2
+
+            # Снимок устарел - запрашиваем заново
+            await asyncio.sleep(0.6)
+            await service.get_snapshot()
+            assert len(calls) == 3
+
+    asyncio.run(run())
+    print("✅ Снимок статусов кэшируется на время TTL")
+
+
+def test_single_flight_refresh():
+    """Одновременные запросы ожидают одно обновление"""
+    async def run():
+        service = make_service()
+        with stub_lpstat() as calls:
+            snapshots = await asyncio.gather(*(service.get_snapshot() for _ in range(10)))
+            assert len(calls) == 1
+            assert all(snapshot is snapshots[0] for snapshot in snapshots)
+
+            statuses = await asyncio.gather(
+                service.get_status("HP_LaserJet"), service.get_status("Zebra-ZD420"), service.get_status("Missing")
+            )
+            assert statuses == [STATUS_READY, STATUS_UNKNOWN, STATUS_UNKNOWN]
+            assert len(calls) == 1
+
+    asyncio.run(run())
+    print("✅ Одновременные запросы разделяют одно обновление")
+
+
+def test_cancelled_waiter_keeps_refresh():
+    """Отмена одного из ожидающих не прерывает общее обновление"""
+    async def run():
+        service = make_service()
+        with stub_lpstat() as calls:
+            cancelled = asyncio.create_task(service.get_snapshot())
+            waiting = asyncio.create_task(service.get_snapshot())
+            await asyncio.sleep(0.02)
+            cancelled.cancel()
+
+            snapshot = await waiting
+            assert len(snapshot) == 2
+            assert len(calls) == 1
+
+    asyncio.run(run())
+    print("✅ Отмена ожидающего не прерывает обновление")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование сервиса статусов принтеров...")
+    test_snapshot_cached_for_ttl()
+    test_single_flight_refresh()
+    test_cancelled_waiter_keeps_refresh()
+    print("\n🎉 Тестирование завершено!")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки получения принтеров рабочей группы
+Redis заменяется fakeredis, системные принтеры - списком в памяти
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+from fake_redis import fake_redis_url
+from printer.printer_manager import PrinterManager
+from printer.status_service import PrinterStatusService
+
+
+WORKGROUP = "test_wb_print_group"
+PRINTERS = [f"test_printer_{index}" for index in range(20)]
+
+
+def make_manager(redis_url, system_printers):
+    """Менеджер с отдельным сервисом статусов, считающий перечисления системных принтеров"""
+    system = PrinterManager(redis_url)
+    system.enumerations = 0
+
+    async def get_system_printers():
+        system.enumerations += 1
+        return [dict(printer) for printer in system_printers]
+
+    system.get_system_printers = get_system_printers
+    manager = PrinterManager(redis_url, status_service=PrinterStatusService(printer_manager=system))
+    manager.get_system_printers = get_system_printers
+    return manager, system
+
+
+def make_printer(name, status="idle"):
+    return {"name": name, "type": "thermal", "status": status, "is_default": False}
+
+
+def run_with_redis(test):
+    """Запускает тест с отдельным fakeredis"""
+    async def run(redis_url):
+        manager, system = make_manager(redis_url, [make_printer(name) for name in PRINTERS])
+        try:
+            await test(manager, system)
+        finally:
+            await manager.close()
+
+    with fake_redis_url() as redis_url:
+        asyncio.run(run(redis_url))
+
+
+def test_single_enumeration():
+    """Группа из 20 принтеров берется из общего снимка без повторного перечисления"""
+    async def test(manager, system):
+        for name in PRINTERS:
+            assert await manager.add_printer_to_workgroup(name, WORKGROUP)
+
+        # Снимок уже получен (например, для /api/printers)
+        await manager.status_service.get_snapshot()
+        system.enumerations = 0
+
+        printers = await manager.get_workgroup_printers(WORKGROUP)
+        assert [printer["name"] for printer in printers] == sorted(PRINTERS)
+        printers = await manager.get_workgroup_printers(WORKGROUP)
+        assert system.enumerations == 0
+
+        # Изменение результата не портит общий снимок
+        printers[0]["status"] = "changed"
+        assert (await manager.status_service.get_printer(printers[0]["name"]))["status"] == "idle"
+
+    run_with_redis(test)
+    print("✅ Принтеры группы берутся из снимка сервиса статусов")
+
+
+def test_saved_data_for_missing_printers():
+    """Принтер, пропавший из системы, возвращается по данным из Redis"""
+    async def test(manager, system):
+        for name in PRINTERS[:2]:
+            assert await manager.add_printer_to_workgroup(name, WORKGROUP)
+
+        # Первый принтер пропал из системы, у второго изменился статус
+        offline, _ = make_manager(manager.redis_url, [make_printer(PRINTERS[1], status="printing")])
+        try:
+            printers = await offline.get_workgroup_printers(WORKGROUP)
+        finally:
+            await offline.close()
+        assert printers == [make_printer(PRINTERS[0]), make_printer(PRINTERS[1], status="printing")]
+
+        # Новый статус сохранен в Redis
+        assert (await manager.redis.hgetall(f"printer:{PRINTERS[1]}"))["status"] == "printing"
+
+        assert await manager.remove_printer_from_workgroup(PRINTERS[0], WORKGROUP)
+        printers = await manager.get_workgroup_printers(WORKGROUP)
+        assert [printer["name"] for printer in printers] == [PRINTERS[1]]
+
+    run_with_redis(test)
+    print("✅ Данные отсутствующих в системе принтеров берутся из Redis")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование принтеров рабочей группы...")
+    test_single_enumeration()
+    test_saved_data_for_missing_printers()
+    print("\n🎉 Тестирование завершено!")
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Тестовый скрипт для проверки печати на термопринтеры по RAW 9100
+Вместо принтера запускается локальный TCP-сервер, который принимает
+задания и отвечает на запрос состояния ~HS
+"""
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+# Добавляем корневую папку в путь для импортов
+sys.path.append(str(Path(__file__).parent))
+
+from PIL import Image
+
+from printer.status_service import STATUS_READY, STATUS_PAPER_OUT, STATUS_PAUSED, STATUS_OFFLINE
+from printer.zpl_printer import ZplPrinter, convert_label, image_to_epl, image_to_zpl, parse_host_status
+
+
+def host_status(formats: int = 0, labels: int = 0, paper_out: bool = False, paused: bool = False) -> bytes:
+    """Ответ ~HS в формате принтера Zebra"""
+    first = f"030,{int(paper_out)},{int(paused)},1245,{formats:03d},0,0,0,000,0,0,0"
+    second = f"001,0,0,0,1,2,6,0,{labels:08d},1,000"
+    return b"\x02" + first.encode() + b"\x03\r\n\x02" + second.encode() + b"\x03\r\n\x021234,0\x03\r\n"
+
+
+class FakeLabelPrinter:
+    """Локальная замена термопринтера: сохраняет задания и отвечает на ~HS"""
+
+    def __init__(self):
+        self.jobs = []
+        self.connections = 0
+        self.formats = 0
+        self.paper_out = False
+        self.paused = False
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        buffer = b""
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            buffer += data
+            while True:
+                if buffer.startswith(b"~HS"):
+                    buffer = buffer[3:]
+                    writer.write(host_status(self.formats, 0, self.paper_out, self.paused))
+                    await writer.drain()
+                    # Каждый запрос состояния - одна напечатанная этикетка
+                    self.formats = max(0, self.formats - 1)
+                    continue
+                end = buffer.find(b"^XZ")
+                if end < 0:
+                    break
+                self.jobs.append(buffer[:end + 3].strip())
+                self.formats += 1
+                buffer = buffer[end + 3:].lstrip()
+        writer.close()
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+def decompress_zpl(data: str, bytes_per_row: int) -> bytes:
+    """Распаковка сжатых данных ^GFA для проверки"""
+    rows = []
+    row = ""
+    count = 0
+    for char in data:
+        if "G" <= char <= "Y":
+            count += ord(char) - ord("G") + 1
+        elif "g" <= char <= "z":
+            count += (ord(char) - ord("g") + 1) * 20
+        elif char == ",":
+            rows.append(row.ljust(bytes_per_row * 2, "0"))
+            row = ""
+        elif char == "!":
+            rows.append(row.ljust(bytes_per_row * 2, "F"))
+            row = ""
+        elif char == ":":
+            rows.append(rows[-1])
+        else:
+            row += char * (count or 1)
+            count = 0
+            if len(row) == bytes_per_row * 2:
+                rows.append(row)
+                row = ""
+    return bytes.fromhex("".join(rows))
+
+
+def gfa_fields(job: str):
+    """Общий размер, байт в строке и данные поля ^GFA"""
+    total, _, bytes_per_row, data = job.split("^GFA,")[1].split("^FS")[0].split(",", 3)
+    return int(total), int(bytes_per_row), data
+
+
+def make_label(path: str):
+    """Этикетка с черной рамкой и полосой"""
+    img = Image.new("L", (101, 40), 255)
+    for x in range(101):
+        img.putpixel((x, 0), 0)
+        img.putpixel((x, 39), 0)
+    for y in range(10, 20):
+        for x in range(30, 70):
+            img.putpixel((x, y), 0)
+    img.save(path)
+    return img
+
+
+def test_zpl_conversion_roundtrip():
+    """Сжатые данные ^GFA совпадают с несжатыми"""
+    img = make_label(tempfile.mktemp(suffix=".png"))
+    compressed = image_to_zpl(img).decode()
+    plain = image_to_zpl(img, compress=False).decode()
+
+    total, bytes_per_row, data = gfa_fields(compressed)
+    _, _, plain_data = gfa_fields(plain)
+
+    assert bytes_per_row == 13 and total == 13 * 40
+    assert decompress_zpl(data, bytes_per_row) == bytes.fromhex(plain_data)
+    assert len(compressed) < len(plain) / 3
+    # Верхняя строка черная, правый бит за пределами ширины - белый
+    assert plain_data[:26] == "F" * 24 + "F8"
+    print("✅ Сжатие ZPL корректно")
+
+
+def test_epl_conversion():
+    """В EPL 0 - черная точка"""
+    img = make_label(tempfile.mktemp(suffix=".png"))
+    job = image_to_epl(img)
+    rest = job.split(b"GW", 1)[1]
+    *params, data = rest.split(b",", 4)
+    assert params == [b"0", b"0", b"13", b"40"]
+    assert data[:13] == b"\x00" * 12 + b"\x07"
+    assert job.endswith(b"\r\nP1\r\n")
+    print("✅ Конвертация EPL корректна")
+
+
+def test_conversion_is_cached():
+    """Повторная конвертация берет задание из кэша"""
+    path = tempfile.mktemp(suffix=".png")
+    make_label(path)
+    first = convert_label(path)
+    assert convert_label(path) is first
+    print("✅ Результат конвертации кэшируется")
+
+
+def test_jobs_share_connection_and_complete():
+    """Задания идут через одно соединение, завершение определяется по ~HS"""
+    async def run():
+        fake = FakeLabelPrinter()
+        await fake.start()
+        path = tempfile.mktemp(suffix=".png")
+        make_label(path)
+
+        printer = ZplPrinter("127.0.0.1", fake.port, timeout=2)
+        assert await printer.get_status() == STATUS_READY
+
+        first = await printer.print_file(path)
+        second = await printer.print_file(path)
+        assert (first, second) == ("1", "2")
+
+        assert await printer.wait_for_job(second, timeout=5, poll_interval=0.01)
+        assert len(fake.jobs) == 2 and fake.jobs[0].startswith(b"^XA")
+        assert fake.connections == 1
+
+        await printer.close()
+        await fake.stop()
+
+    asyncio.run(run())
+    print("✅ Задания отправляются через постоянное соединение")
+
+
+def test_status_and_reconnect():
+    """Статус принтера по ~HS и переподключение после разрыва"""
+    async def run():
+        fake = FakeLabelPrinter()
+        await fake.start()
+        printer = ZplPrinter("127.0.0.1", fake.port, timeout=2)
+
+        fake.paper_out = True
+        assert await printer.get_status() == STATUS_PAPER_OUT
+        fake.paper_out, fake.paused = False, True
+        assert await printer.get_status() == STATUS_PAUSED
+
+        # Принтер разорвал соединение - следующий запрос открывает новое
+        printer._writer.transport.abort()
+        fake.paused = False
+        assert await printer.get_status() == STATUS_READY
+        assert fake.connections == 2
+
+        port = fake.port
+        await printer.close()
+        await fake.stop()
+        assert await ZplPrinter("127.0.0.1", port, timeout=1).get_status() == STATUS_OFFLINE
+
+    asyncio.run(run())
+    print("✅ Статус и переподключение работают")
+
+
+def test_parse_host_status():
+    """Разбор флагов и счетчиков ответа ~HS"""
+    status = parse_host_status(host_status(formats=3, labels=2, paused=True))
+    assert status["formats_in_buffer"] == 3
+    assert status["labels_remaining"] == 2
+    assert status["paused"] and not status["paper_out"]
+    print("✅ Ответ ~HS разбирается")
+
+
+if __name__ == "__main__":
+    print("🧪 Тестирование печати на термопринтеры...")
+    test_zpl_conversion_roundtrip()
+    test_epl_conversion()
+    test_conversion_is_cached()
+    test_jobs_share_connection_and_complete()
+    test_status_and_reconnect()
+    test_parse_host_status()
+    print("\n🎉 Тестирование завершено!")
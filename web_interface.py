@@ -15,7 +15,7 @@ from pathlib import Path
 from typing import List, Dict, Any, Optional
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Body
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import uvicorn
@@ -24,9 +24,14 @@ import uvicorn
 sys.path.append(str(Path(__file__).parent))
 
 from printer.add_to_print import PrintQueueManager, add_orders_to_print_queue, setup_printers
-from printer.excel import create_print_status_report
+from printer.excel import ReportCache
+from printer.export import filter_tasks, iter_csv, iter_jsonl, parse_date_range
+from printer.health import PrinterHealth
+from printer.image_cache import get_image_cache
 from printer.print_processor import PrintProcessor
 from printer.printer_manager import PrinterManager
+from printer.registry import ProcessorRegistry
+from printer.status_service import get_printer_status_service
 
 
 class WebInterface:
@@ -42,7 +47,12 @@ class WebInterface:
         self.queue_manager = PrintQueueManager(redis_url)
         self.print_processor = None
         self.active_connections: List[WebSocket] = []
-        self.printer_manager = PrinterManager()
+        self.status_service = get_printer_status_service()
+        self.printer_manager = PrinterManager(redis_url, status_service=self.status_service)
+        self.report_cache = ReportCache(redis_url)
+        self.image_cache = get_image_cache()
+        self.printer_health = PrinterHealth(self.queue_manager)
+        self.processor_registry = ProcessorRegistry(self.queue_manager)
         
         # Настройка статических файлов и шаблонов
         self.templates = Jinja2Templates(directory="templates")
@@ -78,10 +88,10 @@ class WebInterface:
                 raise HTTPException(status_code=500, detail=str(e))
                 
         @self.app.get("/api/system/printers")
-        async def get_system_printers():
-            """Получить список системных принтеров"""
+        async def get_system_printers(refresh: bool = False):
+            """Получить список системных принтеров (из кэша статусов, refresh=true - обновить)"""
             try:
-                printers = await self.printer_manager.get_system_printers()
+                printers = await self.status_service.get_snapshot(force=refresh)
                 return {"printers": printers}
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
@@ -183,6 +193,13 @@ class WebInterface:
                         "priority": score
                     })
                     
+                # Задачи, ожидающие повторной попытки
+                delayed_tasks = await self.queue_manager.redis.zrange(
+                    self.queue_manager.delayed_queue_name, 0, -1
+                )
+                for task_json in delayed_tasks:
+                    queue_tasks.append(json.loads(task_json))
+                    
                 return {"tasks": queue_tasks}
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
@@ -213,22 +230,28 @@ class WebInterface:
                 raise HTTPException(status_code=500, detail=str(e))
                 
         @self.app.post("/api/processor/stop")
-        async def stop_processor():
-            """Остановить процессор печати"""
+        async def stop_processor(timeout: Optional[float] = None):
+            """Остановить процессор печати (timeout - сколько ждать текущие задания, 0 - не ждать)"""
             try:
+                report = {}
                 if self.print_processor:
-                    self.print_processor.stop()
+                    report = await self.print_processor.drain(timeout)
                     self.print_processor = None
-                return {"message": "Процессор печати остановлен"}
+                return {"message": "Процессор печати остановлен", "drain": report}
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
                 
         @self.app.get("/api/excel/generate")
-        async def generate_excel():
-            """Сгенерировать Excel отчет"""
+        async def generate_excel(streaming: bool = False):
+            """Сгенерировать Excel отчет (streaming=true - write-only режим для больших объемов)"""
             try:
-                filename = await create_print_status_report(self.redis_url)
-                return {"message": "Excel отчет создан", "filename": filename}
+                filename, version, cached = await self.report_cache.get_report(streaming)
+                return {
+                    "message": "Excel отчет не изменился" if cached else "Excel отчет создан",
+                    "filename": filename,
+                    "version": version,
+                    "cached": cached
+                }
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
                 
@@ -243,16 +266,18 @@ class WebInterface:
                 printers_count = len(printers_data)
                 
                 # Статус очереди
-                tasks = await self.queue_manager.redis.zrange("print_queue", 0, -1)
-                queue_count = len(tasks)
+                queue_count = await self.queue_manager.get_queue_length()
                 
-                # Статус процессора
-                processor_running = self.print_processor and self.print_processor.running
+                # Все работающие процессоры, включая запущенные на других компьютерах
+                processors = await self.processor_registry.get_processors()
+                local_running = bool(self.print_processor and self.print_processor.running)
                 
                 return {
                     "printers_count": printers_count,
                     "queue_count": queue_count,
-                    "processor_running": processor_running,
+                    "processor_running": local_running or bool(processors),
+                    "processors": processors,
+                    "fleet": ProcessorRegistry.summarize(processors),
                     "timestamp": datetime.now().isoformat()
                 }
             except Exception as e:
@@ -320,6 +345,104 @@ class WebInterface:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
                 
+        async def export_tasks(keys: List[str], date_field: str, name: str, format: str,
+                               date_from: Optional[str], date_to: Optional[str], printer: Optional[str]):
+            """Потоковая выгрузка задач из Redis в CSV или JSONL"""
+            if format not in ("csv", "jsonl"):
+                raise HTTPException(status_code=400, detail="Формат должен быть csv или jsonl")
+            # Даты проверяются до начала потока: ошибка внутри него оборвала бы ответ 200
+            try:
+                parse_date_range(date_from, date_to)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Дата должна быть в формате ISO (YYYY-MM-DD)")
+                
+            await self.queue_manager.connect()
+            tasks = filter_tasks(
+                self.queue_manager.redis, keys, date_field,
+                date_from=date_from, date_to=date_to, printer=printer
+            )
+            
+            if format == "csv":
+                content, media_type = iter_csv(tasks), "text/csv; charset=utf-8"
+            else:
+                content, media_type = iter_jsonl(tasks), "application/x-ndjson"
+                
+            return StreamingResponse(
+                content,
+                media_type=media_type,
+                headers={"Content-Disposition": f'attachment; filename="{name}.{format}"'}
+            )
+            
+        @self.app.get("/api/export/queue")
+        async def export_queue(format: str = "csv", date_from: Optional[str] = None,
+                               date_to: Optional[str] = None, printer: Optional[str] = None):
+            """Выгрузить очередь печати (CSV/JSONL) с фильтрами по дате создания и принтеру"""
+            return await export_tasks(
+                [self.queue_manager.queue_name, self.queue_manager.delayed_queue_name],
+                "created_at", "print_queue", format, date_from, date_to, printer
+            )
+            
+        @self.app.get("/api/export/completed-tasks")
+        async def export_completed_tasks(format: str = "csv", date_from: Optional[str] = None,
+                                         date_to: Optional[str] = None, printer: Optional[str] = None):
+            """Выгрузить историю выполненных задач (CSV/JSONL) с фильтрами по дате завершения и принтеру"""
+            return await export_tasks(
+                ["completed_tasks"], "completed_at", "completed_tasks",
+                format, date_from, date_to, printer
+            )
+            
+        @self.app.get("/api/dead-letter")
+        async def get_dead_letter_tasks():
+            """Получить задачи, исчерпавшие лимит попыток печати"""
+            try:
+                tasks = await self.queue_manager.get_dead_letter_tasks()
+                return {"tasks": tasks}
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+                
+        @self.app.post("/api/dead-letter/requeue", response_model=None)
+        async def requeue_dead_letter_tasks(data: dict = Body(default={})):
+            """Вернуть задачи из dead_letter в очередь (все, если task_ids не указан)"""
+            try:
+                task_ids = data.get("task_ids")
+                requeued = await self.queue_manager.requeue_dead_tasks(task_ids)
+                return {
+                    "message": f"Возвращено в очередь {requeued} задач",
+                    "requeued": requeued
+                }
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+                
+        @self.app.get("/api/image-cache")
+        async def get_image_cache_stats():
+            """Статистика кэша подготовленных к печати изображений"""
+            return self.image_cache.get_stats()
+
+        @self.app.get("/api/printers/health")
+        async def get_printers_health():
+            """Ошибки печати по принтерам и отключенные принтеры"""
+            try:
+                return {"printers": await self.printer_health.get_all()}
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        @self.app.post("/api/printers/{printer_name}/health/reset")
+        async def reset_printer_health(printer_name: str):
+            """Вернуть отключенный принтер в работу, не дожидаясь окончания паузы"""
+            try:
+                if await self.printer_health.reset(printer_name):
+                    return {"message": f"Принтер {printer_name} возвращен в работу"}
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+            raise HTTPException(status_code=404, detail="У принтера нет ошибок печати")
+
+        @self.app.get("/api/scheduler")
+        async def get_scheduler_stats():
+            """Измеренная скорость принтеров, по которой распределяются задачи"""
+            if not self.print_processor or not self.print_processor.scheduler:
+                return {"printers": {}}
+            return {"printers": self.print_processor.scheduler.get_stats()}
+
     async def broadcast_status(self, status: Dict[str, Any]):
         """Отправить статус всем подключенным клиентам"""
         for connection in self.active_connections: